@@ -0,0 +1,98 @@
+"""Card rendering throughput: per-field escaping, two-call escaping and the render cache.
+
+Run: python -m benchmarks.card_render [--ads 1000] [--passes 20]
+
+``ads`` synthetic ads are rendered ``passes`` times each, the way popular
+ads are rendered again for every search hit and /view. "per field" is the
+previous format_ad_md, which escaped each of its 7-9 fields separately;
+"format_ad_md" escapes the title and the rest of the card in two calls;
+"render_card" and "card_plan" go through the cache in bot.services.cards.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+
+from bot.database.models import AdRecord
+from bot.keyboards.inline import contact_author_kb
+from bot.services import cards
+from bot.utils import STATUS_TEXT, escape_md_v2, format_ad_md
+
+WORDS = "диван стол шкаф (б/у) отличное состояние! торг. самовывоз #мебель 1.500 - = кровать".split()
+
+
+def _per_field(ad: AdRecord, with_status: bool = False) -> str:
+    parts = [
+        f"*{escape_md_v2(ad.title)}*",
+        "",
+        f"Категория: {escape_md_v2(ad.category)}",
+        f"Цена: {escape_md_v2(ad.price_text)}",
+        f"Город/район: {escape_md_v2(ad.city)}",
+        "",
+        escape_md_v2(ad.description),
+    ]
+    if ad.phone:
+        parts.append(f"\nТелефон: {escape_md_v2(ad.phone)}")
+    if ad.username:
+        parts.append(escape_md_v2(f"Опубликовал: @{ad.username}"))
+    if with_status:
+        parts.append(f"Статус: {escape_md_v2(STATUS_TEXT.get(ad.status, ad.status))}")
+    return "\n".join(parts)
+
+
+def _ad(ad_id: int, rng: random.Random) -> AdRecord:
+    return AdRecord(
+        id=ad_id,
+        user_id=ad_id,
+        username=f"user_{ad_id}" if ad_id % 2 else None,
+        phone="+7 (900) 123-45-67" if ad_id % 3 else None,
+        title=" ".join(rng.choices(WORDS, k=4)),
+        description=" ".join(rng.choices(WORDS, k=rng.randint(10, 80))),
+        price_text="1500.00 ₽",
+        price_value=1500.0,
+        category="Мебель",
+        photos=[f"photo-{ad_id}-{i}" for i in range(ad_id % 4)],
+        city="Центр",
+        status="published",
+        created_at="",
+        published_at=None,
+    )
+
+
+def _measure(name: str, ads: list[AdRecord], passes: int, render: Callable[[AdRecord], object]) -> None:
+    start = time.perf_counter()
+    for _ in range(passes):
+        for ad in ads:
+            render(ad)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {len(ads) * passes / elapsed:>12,.0f} renders/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ads", type=int, default=1000)
+    parser.add_argument("--passes", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    ads = [_ad(ad_id, rng) for ad_id in range(1, args.ads + 1)]
+    assert all(_per_field(ad, True) == format_ad_md(ad, True) for ad in ads)
+    keyboards = {ad.id: contact_author_kb(ad.username, ad.user_id) for ad in ads}
+
+    _measure("per field", ads, args.passes, lambda ad: _per_field(ad, True))
+    _measure("format_ad_md", ads, args.passes, lambda ad: format_ad_md(ad, True))
+    cards.clear()
+    _measure("render_card, cold", ads, 1, lambda ad: cards.render_card(ad, True))
+    _measure("render_card, cached", ads, args.passes, lambda ad: cards.render_card(ad, True))
+    _measure(
+        "card_plan, cached",
+        ads,
+        args.passes,
+        lambda ad: cards.card_plan(ad, keyboards[ad.id]),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Routing cost per text update: button index vs the router filter chain.
+
+Run: python -m benchmarks.dispatch [--rounds 2000]
+
+Two dispatchers route the same updates. "index" is the bot's own setup:
+ButtonIndexMiddleware in front of the routers. "chain" registers the
+indexed buttons as ordinary filter handlers (ButtonIndex.as_router) ahead of
+copies of the routers, which is how buttons were routed before. Handler
+bodies are replaced by a stub that records which handler was chosen, so
+only routing is timed: middlewares, filters and propagation. Both
+dispatchers must pick the same handler for every update.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+
+from bot.handlers import all_routers
+from bot.handlers.buttons import ButtonIndexMiddleware, buttons
+from bot.keyboards.reply import BTN_CANCEL, BTN_HELP, BTN_PUBLISH, BTN_SEARCH
+from bot.states.ad_states import AdCreateStates, EditAdStates, SearchStates
+
+SAMPLES: list[tuple[str, State | None, str]] = [
+    ("search button", None, BTN_SEARCH),
+    ("category button", None, "Мебель"),
+    ("help in a draft", AdCreateStates.price, BTN_HELP),
+    ("cancel a draft", AdCreateStates.title, BTN_CANCEL),
+    ("publish an edit", EditAdStates.confirm, BTN_PUBLISH),
+    ("draft free text", AdCreateStates.description, "Почти новый, без царапин"),
+    ("search query", SearchStates.waiting_query, "диван"),
+    ("command", None, "/search диван"),
+]
+
+chosen: list[str] = []
+_call = HandlerObject.call
+
+
+async def _record(self: HandlerObject, *args: Any, **kwargs: Any) -> Any:
+    if self.callback.__module__.startswith("bot.handlers."):
+        chosen.append(self.callback.__name__)
+        return None
+    # aiogram's own update listener.
+    return await _call(self, *args, **kwargs)
+
+
+def _copy(router: Router) -> Router:
+    copy = Router(name=f"{router.name}-copy")
+    for name, observer in router.observers.items():
+        copy.observers[name].handlers = list(observer.handlers)
+    return copy
+
+
+def _update(update_id: int, user_id: int, text: str) -> Update:
+    entities = [{"type": "bot_command", "offset": 0, "length": text.find(" ")}] if text[0] == "/" else None
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+                "text": text,
+                "entities": entities,
+            },
+        }
+    )
+
+
+async def _set_states(dp: Dispatcher, bot: Bot) -> None:
+    for user_id, (_, state, _) in enumerate(SAMPLES, start=1):
+        key = StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id)
+        await dp.storage.set_state(key, state)
+
+
+async def _time(dp: Dispatcher, bot: Bot, update: Update) -> tuple[float, str]:
+    chosen.clear()
+    start = time.perf_counter()
+    await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) * 1_000_000, chosen[-1] if chosen else "-"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    HandlerObject.call = _record
+    bot = Bot("42:benchmark")
+
+    chain = Dispatcher(storage=MemoryStorage())
+    chain.include_router(buttons.as_router())
+    for router in all_routers:
+        chain.include_router(_copy(router))
+
+    index = Dispatcher(storage=MemoryStorage())
+    index.message.outer_middleware(ButtonIndexMiddleware(buttons))
+    for router in all_routers:
+        index.include_router(router)
+
+    await _set_states(chain, bot)
+    await _set_states(index, bot)
+    print(f"{'update':<18} {'chain µs':>9} {'index µs':>9}  handler")
+    for user_id, (label, _, text) in enumerate(SAMPLES, start=1):
+        update = _update(user_id, user_id, text)
+        timings: dict[str, list[float]] = {"chain": [], "index": []}
+        # Interleaved so both see the same machine noise.
+        for _ in range(args.rounds):
+            chain_us, chain_handler = await _time(chain, bot, update)
+            index_us, index_handler = await _time(index, bot, update)
+            assert chain_handler == index_handler, (label, chain_handler, index_handler)
+            timings["chain"].append(chain_us)
+            timings["index"].append(index_us)
+        print(
+            f"{label:<18} {statistics.median(timings['chain']):>9.1f} "
+            f"{statistics.median(timings['index']):>9.1f}  {index_handler}"
+        )
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""FSM storage under many concurrent drafts: commits, throughput and memory.
+
+Run: python -m benchmarks.fsm_storage [--users 100000] [--steps 6] [--cache 10000]
+
+Every simulated user walks through ``steps`` draft steps, each doing the
+get_data / update_data / set_state calls a handler makes.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.database import crud
+from bot.database.fsm_storage import SQLiteStorage
+from bot.states.ad_states import AdCreateStates
+
+STEPS = (
+    AdCreateStates.title,
+    AdCreateStates.description,
+    AdCreateStates.price,
+    AdCreateStates.category,
+    AdCreateStates.city,
+    AdCreateStates.photos,
+    AdCreateStates.confirm,
+)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--cache", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        crud.configure(Path(tmp) / "fsm.db")
+        await crud.init_db()
+        batcher = (await crud._get_pool()).batcher
+        storage = SQLiteStorage(max_entries=args.cache)
+        tracemalloc.start()
+        start = time.perf_counter()
+        calls = 0
+        for step in range(args.steps):
+            for user_id in range(args.users):
+                key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+                data = await storage.get_data(key)
+                data[f"field{step}"] = "значение " * 8
+                await storage.update_data(key, data)
+                await storage.set_state(key, STEPS[step % len(STEPS)])
+                calls += 3
+            await asyncio.sleep(0)
+        await storage.close()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pool = await crud._get_pool()
+        async with pool.reader() as db:
+            cursor = await db.execute("SELECT COUNT(*) FROM fsm_states")
+            (rows,) = await cursor.fetchone()
+        await crud.close_db()
+
+    print(
+        f"{args.users} users x {args.steps} steps: {calls / elapsed:,.0f} storage calls/s, "
+        f"{batcher.commits} commits for {calls} calls, {rows} rows, "
+        f"hot layer {len(storage)} keys, peak traced memory {peak / 2**20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
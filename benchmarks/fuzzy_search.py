@@ -0,0 +1,125 @@
+"""Recall and latency of typo-tolerant search on a large published-ads table.
+
+Run: python -m benchmarks.fuzzy_search [--rows 500000] [--queries 500] [--vocabulary 50000]
+
+Titles combine a common item and brand with a model name drawn from a large
+vocabulary of made-up words, so most titles are rare while their items share
+trigrams with tens of thousands of other ads. Each query is made from one
+random ad by misspelling its item and its model name with one edit each (a
+substitution, insertion, deletion or swap of neighbours). Recall counts the
+queries whose first page contains that ad, not just any result; it is also
+given for the queries whose misspelled words all have seven or more
+letters, the ones trigram_query is guaranteed to match.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from bot.database import crud
+
+ITEMS = (
+    "холодильник велосипед телефон коляска диван кресло ноутбук куртка шкаф "
+    "стиральная машина телевизор планшет самокат пылесос микроволновка кроссовки"
+).split()
+BRANDS = "samsung apple xiaomi bosch lg philips ikea nike adidas lenovo".split()
+CITIES = "Запорожье Киев Днепр Харьков Одесса Львов Полтава Николаев".split()
+CONSONANTS = "бвгдзклмнпрстфхч"
+VOWELS = "аеиоуя"
+LETTERS = "абвгдежзиклмнопрстуфхцчшыэюя"
+
+
+def _vocabulary(size: int, rnd: random.Random) -> list[str]:
+    words: set[str] = set()
+    while len(words) < size:
+        syllables = rnd.randint(2, 5)
+        words.add("".join(rnd.choice(CONSONANTS) + rnd.choice(VOWELS) for _ in range(syllables)))
+    return sorted(words)
+
+
+def _typo(word: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(word) - 1)
+    kind = rnd.randrange(4)
+    if kind == 0:
+        return word[:i] + rnd.choice(LETTERS.replace(word[i], "")) + word[i + 1 :]
+    if kind == 1:
+        return word[:i] + word[i + 1 :]
+    if kind == 2:
+        return word[:i] + rnd.choice(LETTERS) + word[i:]
+    if word[i] == word[i + 1]:
+        return word[:i] + word[i + 2 :]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+
+
+async def _prepare(path: Path, titles: list[str], rnd: random.Random) -> None:
+    crud.configure(path)
+    await crud.init_db()
+    await crud.close_db()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        """
+        INSERT INTO ads (id, user_id, title, description, price_text, category, city, status)
+        VALUES (?, ?, ?, 'описание', '100 ₽', 'Другое', ?, 'published')
+        """,
+        ((i, i % 5000, title, rnd.choice(CITIES)) for i, title in enumerate(titles, start=1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    vocabulary = _vocabulary(args.vocabulary, rnd)
+    titles = [
+        f"{rnd.choice(ITEMS)} {rnd.choice(BRANDS)} {rnd.choice(vocabulary)}"
+        for _ in range(args.rows)
+    ]
+    targets = rnd.sample(range(1, args.rows + 1), args.queries)
+    queries = []
+    for ad_id in targets:
+        item, _, model = titles[ad_id - 1].split()
+        queries.append(f"{_typo(item, rnd)} {_typo(model, rnd)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "fuzzy.db"
+        await _prepare(path, titles, rnd)
+        crud.configure(path)
+        await crud.init_db()
+        await crud.fuzzy_search_ads("прогрев")
+        timings: list[float] = []
+        found = long_found = long_queries = 0
+        for ad_id, query in zip(targets, queries):
+            start = time.perf_counter()
+            page = await crud.fuzzy_search_ads(query)
+            timings.append((time.perf_counter() - start) * 1000)
+            hit = any(ad.id == ad_id for ad in page.items)
+            found += hit
+            if all(len(word) >= 7 for word in query.split()):
+                long_queries += 1
+                long_found += hit
+        await crud.close_db()
+
+    timings.sort()
+    print(
+        f"{args.rows} ads, {args.queries} misspelled queries: "
+        f"p50 {statistics.median(timings):.2f} ms, "
+        f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms, "
+        f"recall {found}/{args.queries} "
+        f"({long_found}/{long_queries} with every misspelled word 7+ letters)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""Commit-per-write vs group commit for concurrent ad inserts.
+
+Run: python -m benchmarks.group_commit [--ops 2000] [--concurrency 50] [--delay-ms 5]
+
+On disks where fsync is cheap the linger delay dominates; the commit count is
+the number to watch.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import aiosqlite
+
+from bot.database import crud
+from bot.database.batch import WriteBatcher
+
+INSERT_SQL = """
+    INSERT INTO ads (user_id, username, title, description, price_text, category, city)
+    VALUES (?, 'bench', ?, 'description', '100 ₽', 'Другое', 'Город')
+"""
+
+
+async def _prepare(path: Path) -> None:
+    crud.configure(path)
+    await crud.init_db()
+    await crud.close_db()
+
+
+async def _run_workers(ops: int, concurrency: int, write) -> None:
+    counter = iter(range(ops))
+
+    async def worker() -> None:
+        for i in counter:
+            await write(i)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bench_commit_per_write(
+    path: Path, ops: int, concurrency: int, delay_ms: float
+) -> tuple[float, int]:
+    conn = await aiosqlite.connect(path)
+    commits = 0
+
+    async def write(i: int) -> None:
+        nonlocal commits
+        await conn.execute(INSERT_SQL, (i, f"item {i}"))
+        await conn.commit()
+        commits += 1
+
+    start = time.perf_counter()
+    await _run_workers(ops, concurrency, write)
+    elapsed = time.perf_counter() - start
+    await conn.close()
+    return elapsed, commits
+
+
+async def bench_group_commit(
+    path: Path, ops: int, concurrency: int, delay_ms: float
+) -> tuple[float, int]:
+    conn = await aiosqlite.connect(path)
+    batcher = WriteBatcher(conn, max_delay=delay_ms / 1000)
+
+    async def write(i: int) -> None:
+        await batcher.execute(INSERT_SQL, (i, f"item {i}"))
+
+    start = time.perf_counter()
+    await _run_workers(ops, concurrency, write)
+    elapsed = time.perf_counter() - start
+    await batcher.close()
+    await conn.close()
+    return elapsed, batcher.commits
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in (
+            ("commit per write", bench_commit_per_write),
+            ("group commit", bench_group_commit),
+        ):
+            path = Path(tmp) / f"{bench.__name__}.db"
+            await _prepare(path)
+            elapsed, commits = await bench(path, args.ops, args.concurrency, args.delay_ms)
+            print(
+                f"{name:>17}: {args.ops / elapsed:9.0f} writes/s  "
+                f"{commits / elapsed:8.0f} commits/s  ({commits} commits, {elapsed:.3f}s)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""Per-reply keyboard cost: building the markup and serializing the request.
+
+Run: python -m benchmarks.keyboards [--rounds 20000]
+
+"built" is how keyboards were made before: a new pydantic tree per reply,
+dumped back to JSON by the stock aiohttp session. "prepared" is the bot's
+own setup: static keyboards shared from bot.keyboards.reply, id-dependent
+ones filled from an InlineTemplate, and PreparedSession sending the stored
+JSON. Each reply is a sendMessage carrying the keyboard; the time covers the
+keyboard, the method object and the form data, and the memory column is the
+peak allocated while making one reply. Both sessions must send the same
+keyboard.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+)
+
+from bot.keyboards import inline, reply
+from bot.keyboards.registry import PreparedSession
+
+Markup = InlineKeyboardMarkup | ReplyKeyboardMarkup
+
+
+def _built_main_menu() -> Markup:
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text=reply.BTN_NEW_AD), KeyboardButton(text=reply.BTN_MY_ADS)],
+            [KeyboardButton(text=reply.BTN_SEARCH), KeyboardButton(text=reply.BTN_CATEGORIES)],
+            [KeyboardButton(text=reply.BTN_HELP)],
+        ],
+        resize_keyboard=True,
+    )
+
+
+def _built_category() -> Markup:
+    rows = [[KeyboardButton(text=cat)] for cat in reply.CATEGORIES]
+    rows.append([KeyboardButton(text=reply.BTN_CANCEL)])
+    return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
+
+
+def _built_moderation(ad_id: int) -> Markup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Approve", callback_data=f"ad:ap:{ad_id}"),
+                InlineKeyboardButton(text="❌ Reject", callback_data=f"ad:rj:{ad_id}"),
+            ]
+        ]
+    )
+
+
+def _built_contact(user_id: int) -> Markup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="💬 Связаться с автором", url=f"tg://user?id={user_id}")]
+        ]
+    )
+
+
+CASES: list[tuple[str, Callable[[int], Markup], Callable[[int], Markup]]] = [
+    ("main menu", lambda _: _built_main_menu(), lambda _: reply.main_menu_kb()),
+    ("categories", lambda _: _built_category(), lambda _: reply.category_kb()),
+    ("moderation", _built_moderation, inline.admin_moderation_kb),
+    ("contact author", _built_contact, lambda i: inline.contact_author_kb(None, i)),
+]
+
+
+def _reply(session: BaseSession, bot: Bot, make: Callable[[int], Markup], i: int) -> object:
+    method = SendMessage(chat_id=i, text="Главное меню", reply_markup=make(i))
+    return session.build_form_data(bot, method)
+
+
+def _markup_field(form: object) -> str:
+    return next(value for options, _, value in form._fields if options["name"] == "reply_markup")
+
+
+def _time(session: BaseSession, bot: Bot, make: Callable[[int], Markup], rounds: int) -> float:
+    start = time.perf_counter()
+    for i in range(rounds):
+        _reply(session, bot, make, i)
+    return (time.perf_counter() - start) / rounds * 1_000_000
+
+
+def _peak(session: BaseSession, bot: Bot, make: Callable[[int], Markup]) -> float:
+    tracemalloc.start()
+    _reply(session, bot, make, 1)
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    _reply(session, bot, make, 2)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (peak - start) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot("42:benchmark")
+    stock = AiohttpSession()
+    prepared = PreparedSession()
+
+    print(
+        f"{'keyboard':<16} {'built µs':>9} {'prepared µs':>12} "
+        f"{'built KiB':>10} {'prepared KiB':>13}"
+    )
+    for label, built, fast in CASES:
+        sent = _markup_field(_reply(stock, bot, built, 7))
+        assert json.loads(sent) == json.loads(_markup_field(_reply(prepared, bot, fast, 7))), label
+        built_us = _time(stock, bot, built, args.rounds)
+        prepared_us = _time(prepared, bot, fast, args.rounds)
+        print(
+            f"{label:<16} {built_us:>9.1f} {prepared_us:>12.1f} "
+            f"{_peak(stock, bot, built):>10.1f} {_peak(prepared, bot, fast):>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Moderation throughput with row-level vs column-scoped FTS triggers.
+
+Run: python -m benchmarks.moderation_fts [--rows 100000] [--ops 3000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from bot.database import crud
+
+LEGACY_UPDATE_TRIGGER = """
+    DROP TRIGGER IF EXISTS ads_au;
+    CREATE TRIGGER ads_au AFTER UPDATE ON ads BEGIN
+        INSERT INTO ads_fts(ads_fts, rowid, title, description, city)
+        VALUES ('delete', old.id, old.title, old.description, old.city);
+        INSERT INTO ads_fts(rowid, title, description, city)
+        VALUES (new.id, new.title, new.description, new.city);
+    END;
+"""
+
+WORDS = (
+    "диван стол шкаф велосипед телефон куртка коляска кресло ноутбук холодильник "
+    "новый б/у отличное состояние срочно торг самовывоз доставка недорого"
+).split()
+
+
+async def _prepare(path: Path, rows: int) -> None:
+    crud.configure(path)
+    await crud.init_db()
+    await crud.close_db()
+    rnd = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        """
+        INSERT INTO ads (user_id, title, description, price_text, category, city)
+        VALUES (?, ?, ?, '100 ₽', 'Другое', 'Запорожье')
+        """,
+        (
+            (
+                i % 5000,
+                " ".join(rnd.choices(WORDS, k=4)),
+                " ".join(rnd.choices(WORDS, k=60)),
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _moderate(path: Path, ops: int, rows: int) -> float:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    ids = random.Random(7).sample(range(1, rows + 1), ops)
+    start = time.perf_counter()
+    for ad_id in ids:
+        conn.execute(
+            "UPDATE ads SET status = 'published', published_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (ad_id,),
+        )
+        conn.execute(
+            """
+            UPDATE ads SET publication_chat_id = ?, publication_message_ids_json = ?
+            WHERE id = ?
+            """,
+            (-100, "[1, 2]", ad_id),
+        )
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, legacy in (("row-level trigger", True), ("column-scoped", False)):
+            path = Path(tmp) / f"{'legacy' if legacy else 'scoped'}.db"
+            await _prepare(path, args.rows)
+            if legacy:
+                conn = sqlite3.connect(path)
+                conn.executescript(LEGACY_UPDATE_TRIGGER)
+                conn.close()
+            elapsed = _moderate(path, args.ops, args.rows)
+            print(
+                f"{name:>17}: {args.ops / elapsed:8.0f} approvals/s "
+                f"({args.ops} approve + publication-info updates on {args.rows} rows, {elapsed:.2f}s)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""Decode time and memory of a list page: photos_json vs the ad_photos table.
+
+Run: python -m benchmarks.photo_storage [--rows 50000] [--pages 2000] [--page-size 20]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from bot.database import crud
+from bot.database.models import AdRecord
+
+
+def _file_id(rnd: random.Random) -> str:
+    # Telegram photo file_ids are ~80 url-safe characters.
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-"
+    return "AgACAgIAAxkBAAI" + "".join(rnd.choices(alphabet, k=68))
+
+
+async def _prepare(path: Path, rows: int, as_json: bool) -> None:
+    crud.configure(path)
+    await crud.init_db()
+    await crud.close_db()
+    rnd = random.Random(42)
+    conn = sqlite3.connect(path)
+    for ad_id in range(1, rows + 1):
+        photos = [_file_id(rnd) for _ in range(rnd.randint(0, 4))]
+        conn.execute(
+            """
+            INSERT INTO ads (id, user_id, title, description, price_text, category, city,
+                             status, photos_json)
+            VALUES (?, ?, 'Диван', 'описание', '100 ₽', 'Другое', 'Киев', 'published', ?)
+            """,
+            (ad_id, ad_id % 5000, json.dumps(photos) if as_json else "[]"),
+        )
+        if as_json:
+            continue
+        conn.executemany(
+            "INSERT INTO ad_photos (ad_id, position, file_id) VALUES (?, ?, ?)",
+            [(ad_id, position, file_id) for position, file_id in enumerate(photos)],
+        )
+    conn.commit()
+    conn.close()
+
+
+def _json_page(conn: sqlite3.Connection, before_id: int, size: int) -> list[AdRecord]:
+    rows = conn.execute(
+        "SELECT * FROM ads WHERE status = 'published' AND id < ? ORDER BY id DESC LIMIT ?",
+        (before_id, size),
+    ).fetchall()
+    return [AdRecord.from_row(row, json.loads(row["photos_json"] or "[]")) for row in rows]
+
+
+def _table_page(conn: sqlite3.Connection, before_id: int, size: int) -> list[AdRecord]:
+    rows = conn.execute(
+        "SELECT * FROM ads WHERE status = 'published' AND id < ? ORDER BY id DESC LIMIT ?",
+        (before_id, size),
+    ).fetchall()
+    ids = [row["id"] for row in rows]
+    photos: dict[int, list[str]] = {}
+    for ad_id, file_id in conn.execute(
+        f"""
+        SELECT ad_id, file_id FROM ad_photos
+        WHERE ad_id IN ({', '.join('?' * len(ids))})
+        ORDER BY ad_id, position
+        """,
+        ids,
+    ):
+        photos.setdefault(ad_id, []).append(file_id)
+    return [AdRecord.from_row(row, photos.get(row["id"], [])) for row in rows]
+
+
+def _measure(
+    conn: sqlite3.Connection,
+    load: Callable[[sqlite3.Connection, int, int], list[AdRecord]],
+    starts: list[int],
+    size: int,
+) -> tuple[float, float, int]:
+    timings: list[float] = []
+    for before_id in starts:
+        start = time.perf_counter()
+        load(conn, before_id, size)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    peaks: list[int] = []
+    for before_id in starts[:200]:
+        tracemalloc.start()
+        load(conn, before_id, size)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1], int(statistics.mean(peaks))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        starts = [rnd.randint(args.page_size + 1, args.rows + 1) for _ in range(args.pages)]
+        for name, as_json, load in (
+            ("photos_json", True, _json_page),
+            ("ad_photos", False, _table_page),
+        ):
+            path = Path(tmp) / f"{name}.db"
+            await _prepare(path, args.rows, as_json)
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            _measure(conn, load, starts[:100], args.page_size)
+            p50, p99, peak = _measure(conn, load, starts, args.page_size)
+            conn.close()
+            print(
+                f"{name:>11}: p50 {p50:.0f} us/page, p99 {p99:.0f} us/page, "
+                f"peak {peak / 1024:.1f} KiB/page"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
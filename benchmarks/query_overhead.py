@@ -0,0 +1,135 @@
+"""Per-query overhead of single-hop reads vs execute-then-fetch round-trips.
+
+Run: python -m benchmarks.query_overhead [--rows 10000] [--calls 5000]
+
+The "multi-hop" variants issue the same SQL the way crud used to, with one
+``await`` on the aiosqlite worker thread per execute and per fetch.
+get_ad_full_by_id is measured through crud._load_ad_full so the entity
+cache does not hide the database cost.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from bot.database import crud
+from bot.database.models import AdRecord
+
+
+async def _prepare(path: Path, rows: int) -> None:
+    crud.configure(path)
+    await crud.init_db()
+    await crud.close_db()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        """
+        INSERT INTO ads (id, user_id, title, description, price_text, category, city, status)
+        VALUES (?, ?, 'Диван', 'описание', '100 ₽', 'Другое', 'Киев', 'published')
+        """,
+        ((ad_id, ad_id % 500) for ad_id in range(1, rows + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO ad_photos (ad_id, position, file_id) VALUES (?, ?, ?)",
+        (
+            (ad_id, position, f"photo-{ad_id}-{position}")
+            for ad_id in range(1, rows + 1)
+            for position in range(2)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO ad_publications (ad_id, chat_id, message_id) VALUES (?, -100, ?)",
+        ((ad_id, ad_id * 10 + n) for ad_id in range(1, rows + 1) for n in range(3)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _multi_hop_ad_full(ad_id: int) -> crud.AdFull | None:
+    pool = await crud._get_pool()
+    async with pool.reader() as db:
+        cursor = await db.execute("SELECT * FROM ads WHERE id = ?", (ad_id,))
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        cursor = await db.execute(
+            "SELECT file_id FROM ad_photos WHERE ad_id = ? ORDER BY position", (ad_id,)
+        )
+        photos = [r[0] for r in await cursor.fetchall()]
+        cursor = await db.execute(
+            "SELECT chat_id, message_id FROM ad_publications WHERE ad_id = ? ORDER BY message_id",
+            (ad_id,),
+        )
+        publications = await cursor.fetchall()
+    chat_id = publications[0]["chat_id"] if publications else None
+    return AdRecord.from_row(row, photos), chat_id, [int(p["message_id"]) for p in publications]
+
+
+async def _multi_hop_count(user_id: int) -> int:
+    pool = await crud._get_pool()
+    async with pool.reader() as db:
+        cursor = await db.execute(
+            """
+            SELECT COUNT(*)
+            FROM ads
+            WHERE user_id = ?
+              AND created_at >= datetime('now', '-1 day')
+            """,
+            (user_id,),
+        )
+        row = await cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+async def _measure(call: Callable[[int], Awaitable[object]], keys: list[int]) -> tuple[float, float]:
+    for key in keys[:200]:
+        await call(key)
+    timings: list[float] = []
+    for key in keys:
+        start = time.perf_counter()
+        await call(key)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "overhead.db"
+        await _prepare(path, args.rows)
+        crud.configure(path)
+        await crud.init_db()
+        ad_ids = [rnd.randint(1, args.rows) for _ in range(args.calls)]
+        user_ids = [rnd.randrange(500) for _ in range(args.calls)]
+        cases = (
+            ("get_ad_full_by_id", "multi-hop", _multi_hop_ad_full, ad_ids),
+            ("get_ad_full_by_id", "single-hop", crud._load_ad_full, ad_ids),
+            ("count_ads_last_24h", "multi-hop", _multi_hop_count, user_ids),
+            (
+                "count_ads_last_24h",
+                "single-hop",
+                lambda user_id: crud.count_ads_last_24h(user_id, from_db=True),
+                user_ids,
+            ),
+            ("count_ads_last_24h", "in-memory", crud.count_ads_last_24h, user_ids),
+        )
+        for name, variant, call, keys in cases:
+            p50, p99 = await _measure(call, keys)
+            print(f"{name:>18} {variant:>10}: p50 {p50:.0f} us, p99 {p99:.0f} us")
+        await crud.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
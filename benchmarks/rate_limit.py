@@ -0,0 +1,75 @@
+"""Outbound rate limiter under a peak burst: limit compliance and queue wait.
+
+Run: python -m benchmarks.rate_limit [--users 200] [--replies 3] [--posts 10]
+
+``users`` private chats each get ``replies`` interactive messages while the
+outbox publishes ``posts`` ads to one channel, all started at once. Requests
+go through RateLimitMiddleware with a fake session that records when each
+call reached Telegram; the script reports the busiest 1-second window, the
+busiest 60-second window for the channel, and queue wait per priority.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from aiogram.methods import SendMessage
+
+from bot.services import metrics
+from bot.services.rate_limit import Priority, RateLimiter, RateLimitMiddleware, priority
+
+CHANNEL = -1001
+
+
+def _busiest(stamps: list[float], window: float) -> int:
+    stamps = sorted(stamps)
+    best = start = 0
+    for end, stamp in enumerate(stamps):
+        while stamp - stamps[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--replies", type=int, default=3)
+    parser.add_argument("--posts", type=int, default=10)
+    args = parser.parse_args()
+
+    sent: dict[int, list[float]] = defaultdict(list)
+
+    async def make_request(bot: object, method: SendMessage) -> bool:
+        sent[method.chat_id].append(time.monotonic())
+        return True
+
+    middleware = RateLimitMiddleware(RateLimiter())
+
+    async def reply(user_id: int) -> None:
+        for _ in range(args.replies):
+            await middleware(make_request, None, SendMessage(chat_id=user_id, text="x"))
+
+    async def publish() -> None:
+        with priority(Priority.BACKGROUND):
+            for _ in range(args.posts):
+                await middleware(make_request, None, SendMessage(chat_id=CHANNEL, text="x"))
+
+    start = time.monotonic()
+    await asyncio.gather(publish(), *(reply(user_id) for user_id in range(1, args.users + 1)))
+    elapsed = time.monotonic() - start
+
+    everything = [stamp for stamps in sent.values() for stamp in stamps]
+    per_user = max(_busiest(sent[u], 1.0) for u in range(1, args.users + 1))
+    print(
+        f"{len(everything)} calls in {elapsed:.1f}s; busiest second {_busiest(everything, 1.0)} calls, "
+        f"busiest second per user {per_user}, channel busiest minute {_busiest(sent[CHANNEL], 60.0)}"
+    )
+    for name, t in sorted(metrics.snapshot()["timings"].items()):
+        print(f"{name}: p50 {t['p50']:.0f} ms, p99 {t['p99']:.0f} ms, max {t['max']:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""Update throughput of the sharded supervisor from 1 to N worker processes.
+
+Run: python -m benchmarks.sharding [--max-workers 4] [--updates 3000] [--users 1000]
+                                   [--api-ms 20]
+
+For every worker count a WorkerPool is started on a fresh database with 200
+published ads, then ``updates`` /search commands from ``users`` users are
+dispatched as fast as the workers take them. Bot API calls go to a fake
+server in this process (TELEGRAM_API_URL) that answers after ``api-ms``;
+the run ends when every update got its reply. Rate limits are lifted so
+only processing is measured. Scaling needs as many free cores as workers.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from aiohttp import web
+
+from bot.database import crud
+from bot.database.models import AdCreate
+from bot.supervisor import WorkerPool
+
+QUERIES = ("диван", "стол", "велосипед", "шкаф")
+
+
+class FakeBotApi:
+    """Minimal Bot API: answers sendMessage with a message, anything else with True."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.replies = 0
+        self.target = 0
+        self.done = asyncio.Event()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+        method = request.match_info["method"]
+        if method.lower() != "sendmessage":
+            return web.json_response({"ok": True, "result": True})
+        form = await request.post()
+        self.replies += 1
+        if self.replies >= self.target:
+            self.done.set()
+        chat_id = int(form["chat_id"])
+        result = {
+            "message_id": self.replies,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": "ok",
+        }
+        return web.json_response({"ok": True, "result": result})
+
+
+def _update(update_id: int, user_id: int) -> dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": f"/search {QUERIES[update_id % len(QUERIES)]}",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 7}],
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _seed(db_path: Path) -> None:
+    crud.configure(db_path)
+    await crud.init_db()
+    for i in range(200):
+        ad_id = await crud.create_ad(
+            AdCreate(
+                user_id=1_000_000 + i,
+                username=None,
+                phone=None,
+                title=f"{QUERIES[i % len(QUERIES)]} номер {i}",
+                description="В хорошем состоянии",
+                price_text="1000",
+                price_value=1000,
+                category="Мебель",
+                photos=[],
+                city="Киев",
+            )
+        )
+        await crud.update_ad_status(ad_id, "published")
+    await crud.close_db()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--api-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.api_ms / 1000)
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = _free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    # Worker processes read their settings from the environment.
+    os.environ.update(
+        BOT_TOKEN="42:benchmark",
+        TELEGRAM_API_URL=f"http://127.0.0.1:{port}",
+        RATE_LIMIT_GLOBAL_PER_SECOND="1000000",
+        RATE_LIMIT_PRIVATE_PER_SECOND="1000000",
+        RATE_LIMIT_GROUP_PER_MINUTE="1000000",
+        WEBHOOK_URL="",
+    )
+    baseline = None
+    try:
+        for workers in range(1, args.max_workers + 1):
+            with tempfile.TemporaryDirectory() as tmp:
+                os.environ["DB_PATH"] = str(Path(tmp) / "sharding.db")
+                await _seed(Path(os.environ["DB_PATH"]))
+                pool = WorkerPool(workers)
+                await pool.start()
+                api.replies = 0
+                api.target = args.updates
+                api.done.clear()
+                start = time.perf_counter()
+                for update_id in range(1, args.updates + 1):
+                    await pool.dispatch(_update(update_id, 1 + update_id % args.users))
+                await api.done.wait()
+                elapsed = time.perf_counter() - start
+                await pool.close()
+            rate = args.updates / elapsed
+            baseline = baseline or rate
+            print(
+                f"{workers} worker(s): {args.updates} updates in {elapsed:.2f}s, "
+                f"{rate:.0f} updates/s ({rate / baseline:.2f}x)"
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+"""Webhook endpoint under concurrent deliveries: acknowledgement and handler latency.
+
+Run: python -m benchmarks.webhook_load [--updates 2000] [--users 500] [--concurrency 100]
+                                      [--in-flight 40] [--api-ms 30]
+
+The real routers run behind the webhook server on localhost. ``users`` users
+send ``updates`` /search commands, ``concurrency`` HTTP requests at a time;
+Bot API calls go to a fake session that answers after ``api-ms``. The script
+reports how long Telegram would wait for the HTTP answer, how long updates
+took to handle, and checks that a wrong secret token is refused.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import os
+import socket
+import tempfile
+import time
+from collections.abc import AsyncGenerator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, Message
+
+from bot.config import get_settings
+from bot.database import crud
+from bot.database.fsm_storage import SQLiteStorage
+from bot.database.models import AdCreate
+from bot.handlers import all_routers
+from bot.services import metrics
+from bot.webhook import start_webhook_server
+
+SECRET = "benchmark-secret"
+QUERIES = ("диван", "стол", "велосипед", "шкаф")
+
+
+class FakeSession(BaseSession):
+    """Answers every Bot API call after a fixed delay."""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    async def make_request(self, bot: Bot, method: Any, timeout: int | None = None) -> Any:
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        returning = method.__returning__
+        if returning is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message(
+                message_id=self.calls,
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text="ok",
+            )
+        if returning is bool:
+            return True
+        return None
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, url: str, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+def _update(update_id: int, user_id: int) -> dict[str, Any]:
+    user = {"id": user_id, "is_bot": False, "first_name": "User"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": f"/search {QUERIES[update_id % len(QUERIES)]}",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 7}],
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--in-flight", type=int, default=40)
+    parser.add_argument("--api-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("BOT_TOKEN", "42:benchmark")
+    settings = dataclasses.replace(
+        get_settings(),
+        webhook_host="127.0.0.1",
+        webhook_port=_free_port(),
+        webhook_secret=SECRET,
+        webhook_max_in_flight=args.in_flight,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        crud.configure(Path(tmp) / "webhook.db")
+        await crud.init_db()
+        for i in range(200):
+            ad_id = await crud.create_ad(
+                AdCreate(
+                    user_id=1_000_000 + i,
+                    username=None,
+                    phone=None,
+                    title=f"{QUERIES[i % len(QUERIES)]} номер {i}",
+                    description="В хорошем состоянии",
+                    price_text="1000",
+                    price_value=1000,
+                    category="Мебель",
+                    photos=[],
+                    city="Киев",
+                )
+            )
+            await crud.update_ad_status(ad_id, "published")
+
+        session = FakeSession(args.api_ms / 1000)
+        bot = Bot(settings.bot_token, session=session)
+        dp = Dispatcher(storage=SQLiteStorage())
+        for r in all_routers:
+            dp.include_router(r)
+        runner, handler = await start_webhook_server(dp, bot, settings)
+        url = f"http://127.0.0.1:{settings.webhook_port}{settings.webhook_path}"
+        metrics.reset()
+
+        acked: list[float] = []
+        statuses: dict[int, int] = {}
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async with aiohttp.ClientSession() as client:
+            async with client.post(
+                url, json=_update(0, 1), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+            ) as resp:
+                unauthorized = resp.status
+
+            async def deliver(update_id: int) -> None:
+                async with slots:
+                    started = time.perf_counter()
+                    async with client.post(
+                        url,
+                        json=_update(update_id, 1 + update_id % args.users),
+                        headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+                    ) as resp:
+                        await resp.read()
+                        statuses[resp.status] = statuses.get(resp.status, 0) + 1
+                    acked.append((time.perf_counter() - started) * 1000)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(deliver(i) for i in range(1, args.updates + 1)))
+            await handler.drain(timeout=60)
+            elapsed = time.perf_counter() - start
+
+        await runner.cleanup()
+        await dp.storage.close()
+        await crud.close_db()
+
+    print(
+        f"{args.updates} updates in {elapsed:.2f}s ({args.updates / elapsed:.0f}/s), "
+        f"{session.calls} Bot API calls, statuses {statuses}, wrong secret -> {unauthorized}"
+    )
+    print(f"ack: p50 {_percentile(acked, 0.5):.1f} ms, p99 {_percentile(acked, 0.99):.1f} ms")
+    for name, t in sorted(metrics.snapshot()["timings"].items()):
+        if name.startswith("webhook."):
+            print(f"{name}: p50 {t['p50']:.1f} ms, p99 {t['p99']:.1f} ms, max {t['max']:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
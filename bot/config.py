@@ -16,6 +16,31 @@ class Settings:
     moderation_chat_id: int | None
     publication_chat_id: int | None
     daily_ads_limit: int
+    db_read_pool_size: int
+    db_cache_size_kib: int
+    db_mmap_size: int
+    db_busy_timeout_ms: int
+    db_write_batch_size: int
+    db_write_batch_delay_ms: float
+    fsm_ttl_hours: float
+    fsm_cache_size: int
+    fsm_flush_interval_ms: float
+    rate_limit_global_per_second: float
+    rate_limit_private_per_second: float
+    rate_limit_group_per_minute: float
+    results_view: str
+    webhook_url: str | None
+    webhook_path: str
+    webhook_host: str
+    webhook_port: int
+    webhook_secret: str | None
+    webhook_max_in_flight: int
+    webhook_drain_timeout: float
+    workers: int
+    telegram_api_url: str | None
+    subscription_gate: str
+    subscription_ttl: float
+    subscription_negative_ttl: float
 
 
 def _parse_int_set(raw: str | None) -> set[int]:
@@ -36,6 +61,16 @@ def get_settings() -> Settings:
     token = os.getenv("BOT_TOKEN", "").strip()
     if not token:
         raise ValueError("BOT_TOKEN is required in .env")
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip() or None
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip() or None
+    if webhook_url and not webhook_secret:
+        raise ValueError("WEBHOOK_SECRET is required when WEBHOOK_URL is set")
+    results_view = os.getenv("RESULTS_VIEW", "list").strip().lower()
+    if results_view not in {"list", "cards"}:
+        raise ValueError("RESULTS_VIEW must be 'list' or 'cards'")
+    subscription_gate = os.getenv("SUBSCRIPTION_GATE", "start").strip().lower()
+    if subscription_gate not in {"start", "all"}:
+        raise ValueError("SUBSCRIPTION_GATE must be 'start' or 'all'")
 
     return Settings(
         bot_token=token,
@@ -44,4 +79,29 @@ def get_settings() -> Settings:
         moderation_chat_id=_parse_optional_int(os.getenv("MODERATION_CHAT_ID")),
         publication_chat_id=_parse_optional_int(os.getenv("PUBLICATION_CHAT_ID")),
         daily_ads_limit=int(os.getenv("DAILY_ADS_LIMIT", "3")),
+        db_read_pool_size=int(os.getenv("DB_READ_POOL_SIZE", "4")),
+        db_cache_size_kib=int(os.getenv("DB_CACHE_SIZE_KIB", "16384")),
+        db_mmap_size=int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+        db_busy_timeout_ms=int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+        db_write_batch_size=int(os.getenv("DB_WRITE_BATCH_SIZE", "64")),
+        db_write_batch_delay_ms=float(os.getenv("DB_WRITE_BATCH_DELAY_MS", "5")),
+        fsm_ttl_hours=float(os.getenv("FSM_TTL_HOURS", "72")),
+        fsm_cache_size=int(os.getenv("FSM_CACHE_SIZE", "10000")),
+        fsm_flush_interval_ms=float(os.getenv("FSM_FLUSH_INTERVAL_MS", "500")),
+        rate_limit_global_per_second=float(os.getenv("RATE_LIMIT_GLOBAL_PER_SECOND", "25")),
+        rate_limit_private_per_second=float(os.getenv("RATE_LIMIT_PRIVATE_PER_SECOND", "1")),
+        rate_limit_group_per_minute=float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE", "17")),
+        results_view=results_view,
+        webhook_url=webhook_url,
+        webhook_path=os.getenv("WEBHOOK_PATH", "/webhook"),
+        webhook_host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=int(os.getenv("WEBHOOK_PORT", "8080")),
+        webhook_secret=webhook_secret,
+        webhook_max_in_flight=int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "40")),
+        webhook_drain_timeout=float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30")),
+        workers=int(os.getenv("WORKERS", "") or os.cpu_count() or 1),
+        telegram_api_url=os.getenv("TELEGRAM_API_URL", "").strip() or None,
+        subscription_gate=subscription_gate,
+        subscription_ttl=float(os.getenv("SUBSCRIPTION_TTL", "600")),
+        subscription_negative_ttl=float(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "30")),
     )
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+from collections.abc import Callable, Sequence
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import aiosqlite
+
+if TYPE_CHECKING:
+    from bot.database.coordinator import WriteCoordinator
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# WriteBatcher and ConnectionPool.read run callables on aiosqlite's worker
+# thread through the private Connection._execute and Connection._conn; fail
+# at import rather than on the first query if an aiosqlite release renames
+# them.
+if not all(hasattr(aiosqlite.Connection, name) for name in ("_execute", "_conn")):
+    raise ImportError(
+        f"aiosqlite {aiosqlite.__version__} lacks Connection._execute/_conn; "
+        "install a version allowed by requirements.txt"
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class WriteResult:
+    lastrowid: int | None
+    rowcount: int
+
+
+def statement(sql: str, params: Sequence[Any] = ()) -> Callable[[sqlite3.Connection], WriteResult]:
+    def op(conn: sqlite3.Connection) -> WriteResult:
+        cursor = conn.execute(sql, params)
+        return WriteResult(cursor.lastrowid, cursor.rowcount)
+
+    return op
+
+
+@dataclass(slots=True)
+class _PendingWrite:
+    op: Callable[[sqlite3.Connection], Any]
+    future: asyncio.Future[Any]
+    invalidates: bool
+
+
+class WriteBatcher:
+    """Group commit for the writer connection.
+
+    Mutations from concurrent handlers are queued and committed together in
+    one transaction once ``max_batch`` operations are waiting or ``max_delay``
+    seconds have passed since the first one arrived. Each operation runs inside
+    its own SAVEPOINT, so a failing statement only fails its own caller.
+    With a ``coordinator`` the transaction also holds its cross-process lock,
+    and a commit that applied an operation submitted with ``invalidates``
+    tells the other processes to drop their caches.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        max_batch: int = 64,
+        max_delay: float = 0.005,
+        coordinator: WriteCoordinator | None = None,
+    ) -> None:
+        self._conn = conn
+        self._coordinator = coordinator
+        self._max_batch = max(1, max_batch)
+        self._max_delay = max(0.0, max_delay)
+        self._pending: list[_PendingWrite] = []
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task[None] | None = None
+        self.commits = 0
+        self.operations = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="sqlite-write-batcher")
+
+    async def submit(self, op: Callable[[sqlite3.Connection], T], invalidates: bool = False) -> T:
+        if self._closing:
+            raise RuntimeError("Write batcher is closed")
+        self.start()
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingWrite(op, future, invalidates))
+        self._wakeup.set()
+        if len(self._pending) >= self._max_batch:
+            self._full.set()
+        return await future
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> WriteResult:
+        return await self.submit(statement(sql, params))
+
+    async def close(self) -> None:
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                continue
+            if not self._full.is_set() and self._max_delay:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self._max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[: self._max_batch]
+            del self._pending[: self._max_batch]
+            if len(self._pending) < self._max_batch and not self._closing:
+                self._full.clear()
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[_PendingWrite]) -> None:
+        ops = [item.op for item in batch]
+        invalidates = [item.invalidates for item in batch]
+        try:
+            # aiosqlite has no public hook for running a callable on its worker
+            # thread; _execute lets the whole batch cost a single thread hop.
+            outcomes = await self._conn._execute(
+                _commit_batch, self._conn._conn, ops, self._coordinator, invalidates
+            )
+        except Exception as exc:
+            log.exception("Group commit of %s writes failed", len(batch))
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        self.commits += 1
+        self.operations += len(batch)
+        for item, (ok, value) in zip(batch, outcomes):
+            if item.future.done():
+                continue
+            if ok:
+                item.future.set_result(value)
+            else:
+                item.future.set_exception(value)
+
+
+def _commit_batch(
+    conn: sqlite3.Connection,
+    ops: list[Callable[[sqlite3.Connection], Any]],
+    coordinator: WriteCoordinator | None = None,
+    invalidates: Sequence[bool] = (),
+) -> list[tuple[bool, Any]]:
+    outcomes: list[tuple[bool, Any]] = []
+    # Blocking on the lock is fine here: this runs on the writer's own thread.
+    with coordinator.writing() if coordinator is not None else nullcontext():
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                conn.execute("SAVEPOINT batch_op")
+                try:
+                    result = op(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO batch_op")
+                    conn.execute("RELEASE batch_op")
+                    outcomes.append((False, exc))
+                else:
+                    conn.execute("RELEASE batch_op")
+                    outcomes.append((True, result))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if coordinator is not None and any(
+            flag and ok for flag, (ok, _) in zip(invalidates, outcomes)
+        ):
+            coordinator.invalidated()
+    return outcomes
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TtlLruCache(Generic[K, V]):
+    """Bounded in-process cache with per-entry TTL and LRU eviction.
+
+    ``generation`` is bumped on every invalidation. A reader that captured it
+    before querying passes it to ``put`` so a result computed concurrently
+    with a write is never stored after that write invalidated it.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: K, value: V, generation: int | None = None) -> None:
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> None:
+        self.generation += 1
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EntityCache(Generic[K, V]):
+    """Size-bounded, versioned read-through cache for single entities.
+
+    Every invalidation bumps a version counter and marks the key dirty at
+    that version. A load that started before the key was dirtied does not
+    populate the cache, so a read racing a write cannot resurrect stale data.
+    Dirty marks are only needed while loads are in flight and are dropped
+    once none are.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._version = 0
+        self._dirty: dict[K, int] = {}
+        self._cleared_at = 0
+        self._inflight = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: K, load: Callable[[], Awaitable[V | None]]) -> V | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        started_at = self._version
+        self._inflight += 1
+        try:
+            value = await load()
+        finally:
+            self._inflight -= 1
+        if (
+            value is not None
+            and self._cleared_at <= started_at
+            and self._dirty.get(key, 0) <= started_at
+        ):
+            self._entries[key] = value
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        if not self._inflight:
+            self._dirty.clear()
+        return value
+
+    def invalidate(self, key: K) -> None:
+        self._version += 1
+        self._entries.pop(key, None)
+        if self._inflight:
+            self._dirty[key] = self._version
+
+    def clear(self) -> None:
+        self._version += 1
+        self._cleared_at = self._version
+        self._entries.clear()
+        self._dirty.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
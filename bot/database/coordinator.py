@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import multiprocessing
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+
+class WriteCoordinator:
+    """Coordinates several processes writing to one SQLite file.
+
+    Group commits take a shared lock before BEGIN IMMEDIATE, so processes
+    queue for the write lock instead of sleeping in SQLite's busy handler.
+    A commit holding a write that changes cached data (ads, not FSM state or
+    outbox bookkeeping) also bumps a shared counter; ``changed_elsewhere``
+    tells a process that another one changed such data since it last looked,
+    so its in-memory caches must be dropped.
+
+    Create it in the parent and hand it to the child processes when they are
+    started; the lock and counter only survive pickling at that point.
+    """
+
+    def __init__(self, context: Any = None) -> None:
+        context = context or multiprocessing.get_context("spawn")
+        self._lock = context.Lock()
+        self._invalidations = context.Value("Q", 0, lock=False)
+        self._seen = 0
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        """Hold the write lock; call ``invalidated`` inside the block when needed."""
+        with self._lock:
+            yield
+
+    def invalidated(self) -> None:
+        # Runs under the lock, after the commit. If nobody else changed
+        # cached data since this process last looked, its own write needs
+        # no cache flush.
+        current = self._invalidations.value
+        self._invalidations.value = current + 1
+        if current == self._seen:
+            self._seen = current + 1
+
+    def changed_elsewhere(self) -> bool:
+        current = self._invalidations.value
+        if current == self._seen:
+            return False
+        self._seen = current
+        return True
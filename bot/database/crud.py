@@ -1,40 +1,265 @@
 from __future__ import annotations
 
 import asyncio
+import base64
 import json
+import logging
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import replace
 from pathlib import Path
+from typing import Any, TypeVar
 
 import aiosqlite
 from sqlite3 import OperationalError
 
-from bot.database.models import AdCreate, AdRecord
+from bot.database.batch import WriteResult, statement
+from bot.database.cache import EntityCache, TtlLruCache
+from bot.database.coordinator import WriteCoordinator
+from bot.database.fuzzy import match_distance, trigram_query
+from bot.database.limits import SlidingWindowCounter
+from bot.database.models import (
+    AdCreate,
+    AdPage,
+    AdRecord,
+    AdSummary,
+    AdSummaryPage,
+    OutboxJob,
+    PublishedMessage,
+)
+from bot.database.pool import ConnectionPool, PoolOptions
+from bot.database.stemmer import stem, tokenize
+
+log = logging.getLogger(__name__)
 
 _DB_PATH = Path("baraholka.db")
-_DB: aiosqlite.Connection | None = None
+_POOL_OPTIONS = PoolOptions()
+_POOL: ConnectionPool | None = None
+_COORDINATOR: WriteCoordinator | None = None
 _DB_LOCK = asyncio.Lock()
+_MAX_ID = 2**63 - 1
+
+T = TypeVar("T")
+
+# Result pages of search and category browsing, stored as id lists and keyed
+# by ("search" | "fuzzy" | "category", normalized key, limit, cursor).
+_RESULTS: TtlLruCache[tuple[Any, ...], tuple[list[int], str | None]] = TtlLruCache(
+    max_entries=512,
+    ttl=60.0,
+)
+
+AdFull = tuple[AdRecord, int | None, list[int]]
+# (chat_id, [(message_id, content)]) of an ad's channel messages.
+PublishedMessages = tuple[int | None, list[tuple[int, PublishedMessage | None]]]
+
+# get_ad_full_by_id results by ad id; every write path invalidates its ad.
+_ADS: EntityCache[int, AdFull] = EntityCache(max_entries=1024)
+
+# Creation times of every user's ads from the last day, warmed by init_db.
+_RECENT_ADS = SlidingWindowCounter(window=24 * 60 * 60)
+
 
+class DailyLimitExceeded(Exception):
+    """create_ad was asked to respect a daily limit the user already reached."""
 
-def configure(db_path: Path) -> None:
-    global _DB_PATH
+
+def configure(
+    db_path: Path,
+    pool_options: PoolOptions | None = None,
+    coordinator: WriteCoordinator | None = None,
+) -> None:
+    """Set the database file; pass ``coordinator`` when other processes share it."""
+    global _DB_PATH, _POOL_OPTIONS, _COORDINATOR
     _DB_PATH = db_path
+    if pool_options is not None:
+        _POOL_OPTIONS = pool_options
+    _COORDINATOR = coordinator
 
 
-async def _get_db() -> aiosqlite.Connection:
-    global _DB
-    if _DB is None:
+async def _get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is None:
         async with _DB_LOCK:
-            if _DB is None:
-                _DB = await aiosqlite.connect(_DB_PATH)
-                _DB.row_factory = aiosqlite.Row
-                await _DB.execute("PRAGMA journal_mode=WAL;")
-    return _DB
+            if _POOL is None:
+                pool = ConnectionPool(_DB_PATH, _POOL_OPTIONS, _COORDINATOR)
+                await pool.open()
+                _POOL = pool
+    return _POOL
+
+
+async def _get_db() -> aiosqlite.Connection:
+    """Return the single writer connection."""
+    pool = await _get_pool()
+    return pool.writer
+
+
+async def _write_op(op: Callable[[sqlite3.Connection], T], ad_data: bool = False) -> T:
+    """Queue a mutation on the group-commit writer and wait for its commit.
+
+    ``op`` runs on the writer thread inside its own savepoint, so several
+    statements in one op are applied atomically. Pass ``ad_data`` when it
+    changes ads or their photos or publications, so other processes drop
+    their cached reads.
+    """
+    pool = await _get_pool()
+    return await pool.batcher.submit(op, invalidates=ad_data)
+
+
+async def _write_tracked(
+    ad_id: int,
+    write: Callable[[sqlite3.Connection], WriteResult],
+) -> tuple[WriteResult, Any]:
+    """Run ``write`` on the group-commit writer and also return the ad's
+    (status, category) as it was before the write."""
+
+    def op(conn: sqlite3.Connection) -> tuple[WriteResult, Any]:
+        before = conn.execute(
+            "SELECT status, category FROM ads WHERE id = ?", (ad_id,)
+        ).fetchone()
+        return write(conn), before
+
+    return await _write_op(op, ad_data=True)
+
+
+async def _read(fn: Callable[..., T], *args: Any) -> T:
+    """Run ``fn(conn, *args)`` on a reader connection in a single thread hop.
+
+    ``fn`` receives the raw sqlite3 connection and should execute, fetch and
+    decode everything it needs before returning.
+    """
+    pool = await _get_pool()
+    return await pool.read(fn, *args)
+
+
+def cache_stats() -> dict[str, int]:
+    return {
+        "results_size": len(_RESULTS),
+        "results_hits": _RESULTS.hits,
+        "results_misses": _RESULTS.misses,
+        "ads_size": len(_ADS),
+        "ads_hits": _ADS.hits,
+        "ads_misses": _ADS.misses,
+    }
+
+
+def _sync_caches() -> None:
+    """Drop cached reads if another process changed ad data since the last check."""
+    if _COORDINATOR is not None and _COORDINATOR.changed_elsewhere():
+        _ADS.clear()
+        _RESULTS.clear()
+
+
+def _invalidate_results(result: WriteResult, before: Any, new_status: str) -> None:
+    """Drop cached pages whose published set was changed by a status write."""
+    if not result.rowcount or before is None:
+        return
+    old_status, category = before
+    if (old_status == "published") == (new_status == "published"):
+        return
+    _RESULTS.invalidate(lambda key: key[0] != "category" or key[1] == category)
+
+
+IdPage = tuple[list[int], str | None]
+
+_SUMMARY_COLUMNS = """
+    id, user_id, username, title, price_text, category, city, status,
+    EXISTS (SELECT 1 FROM ad_photos p WHERE p.ad_id = ads.id) AS has_photos
+"""
+
+
+async def _cached_ids(key: tuple[Any, ...], load: Callable[[], Awaitable[IdPage]]) -> IdPage:
+    _sync_caches()
+    cached = _RESULTS.get(key)
+    if cached is None:
+        generation = _RESULTS.generation
+        cached = await load()
+        _RESULTS.put(key, cached, generation)
+    return cached
+
+
+async def _through_result_cache(
+    key: tuple[Any, ...],
+    load: Callable[[], Awaitable[IdPage]],
+) -> AdPage:
+    """Resolve a page of ad ids through _RESULTS, then load the full records.
+
+    Ranking and paging queries only project ids, so descriptions and photos
+    are read solely for the ads that end up on the page.
+    """
+    ids, next_cursor = await _cached_ids(key, load)
+    return AdPage(items=await _load_published(ids), next_cursor=next_cursor)
+
+
+async def _summaries_through_result_cache(
+    key: tuple[Any, ...],
+    load: Callable[[], Awaitable[IdPage]],
+) -> AdSummaryPage:
+    """Like _through_result_cache, for list screens: only AdSummary columns are read."""
+    ids, next_cursor = await _cached_ids(key, load)
+    return AdSummaryPage(items=await _load_published_summaries(ids), next_cursor=next_cursor)
+
+
+async def _load_published(ids: list[int]) -> list[AdRecord]:
+    if not ids:
+        return []
+
+    def query(conn: sqlite3.Connection) -> list[AdRecord]:
+        cursor = conn.execute(
+            f"""
+            SELECT * FROM ads
+            WHERE id IN ({', '.join('?' * len(ids))}) AND status = 'published'
+            """,
+            ids,
+        )
+        by_id = {row["id"]: row for row in cursor}
+        return _records(conn, [by_id[ad_id] for ad_id in ids if ad_id in by_id])
+
+    return await _read(query)
+
+
+async def _load_published_summaries(ids: list[int]) -> list[AdSummary]:
+    if not ids:
+        return []
+
+    def query(conn: sqlite3.Connection) -> list[AdSummary]:
+        cursor = conn.execute(
+            f"""
+            SELECT {_SUMMARY_COLUMNS} FROM ads
+            WHERE id IN ({', '.join('?' * len(ids))}) AND status = 'published'
+            """,
+            ids,
+        )
+        by_id = {row["id"]: row for row in cursor}
+        return [AdSummary.from_row(by_id[ad_id]) for ad_id in ids if ad_id in by_id]
+
+    return await _read(query)
+
+
+def _records(conn: sqlite3.Connection, rows: list[sqlite3.Row]) -> list[AdRecord]:
+    """Build AdRecords for ``rows``, loading all their photos in one query."""
+    if not rows:
+        return []
+    ids = [row["id"] for row in rows]
+    cursor = conn.execute(
+        f"""
+        SELECT ad_id, file_id FROM ad_photos
+        WHERE ad_id IN ({', '.join('?' * len(ids))})
+        ORDER BY ad_id, position
+        """,
+        ids,
+    )
+    photos: dict[int, list[str]] = {}
+    for ad_id, file_id in cursor:
+        photos.setdefault(ad_id, []).append(file_id)
+    return [AdRecord.from_row(row, photos.get(row["id"], [])) for row in rows]
 
 
 async def close_db() -> None:
-    global _DB
-    if _DB is not None:
-        await _DB.close()
-        _DB = None
+    global _POOL
+    if _POOL is not None:
+        await _POOL.close()
+        _POOL = None
 
 
 async def init_db() -> None:
@@ -68,32 +293,6 @@ async def init_db() -> None:
         )
         """
     )
-    await db.execute(
-        """
-        CREATE TRIGGER IF NOT EXISTS ads_ai AFTER INSERT ON ads BEGIN
-            INSERT INTO ads_fts(rowid, title, description, city)
-            VALUES (new.id, new.title, new.description, new.city);
-        END;
-        """
-    )
-    await db.execute(
-        """
-        CREATE TRIGGER IF NOT EXISTS ads_ad AFTER DELETE ON ads BEGIN
-            INSERT INTO ads_fts(ads_fts, rowid, title, description, city)
-            VALUES ('delete', old.id, old.title, old.description, old.city);
-        END;
-        """
-    )
-    await db.execute(
-        """
-        CREATE TRIGGER IF NOT EXISTS ads_au AFTER UPDATE ON ads BEGIN
-            INSERT INTO ads_fts(ads_fts, rowid, title, description, city)
-            VALUES ('delete', old.id, old.title, old.description, old.city);
-            INSERT INTO ads_fts(rowid, title, description, city)
-            VALUES (new.id, new.title, new.description, new.city);
-        END;
-        """
-    )
     await _ensure_column(
         db,
         "ads",
@@ -113,7 +312,13 @@ async def init_db() -> None:
     await db.execute("CREATE INDEX IF NOT EXISTS idx_ads_created_at ON ads(created_at)")
     await db.execute("CREATE INDEX IF NOT EXISTS idx_ads_status_category ON ads(status, category)")
     await db.execute("CREATE INDEX IF NOT EXISTS idx_ads_status_city ON ads(status, city)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ads_status_title ON ads(status, title)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ads_user_created ON ads(user_id, created_at)"
+    )
+    await _apply_migrations(db)
     await db.commit()
+    await warm_daily_limits()
 
 
 async def _ensure_column(
@@ -129,9 +334,242 @@ async def _ensure_column(
         await db.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}")
 
 
-async def count_ads_last_24h(user_id: int) -> int:
-    db = await _get_db()
-    cursor = await db.execute(
+# Statuses whose rows are kept out of ads_fts entirely.
+_UNINDEXED_STATUSES = "('deleted', 'rejected')"
+
+
+async def _sync_fts_index(
+    db: aiosqlite.Connection,
+    fts_table: str,
+    trigger_prefix: str,
+    columns: tuple[str, ...],
+) -> None:
+    """(Re)create the triggers that keep an external-content FTS table in sync.
+
+    The table is only touched when indexed text or indexability actually
+    changes, and it is rebuilt once from the rows that should be indexed.
+    """
+    cols = ", ".join(columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    text_changed = "\n          OR ".join(f"old.{c} IS NOT new.{c}" for c in columns)
+    for suffix in ("ai", "ad", "au"):
+        await db.execute(f"DROP TRIGGER IF EXISTS {trigger_prefix}_{suffix}")
+    await db.execute(
+        f"""
+        CREATE TRIGGER {trigger_prefix}_ai AFTER INSERT ON ads
+        WHEN new.status NOT IN {_UNINDEXED_STATUSES}
+        BEGIN
+            INSERT INTO {fts_table}(rowid, {cols})
+            VALUES (new.id, {new_cols});
+        END;
+        """
+    )
+    await db.execute(
+        f"""
+        CREATE TRIGGER {trigger_prefix}_ad AFTER DELETE ON ads
+        WHEN old.status NOT IN {_UNINDEXED_STATUSES}
+        BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols})
+            VALUES ('delete', old.id, {old_cols});
+        END;
+        """
+    )
+    # One trigger with guarded statements keeps the delete-before-insert
+    # order that the external-content 'delete' command relies on.
+    await db.execute(
+        f"""
+        CREATE TRIGGER {trigger_prefix}_au AFTER UPDATE OF {cols}, status ON ads
+        WHEN {text_changed}
+          OR (old.status IN {_UNINDEXED_STATUSES}) != (new.status IN {_UNINDEXED_STATUSES})
+        BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols})
+            SELECT 'delete', old.id, {old_cols}
+            WHERE old.status NOT IN {_UNINDEXED_STATUSES};
+            INSERT INTO {fts_table}(rowid, {cols})
+            SELECT new.id, {new_cols}
+            WHERE new.status NOT IN {_UNINDEXED_STATUSES};
+        END;
+        """
+    )
+    await db.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('delete-all')")
+    await db.execute(
+        f"""
+        INSERT INTO {fts_table}(rowid, {cols})
+        SELECT id, {cols} FROM ads
+        WHERE status NOT IN {_UNINDEXED_STATUSES}
+        """
+    )
+
+
+async def _migrate_scoped_fts_triggers(db: aiosqlite.Connection) -> None:
+    await _sync_fts_index(db, "ads_fts", "ads", ("title", "description", "city"))
+
+
+async def _migrate_trigram_index(db: aiosqlite.Connection) -> None:
+    """Trigram index over title and city for typo-tolerant search."""
+    await db.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS ads_trigram USING fts5(
+            title, city, content='ads', content_rowid='id',
+            tokenize='trigram', detail=none
+        )
+        """
+    )
+    await _sync_fts_index(db, "ads_trigram", "ads_trigram", ("title", "city"))
+
+
+async def _migrate_normalized_photos(db: aiosqlite.Connection) -> None:
+    """Move photos_json and publication_message_ids_json into their own tables."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ad_photos (
+            ad_id INTEGER NOT NULL REFERENCES ads(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            file_id TEXT NOT NULL,
+            file_unique_id TEXT,
+            PRIMARY KEY (ad_id, position)
+        ) WITHOUT ROWID
+        """
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ad_photos_file_unique_id ON ad_photos(file_unique_id)"
+    )
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ad_publications (
+            ad_id INTEGER NOT NULL REFERENCES ads(id) ON DELETE CASCADE,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (ad_id, message_id)
+        ) WITHOUT ROWID
+        """
+    )
+    await db.execute(
+        """
+        INSERT OR IGNORE INTO ad_photos (ad_id, position, file_id)
+        SELECT a.id, p.key, p.value
+        FROM ads a, json_each(a.photos_json) p
+        """
+    )
+    await db.execute(
+        """
+        INSERT OR IGNORE INTO ad_publications (ad_id, chat_id, message_id)
+        SELECT a.id, a.publication_chat_id, m.value
+        FROM ads a, json_each(a.publication_message_ids_json) m
+        WHERE a.publication_chat_id IS NOT NULL
+        """
+    )
+    await db.execute(
+        """
+        UPDATE ads
+        SET photos_json = '[]',
+            publication_chat_id = NULL,
+            publication_message_ids_json = '[]'
+        WHERE photos_json != '[]' OR publication_chat_id IS NOT NULL
+        """
+    )
+
+
+async def _migrate_fsm_states(db: aiosqlite.Connection) -> None:
+    """Table behind bot.database.fsm_storage.SQLiteStorage."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data_json TEXT NOT NULL DEFAULT '{}',
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states(updated_at)"
+    )
+
+
+async def _migrate_outbox(db: aiosqlite.Connection) -> None:
+    """Queue of Telegram side effects run by bot.services.outbox."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload_json TEXT NOT NULL,
+            dedupe_key TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL,
+            last_error TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(state, run_after)")
+    # At most one live job per dedupe key; failed jobs may be retried anew.
+    await db.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_dedupe ON outbox(dedupe_key)
+        WHERE dedupe_key IS NOT NULL AND state != 'failed'
+        """
+    )
+
+
+async def _migrate_publication_snapshot(db: aiosqlite.Connection) -> None:
+    """Remember what each published message shows so republishing can edit it."""
+    for column in ("kind", "file_id", "body", "markup"):
+        await db.execute(f"ALTER TABLE ad_publications ADD COLUMN {column} TEXT")
+
+
+# Applied in order; the 1-based position is stored in PRAGMA user_version.
+_MIGRATIONS = (
+    _migrate_scoped_fts_triggers,
+    _migrate_trigram_index,
+    _migrate_normalized_photos,
+    _migrate_fsm_states,
+    _migrate_outbox,
+    _migrate_publication_snapshot,
+)
+
+
+async def _apply_migrations(db: aiosqlite.Connection) -> None:
+    async with db.execute("PRAGMA user_version") as cursor:
+        row = await cursor.fetchone()
+    version = int(row[0]) if row else 0
+    for number, migration in enumerate(_MIGRATIONS, start=1):
+        if version < number:
+            await migration(db)
+            await db.execute(f"PRAGMA user_version = {number}")
+
+
+async def warm_daily_limits() -> None:
+    """Load the last day of ad creation times into the in-memory window."""
+
+    def query(conn: sqlite3.Connection) -> list[tuple[int, float]]:
+        return conn.execute(
+            """
+            SELECT user_id, CAST(strftime('%s', created_at) AS REAL)
+            FROM ads
+            WHERE created_at >= datetime('now', '-1 day')
+            """
+        ).fetchall()
+
+    _RECENT_ADS.load(await _read(query))
+
+
+async def count_ads_last_24h(user_id: int, from_db: bool = False) -> int:
+    """Number of ads ``user_id`` created in the last 24 hours.
+
+    Answered from memory once warm_daily_limits has run; ``from_db`` forces
+    the indexed query.
+    """
+    if _RECENT_ADS.warm and not from_db:
+        return _RECENT_ADS.count(user_id)
+    return await _read(_count_recent_ads, user_id)
+
+
+def _count_recent_ads(conn: sqlite3.Connection, user_id: int) -> int:
+    row = conn.execute(
         """
         SELECT COUNT(*)
         FROM ads
@@ -139,36 +577,75 @@ async def count_ads_last_24h(user_id: int) -> int:
           AND created_at >= datetime('now', '-1 day')
         """,
         (user_id,),
-    )
-    row = await cursor.fetchone()
+    ).fetchone()
     return int(row[0]) if row else 0
 
 
-async def create_ad(ad: AdCreate) -> int:
-    db = await _get_db()
-    cursor = await db.execute(
-        """
-        INSERT INTO ads (
-            user_id, username, phone, title, description, price_text,
-            price_value, category, photos_json, city, status
+async def create_ad(ad: AdCreate, daily_limit: int | None = None) -> int:
+    """Insert a pending ad and return its id.
+
+    With ``daily_limit`` the quota check and the insert are atomic: the
+    in-memory window is reserved before the write is queued, and the write
+    itself re-counts inside its transaction, which also covers a cold window
+    or other processes writing the same file. Raises DailyLimitExceeded.
+    """
+    stamp: float | None = None
+    if daily_limit is not None and _RECENT_ADS.warm:
+        stamp = _RECENT_ADS.try_add(ad.user_id, daily_limit)
+        if stamp is None:
+            raise DailyLimitExceeded(ad.user_id)
+
+    def op(conn: sqlite3.Connection) -> int:
+        if daily_limit is not None and _count_recent_ads(conn, ad.user_id) >= daily_limit:
+            raise DailyLimitExceeded(ad.user_id)
+        cursor = conn.execute(
+            """
+            INSERT INTO ads (
+                user_id, username, phone, title, description, price_text,
+                price_value, category, city, status
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+            """,
+            (
+                ad.user_id,
+                ad.username,
+                ad.phone,
+                ad.title,
+                ad.description,
+                ad.price_text,
+                ad.price_value,
+                ad.category,
+                ad.city,
+            ),
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
-        """,
-        (
-            ad.user_id,
-            ad.username,
-            ad.phone,
-            ad.title,
-            ad.description,
-            ad.price_text,
-            ad.price_value,
-            ad.category,
-            json.dumps(ad.photos, ensure_ascii=True),
-            ad.city,
-        ),
+        ad_id = int(cursor.lastrowid)
+        _insert_photos(conn, ad_id, ad.photos, ad.photo_unique_ids)
+        return ad_id
+
+    try:
+        ad_id = await _write_op(op, ad_data=True)
+    except BaseException:
+        if stamp is not None:
+            _RECENT_ADS.discard(ad.user_id, stamp)
+        raise
+    if stamp is None and _RECENT_ADS.warm:
+        _RECENT_ADS.add(ad.user_id, time.time())
+    return ad_id
+
+
+def _insert_photos(
+    conn: sqlite3.Connection,
+    ad_id: int,
+    file_ids: list[str],
+    unique_ids: list[str],
+) -> None:
+    conn.executemany(
+        "INSERT INTO ad_photos (ad_id, position, file_id, file_unique_id) VALUES (?, ?, ?, ?)",
+        [
+            (ad_id, position, file_id, unique_ids[position] if position < len(unique_ids) else None)
+            for position, file_id in enumerate(file_ids)
+        ],
     )
-    await db.commit()
-    return int(cursor.lastrowid)
 
 
 async def get_ad_by_id(ad_id: int) -> AdRecord | None:
@@ -176,155 +653,449 @@ async def get_ad_by_id(ad_id: int) -> AdRecord | None:
     return result[0] if result else None
 
 
-async def get_ad_full_by_id(ad_id: int) -> tuple[AdRecord, int | None, list[int]] | None:
-    db = await _get_db()
-    cursor = await db.execute("SELECT * FROM ads WHERE id = ?", (ad_id,))
-    row = await cursor.fetchone()
+async def get_ad_full_by_id(ad_id: int) -> AdFull | None:
+    _sync_caches()
+    cached = await _ADS.get_or_load(ad_id, lambda: _load_ad_full(ad_id))
+    if cached is None:
+        return None
+    # Hand out copies so no handler can mutate the shared cached entry.
+    ad, publication_chat_id, message_ids = cached
+    return replace(ad, photos=list(ad.photos)), publication_chat_id, list(message_ids)
+
+
+async def _load_ad_full(ad_id: int) -> AdFull | None:
+    return await _read(_select_ad_full, ad_id)
+
+
+def _select_ad_full(conn: sqlite3.Connection, ad_id: int) -> AdFull | None:
+    row = conn.execute("SELECT * FROM ads WHERE id = ?", (ad_id,)).fetchone()
     if not row:
         return None
-    photos = json.loads(row["photos_json"] or "[]")
-    ad = AdRecord.from_row(row, photos)
-    publication_chat_id = row["publication_chat_id"]
-    message_ids = json.loads(row["publication_message_ids_json"] or "[]")
-    return ad, publication_chat_id, [int(x) for x in message_ids]
+    (ad,) = _records(conn, [row])
+    publications = conn.execute(
+        "SELECT chat_id, message_id FROM ad_publications WHERE ad_id = ? ORDER BY message_id",
+        (ad_id,),
+    ).fetchall()
+    publication_chat_id = publications[0]["chat_id"] if publications else None
+    return ad, publication_chat_id, [int(p["message_id"]) for p in publications]
 
 
-async def get_user_ads(user_id: int, limit: int = 20) -> list[AdRecord]:
-    db = await _get_db()
-    cursor = await db.execute(
-        """
-        SELECT * FROM ads
-        WHERE user_id = ? AND status != 'deleted'
-        ORDER BY id DESC
-        LIMIT ?
-        """,
-        (user_id, limit),
-    )
-    rows = await cursor.fetchall()
-    return [
-        AdRecord.from_row(row, json.loads(row["photos_json"] or "[]"))
-        for row in rows
-    ]
+def _encode_cursor(*keys: Any) -> str:
+    raw = json.dumps(list(keys), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
-async def search_ads(query: str, limit: int = 20) -> list[AdRecord]:
-    cleaned = _sanitize_fts_query(query)
-    if not cleaned:
-        return []
-    db = await _get_db()
+def _decode_cursor(cursor: str | None, size: int) -> list[Any] | None:
+    """Return the sort keys of the last row of the previous page."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        keys = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError as exc:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from exc
+    if not isinstance(keys, list) or len(keys) != size:
+        raise ValueError(f"Invalid page cursor: {cursor!r}")
+    return keys
+
+
+def _before_id(cursor: str | None) -> int:
+    """Return the exclusive upper id bound encoded in an id-ordered cursor."""
+    keys = _decode_cursor(cursor, 1)
+    if keys is None:
+        return _MAX_ID
     try:
-        cursor = await db.execute(
+        return int(keys[0])
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from exc
+
+
+def _to_id_page(
+    rows: list[sqlite3.Row],
+    limit: int,
+    cursor_keys: Callable[[sqlite3.Row], tuple[Any, ...]] = lambda row: (row["id"],),
+) -> IdPage:
+    next_cursor = _encode_cursor(*cursor_keys(rows[limit - 1])) if len(rows) > limit else None
+    return [row["id"] for row in rows[:limit]], next_cursor
+
+
+def _to_page(
+    conn: sqlite3.Connection,
+    rows: list[sqlite3.Row],
+    limit: int,
+    cursor_keys: Callable[[sqlite3.Row], tuple[Any, ...]] = lambda row: (row["id"],),
+) -> AdPage:
+    items = _records(conn, rows[:limit])
+    next_cursor = _encode_cursor(*cursor_keys(rows[limit - 1])) if len(rows) > limit else None
+    return AdPage(items=items, next_cursor=next_cursor)
+
+
+def _to_summary_page(rows: list[sqlite3.Row], limit: int) -> AdSummaryPage:
+    next_cursor = _encode_cursor(rows[limit - 1]["id"]) if len(rows) > limit else None
+    return AdSummaryPage(
+        items=[AdSummary.from_row(row) for row in rows[:limit]],
+        next_cursor=next_cursor,
+    )
+
+
+async def get_user_ads(user_id: int, limit: int = 20, cursor: str | None = None) -> AdPage:
+    before_id = _before_id(cursor)
+
+    def query(conn: sqlite3.Connection) -> AdPage:
+        rows = conn.execute(
             """
-            SELECT a.*
-            FROM ads_fts f
-            JOIN ads a ON a.id = f.rowid
-            WHERE a.status = 'published' AND f MATCH ?
-            ORDER BY a.id DESC
+            SELECT * FROM ads
+            WHERE user_id = ? AND status != 'deleted' AND id < ?
+            ORDER BY id DESC
             LIMIT ?
             """,
-            (cleaned, limit),
-        )
-        rows = await cursor.fetchall()
-    except OperationalError:
-        # Fallback to LIKE if FTS query fails for any reason
-        pattern = f"%{query}%"
-        cursor = await db.execute(
-            """
-            SELECT * FROM ads
-            WHERE status = 'published'
-              AND (title LIKE ? OR description LIKE ? OR city LIKE ?)
+            (user_id, before_id, limit + 1),
+        ).fetchall()
+        return _to_page(conn, rows, limit)
+
+    return await _read(query)
+
+
+async def get_user_ad_summaries(
+    user_id: int,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> AdSummaryPage:
+    """Like get_user_ads, but only reads the columns of AdSummary."""
+    before_id = _before_id(cursor)
+
+    def query(conn: sqlite3.Connection) -> AdSummaryPage:
+        rows = conn.execute(
+            f"""
+            SELECT {_SUMMARY_COLUMNS} FROM ads
+            WHERE user_id = ? AND status != 'deleted' AND id < ?
             ORDER BY id DESC
             LIMIT ?
             """,
-            (pattern, pattern, pattern, limit),
+            (user_id, before_id, limit + 1),
+        ).fetchall()
+        return _to_summary_page(rows, limit)
+
+    return await _read(query)
+
+
+# Search stages, recorded in search cursors so later pages stay on one path.
+_SEARCH_ALL_TERMS = 0
+_SEARCH_ANY_TERM = 1
+_SEARCH_TITLE_PREFIX = 2
+
+# bm25 column weights for ads_fts(title, description, city).
+_BM25_WEIGHTS = "10.0, 3.0, 1.0"
+
+
+async def search_ads(query: str, limit: int = 20, cursor: str | None = None) -> AdPage:
+    key = ("search", " ".join(_search_terms(query)), limit, cursor)
+    return await _through_result_cache(key, lambda: _search_ads(query, limit, cursor))
+
+
+async def search_ad_summaries(
+    query: str,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> AdSummaryPage:
+    key = ("search", " ".join(_search_terms(query)), limit, cursor)
+    return await _summaries_through_result_cache(key, lambda: _search_ads(query, limit, cursor))
+
+
+async def _search_ads(query: str, limit: int, cursor: str | None) -> IdPage:
+    """Relevance-ranked search over published ads.
+
+    Every term is stemmed and matched as an FTS5 prefix. If no ad contains
+    all terms, the search is relaxed to any term. Should the FTS query fail,
+    a title-prefix lookup on idx_ads_status_title is used instead of a scan.
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return [], None
+    keys = _decode_cursor(cursor, 3)
+    try:
+        stage, score, before_id = (None, None, _MAX_ID) if keys is None else (
+            int(keys[0]),
+            float(keys[1]),
+            int(keys[2]),
         )
-        rows = await cursor.fetchall()
-    return [
-        AdRecord.from_row(row, json.loads(row["photos_json"] or "[]"))
-        for row in rows
-    ]
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from exc
 
+    def run(conn: sqlite3.Connection) -> IdPage:
+        nonlocal stage, before_id
+        try:
+            if stage is None:
+                stage = _SEARCH_ALL_TERMS
+                rows = _ranked_search(conn, terms, stage, None, before_id, limit + 1)
+                if not rows and len(terms) > 1:
+                    stage = _SEARCH_ANY_TERM
+                    rows = _ranked_search(conn, terms, stage, None, before_id, limit + 1)
+            elif stage == _SEARCH_TITLE_PREFIX:
+                rows = _title_prefix_search(conn, query, before_id, limit + 1)
+            else:
+                rows = _ranked_search(conn, terms, stage, score, before_id, limit + 1)
+        except OperationalError as exc:
+            log.warning("FTS search for %r failed, using title prefix: %s", query, exc)
+            if stage != _SEARCH_TITLE_PREFIX:
+                before_id = _MAX_ID
+            stage = _SEARCH_TITLE_PREFIX
+            rows = _title_prefix_search(conn, query, before_id, limit + 1)
+        return _to_id_page(rows, limit, lambda row: (stage, row["score"], row["id"]))
 
-def _sanitize_fts_query(query: str) -> str:
-    tokens = [t.strip() for t in query.replace("\n", " ").split(" ") if t.strip()]
-    if not tokens:
-        return ""
-    safe_tokens: list[str] = []
-    for t in tokens:
-        t = t.replace('"', '""')
-        safe_tokens.append(f'"{t}"')
-    return " AND ".join(safe_tokens)
+    return await _read(run)
 
 
-async def get_ads_by_category(category: str, limit: int = 20) -> list[AdRecord]:
-    db = await _get_db()
-    cursor = await db.execute(
-        """
-        SELECT * FROM ads
-        WHERE status = 'published' AND category = ?
+def _search_terms(query: str) -> list[str]:
+    return tokenize(query)[:8]
+
+
+def _build_fts_query(terms: list[str], any_term: bool) -> str:
+    parts: list[str] = []
+    for term in terms:
+        stemmed = stem(term)
+        # Tokens are \w+ only, so quoting is enough to keep them literal.
+        parts.append(f'"{stemmed}"*' if len(stemmed) >= 3 else f'"{term}"')
+    return (" OR " if any_term else " AND ").join(parts)
+
+
+def _ranked_search(
+    conn: sqlite3.Connection,
+    terms: list[str],
+    stage: int,
+    after_score: float | None,
+    before_id: int,
+    limit: int,
+) -> list[sqlite3.Row]:
+    fts_query = _build_fts_query(terms, any_term=stage == _SEARCH_ANY_TERM)
+    if after_score is None:
+        after_score = float("-inf")
+    return conn.execute(
+        f"""
+        SELECT a.id, m.score
+        FROM (
+            SELECT rowid, bm25(ads_fts, {_BM25_WEIGHTS}) AS score
+            FROM ads_fts
+            WHERE ads_fts MATCH ?
+        ) m
+        JOIN ads a ON a.id = m.rowid
+        WHERE a.status = 'published'
+          AND (m.score > ? OR (m.score = ? AND m.rowid < ?))
+        ORDER BY m.score, m.rowid DESC
+        LIMIT ?
+        """,
+        (fts_query, after_score, after_score, before_id, limit),
+    ).fetchall()
+
+
+def _title_prefix_search(
+    conn: sqlite3.Connection,
+    query: str,
+    before_id: int,
+    limit: int,
+) -> list[sqlite3.Row]:
+    prefix = query.strip()
+    variants = {prefix, prefix[:1].upper() + prefix[1:]}
+    ranges: list[str] = []
+    params: list[Any] = []
+    for variant in variants:
+        ranges.append("(title >= ? AND title < ?)")
+        params.extend([variant, variant[:-1] + chr(ord(variant[-1]) + 1)])
+    return conn.execute(
+        f"""
+        SELECT id, 0.0 AS score FROM ads
+        WHERE status = 'published' AND ({" OR ".join(ranges)}) AND id < ?
         ORDER BY id DESC
         LIMIT ?
         """,
-        (category, limit),
+        (*params, before_id, limit),
+    ).fetchall()
+
+
+# Best trigram matches reranked by edit distance per fuzzy search.
+_FUZZY_CANDIDATES = 200
+
+
+async def fuzzy_search_ads(query: str, limit: int = 20) -> AdPage:
+    key = ("fuzzy", " ".join(_search_terms(query)), limit, None)
+    return await _through_result_cache(key, lambda: _fuzzy_search_ads(query, limit))
+
+
+async def fuzzy_search_ad_summaries(query: str, limit: int = 20) -> AdSummaryPage:
+    key = ("fuzzy", " ".join(_search_terms(query)), limit, None)
+    return await _summaries_through_result_cache(key, lambda: _fuzzy_search_ads(query, limit))
+
+
+async def _fuzzy_search_ads(query: str, limit: int) -> IdPage:
+    """Typo-tolerant search over title and city of published ads.
+
+    The _FUZZY_CANDIDATES published ads that share the most, and the rarest,
+    trigrams with the query (bm25 over ads_trigram) are kept if every query
+    term is within a small edit distance of some word, and ordered by total
+    distance. Many newer ads sharing one common trigram cannot crowd out the
+    ad that matches the query best, but bm25 scores every ad matching the
+    trigram query: with 500k published ads, benchmarks/fuzzy_search.py
+    measures a p50 of about 17-20 ms and a p99 of 80-100 ms.
+    """
+    terms = [t for t in _search_terms(query) if len(t) >= 3]
+    if not terms:
+        return [], None
+
+    def query(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+        return conn.execute(
+            """
+            SELECT a.id, a.title, a.city
+            FROM ads_trigram
+            JOIN ads a ON a.id = ads_trigram.rowid
+            WHERE ads_trigram MATCH ? AND a.status = 'published'
+            ORDER BY ads_trigram.rank, a.id DESC
+            LIMIT ?
+            """,
+            (trigram_query(terms), _FUZZY_CANDIDATES),
+        ).fetchall()
+
+    candidates = await _read(query)
+
+    memo: dict[tuple[str, str], int] = {}
+    scored: list[tuple[int, int]] = []
+    for row in candidates:
+        distance = match_distance(terms, tokenize(f"{row['title']} {row['city']}"), memo)
+        if distance is not None:
+            scored.append((distance, -row["id"]))
+    scored.sort()
+    return [-neg_id for _, neg_id in scored[:limit]], None
+
+
+async def get_ads_by_category(
+    category: str,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> AdPage:
+    key = ("category", category, limit, cursor)
+    return await _through_result_cache(
+        key, lambda: _get_ads_by_category(category, limit, cursor)
     )
-    rows = await cursor.fetchall()
-    return [
-        AdRecord.from_row(row, json.loads(row["photos_json"] or "[]"))
-        for row in rows
-    ]
 
 
-async def delete_user_ad(ad_id: int, user_id: int) -> bool:
-    db = await _get_db()
-    cursor = await db.execute(
-        """
-        UPDATE ads
-        SET status = 'deleted'
-        WHERE id = ? AND user_id = ? AND status != 'deleted'
-        """,
-        (ad_id, user_id),
+async def get_ad_summaries_by_category(
+    category: str,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> AdSummaryPage:
+    key = ("category", category, limit, cursor)
+    return await _summaries_through_result_cache(
+        key, lambda: _get_ads_by_category(category, limit, cursor)
     )
-    await db.commit()
-    return cursor.rowcount > 0
 
 
-async def list_ads(status: str | None = None, limit: int = 50) -> list[AdRecord]:
-    db = await _get_db()
-    if status:
-        cursor = await db.execute(
-            "SELECT * FROM ads WHERE status = ? ORDER BY id DESC LIMIT ?",
-            (status, limit),
-        )
-    else:
-        cursor = await db.execute(
-            "SELECT * FROM ads ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-    rows = await cursor.fetchall()
-    return [
-        AdRecord.from_row(row, json.loads(row["photos_json"] or "[]"))
-        for row in rows
-    ]
+async def _get_ads_by_category(category: str, limit: int, cursor: str | None) -> IdPage:
+    before_id = _before_id(cursor)
 
+    def query(conn: sqlite3.Connection) -> IdPage:
+        rows = conn.execute(
+            """
+            SELECT id FROM ads
+            WHERE status = 'published' AND category = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (category, before_id, limit + 1),
+        ).fetchall()
+        return _to_id_page(rows, limit)
 
-async def update_ad_status(ad_id: int, new_status: str) -> bool:
-    db = await _get_db()
-    if new_status == "published":
-        cursor = await db.execute(
+    return await _read(query)
+
+
+async def delete_user_ad(ad_id: int, user_id: int) -> bool:
+    result, before = await _write_tracked(
+        ad_id,
+        statement(
             """
             UPDATE ads
-            SET status = 'published', published_at = CURRENT_TIMESTAMP
-            WHERE id = ?
+            SET status = 'deleted'
+            WHERE id = ? AND user_id = ? AND status != 'deleted'
             """,
-            (ad_id,),
+            (ad_id, user_id),
+        ),
+    )
+    _ADS.invalidate(ad_id)
+    _invalidate_results(result, before, "deleted")
+    return result.rowcount > 0
+
+
+async def list_ads(
+    status: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+) -> AdPage:
+    before_id = _before_id(cursor)
+
+    def query(conn: sqlite3.Connection) -> AdPage:
+        if status:
+            rows = conn.execute(
+                "SELECT * FROM ads WHERE status = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (status, before_id, limit + 1),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM ads WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before_id, limit + 1),
+            ).fetchall()
+        return _to_page(conn, rows, limit)
+
+    return await _read(query)
+
+
+async def list_ad_summaries(
+    status: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+) -> AdSummaryPage:
+    """Like list_ads, but only reads the columns of AdSummary."""
+    before_id = _before_id(cursor)
+
+    def query(conn: sqlite3.Connection) -> AdSummaryPage:
+        if status:
+            rows = conn.execute(
+                f"""
+                SELECT {_SUMMARY_COLUMNS} FROM ads
+                WHERE status = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (status, before_id, limit + 1),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM ads WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before_id, limit + 1),
+            ).fetchall()
+        return _to_summary_page(rows, limit)
+
+    return await _read(query)
+
+
+async def update_ad_status(ad_id: int, new_status: str) -> bool:
+    if new_status == "published":
+        result, before = await _write_tracked(
+            ad_id,
+            statement(
+                """
+                UPDATE ads
+                SET status = 'published', published_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                (ad_id,),
+            ),
         )
     else:
-        cursor = await db.execute(
-            "UPDATE ads SET status = ? WHERE id = ?",
-            (new_status, ad_id),
+        result, before = await _write_tracked(
+            ad_id,
+            statement("UPDATE ads SET status = ? WHERE id = ?", (new_status, ad_id)),
         )
-    await db.commit()
-    return cursor.rowcount > 0
+    _ADS.invalidate(ad_id)
+    _invalidate_results(result, before, new_status)
+    return result.rowcount > 0
 
 
 async def update_ad(
@@ -337,65 +1108,375 @@ async def update_ad(
     category: str,
     city: str,
     photos: list[str],
+    photo_unique_ids: list[str] | None = None,
 ) -> None:
-    db = await _get_db()
-    await db.execute(
-        """
-        UPDATE ads
-        SET title = ?,
-            description = ?,
-            phone = ?,
-            price_text = ?,
-            price_value = ?,
-            category = ?,
-            city = ?,
-            photos_json = ?,
-            status = 'pending',
-            published_at = NULL,
-            publication_chat_id = NULL,
-            publication_message_ids_json = '[]'
-        WHERE id = ?
-        """,
-        (
-            title,
-            description,
-            phone,
-            price_text,
-            price_value,
-            category,
-            city,
-            json.dumps(photos, ensure_ascii=True),
-            ad_id,
-        ),
-    )
-    await db.commit()
+    def op(conn: sqlite3.Connection) -> WriteResult:
+        cursor = conn.execute(
+            """
+            UPDATE ads
+            SET title = ?,
+                description = ?,
+                phone = ?,
+                price_text = ?,
+                price_value = ?,
+                category = ?,
+                city = ?,
+                status = 'pending',
+                published_at = NULL
+            WHERE id = ?
+            """,
+            (title, description, phone, price_text, price_value, category, city, ad_id),
+        )
+        if cursor.rowcount:
+            current = [
+                file_id
+                for (file_id,) in conn.execute(
+                    "SELECT file_id FROM ad_photos WHERE ad_id = ? ORDER BY position",
+                    (ad_id,),
+                )
+            ]
+            # Kept photos keep their stored file_unique_ids.
+            if current != photos:
+                conn.execute("DELETE FROM ad_photos WHERE ad_id = ?", (ad_id,))
+                _insert_photos(conn, ad_id, photos, photo_unique_ids or [])
+        # Published messages stay until the new version is approved, which
+        # edits them in place where it can.
+        return WriteResult(cursor.lastrowid, cursor.rowcount)
+
+    result, before = await _write_tracked(ad_id, op)
+    _ADS.invalidate(ad_id)
+    _invalidate_results(result, before, "pending")
 
 
 async def set_publication_info(ad_id: int, chat_id: int, message_ids: list[int]) -> None:
-    db = await _get_db()
-    await db.execute(
-        """
-        UPDATE ads
-        SET publication_chat_id = ?, publication_message_ids_json = ?
-        WHERE id = ?
-        """,
-        (chat_id, json.dumps(message_ids, ensure_ascii=True), ad_id),
-    )
-    await db.commit()
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM ad_publications WHERE ad_id = ?", (ad_id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO ad_publications (ad_id, chat_id, message_id) VALUES (?, ?, ?)",
+            [(ad_id, chat_id, message_id) for message_id in message_ids],
+        )
+
+    await _write_op(op, ad_data=True)
+    _ADS.invalidate(ad_id)
+
+
+async def expire_published_ads(max_age_days: float) -> int:
+    """Expire ads published more than ``max_age_days`` ago.
+
+    The ads get status 'expired' and their channel messages are queued for
+    deletion as one unpublish job per chat, all in one transaction.
+    Returns how many ads expired.
+    """
+
+    def op(conn: sqlite3.Connection) -> list[int]:
+        rows = conn.execute(
+            """
+            SELECT a.id, p.chat_id, p.message_id
+            FROM ads a
+            LEFT JOIN ad_publications p ON p.ad_id = a.id
+            WHERE a.status = 'published' AND a.published_at < datetime('now', ?)
+            ORDER BY p.message_id
+            """,
+            (f"-{max_age_days} days",),
+        ).fetchall()
+        ad_ids = sorted({row["id"] for row in rows})
+        conn.executemany("UPDATE ads SET status = 'expired' WHERE id = ?", [(i,) for i in ad_ids])
+        conn.executemany("DELETE FROM ad_publications WHERE ad_id = ?", [(i,) for i in ad_ids])
+        by_chat: dict[int, list[int]] = {}
+        for row in rows:
+            if row["message_id"] is not None:
+                by_chat.setdefault(row["chat_id"], []).append(row["message_id"])
+        now = time.time()
+        for chat_id, message_ids in by_chat.items():
+            _insert_outbox_job(
+                conn,
+                "unpublish",
+                {"ad_id": None, "chat_id": chat_id, "message_ids": message_ids},
+                None,
+                now,
+            )
+        return ad_ids
+
+    ad_ids = await _write_op(op, ad_data=True)
+    for ad_id in ad_ids:
+        _ADS.invalidate(ad_id)
+    if ad_ids:
+        _RESULTS.invalidate(lambda key: True)
+    return len(ad_ids)
 
 
 async def get_publication_info(ad_id: int) -> tuple[int, list[int]] | None:
-    db = await _get_db()
-    cursor = await db.execute(
+    result = await get_ad_full_by_id(ad_id)
+    if not result or result[1] is None:
+        return None
+    _, publication_chat_id, message_ids = result
+    return int(publication_chat_id), message_ids
+
+
+async def get_published_messages(ad_id: int) -> PublishedMessages:
+    """Chat and (message_id, content) of an ad's channel messages, in order.
+
+    Content is None for messages published before it was recorded.
+    """
+
+    def query(conn: sqlite3.Connection) -> PublishedMessages:
+        rows = conn.execute(
+            """
+            SELECT chat_id, message_id, kind, file_id, body, markup
+            FROM ad_publications
+            WHERE ad_id = ?
+            ORDER BY message_id
+            """,
+            (ad_id,),
+        ).fetchall()
+        messages = [
+            (
+                int(row["message_id"]),
+                PublishedMessage(row["kind"], row["file_id"], row["body"], row["markup"])
+                if row["kind"]
+                else None,
+            )
+            for row in rows
+        ]
+        return (rows[0]["chat_id"] if rows else None), messages
+
+    return await _read(query)
+
+
+async def load_fsm_record(
+    key: str,
+    fresh_after: float,
+) -> tuple[str | None, str, float] | None:
+    """Return (state, data_json, updated_at) of an FSM key written after ``fresh_after``."""
+
+    def query(conn: sqlite3.Connection) -> tuple[str | None, str, float] | None:
+        row = conn.execute(
+            """
+            SELECT state, data_json, updated_at FROM fsm_states
+            WHERE key = ? AND updated_at > ?
+            """,
+            (key, fresh_after),
+        ).fetchone()
+        return (row["state"], row["data_json"], row["updated_at"]) if row else None
+
+    return await _read(query)
+
+
+async def save_fsm_records(
+    upserts: list[tuple[str, str | None, str, float]],
+    deletes: list[str],
+) -> None:
+    """Write (key, state, data_json, updated_at) rows and drop cleared keys."""
+
+    def op(conn: sqlite3.Connection) -> None:
+        conn.executemany(
+            """
+            INSERT INTO fsm_states (key, state, data_json, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                state = excluded.state,
+                data_json = excluded.data_json,
+                updated_at = excluded.updated_at
+            """,
+            upserts,
+        )
+        conn.executemany("DELETE FROM fsm_states WHERE key = ?", [(key,) for key in deletes])
+
+    await _write_op(op)
+
+
+async def delete_stale_fsm_records(before: float) -> int:
+    result = await _write_op(statement("DELETE FROM fsm_states WHERE updated_at <= ?", (before,)))
+    return result.rowcount
+
+
+def _insert_outbox_job(
+    conn: sqlite3.Connection,
+    kind: str,
+    payload: dict[str, Any],
+    dedupe_key: str | None,
+    run_after: float,
+) -> int | None:
+    cursor = conn.execute(
         """
-        SELECT publication_chat_id, publication_message_ids_json
-        FROM ads
-        WHERE id = ?
+        INSERT OR IGNORE INTO outbox (kind, payload_json, dedupe_key, run_after)
+        VALUES (?, ?, ?, ?)
         """,
-        (ad_id,),
+        (kind, json.dumps(payload, ensure_ascii=False), dedupe_key, run_after),
     )
-    row = await cursor.fetchone()
-    if not row or row["publication_chat_id"] is None:
-        return None
-    message_ids = json.loads(row["publication_message_ids_json"] or "[]")
-    return int(row["publication_chat_id"]), [int(x) for x in message_ids]
+    return int(cursor.lastrowid) if cursor.rowcount else None
+
+
+async def enqueue_outbox_job(
+    kind: str,
+    payload: dict[str, Any],
+    dedupe_key: str | None = None,
+    run_after: float | None = None,
+) -> int | None:
+    """Queue a job; returns None if a live job with ``dedupe_key`` exists."""
+    when = time.time() if run_after is None else run_after
+    return await _write_op(
+        lambda conn: _insert_outbox_job(conn, kind, payload, dedupe_key, when)
+    )
+
+
+async def claim_outbox_jobs(limit: int) -> list[OutboxJob]:
+    """Mark up to ``limit`` due jobs as running and return them, oldest first."""
+
+    def op(conn: sqlite3.Connection) -> list[OutboxJob]:
+        rows = conn.execute(
+            """
+            SELECT id, kind, payload_json, attempts FROM outbox
+            WHERE state = 'pending' AND run_after <= ?
+            ORDER BY run_after, id
+            LIMIT ?
+            """,
+            (time.time(), limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE outbox SET state = 'running' WHERE id = ?",
+            [(row[0],) for row in rows],
+        )
+        return [OutboxJob(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    return await _write_op(op)
+
+
+async def next_outbox_run_after() -> float | None:
+    def query(conn: sqlite3.Connection) -> float | None:
+        row = conn.execute(
+            "SELECT MIN(run_after) FROM outbox WHERE state = 'pending'"
+        ).fetchone()
+        return row[0]
+
+    return await _read(query)
+
+
+async def requeue_running_outbox_jobs() -> int:
+    """Return jobs left running by a previous process to the queue."""
+    result = await _write_op(
+        statement("UPDATE outbox SET state = 'pending' WHERE state = 'running'")
+    )
+    return result.rowcount
+
+
+async def save_outbox_progress(job_id: int, payload: dict[str, Any]) -> None:
+    await _write_op(
+        statement(
+            "UPDATE outbox SET payload_json = ? WHERE id = ?",
+            (json.dumps(payload, ensure_ascii=False), job_id),
+        )
+    )
+
+
+async def finish_outbox_job(job_id: int) -> None:
+    await _write_op(statement("DELETE FROM outbox WHERE id = ?", (job_id,)))
+
+
+async def finish_outbox_jobs(job_ids: list[int]) -> None:
+    await _write_op(
+        statement(
+            f"DELETE FROM outbox WHERE id IN ({', '.join('?' * len(job_ids))})",
+            tuple(job_ids),
+        )
+    )
+
+
+async def retry_outbox_job(
+    job_id: int,
+    attempts: int,
+    run_after: float,
+    error: str | None = None,
+) -> None:
+    await _write_op(
+        statement(
+            """
+            UPDATE outbox
+            SET state = 'pending', attempts = ?, run_after = ?,
+                last_error = COALESCE(?, last_error)
+            WHERE id = ?
+            """,
+            (attempts, run_after, error, job_id),
+        )
+    )
+
+
+async def fail_outbox_job(job_id: int, error: str) -> None:
+    await _write_op(
+        statement(
+            "UPDATE outbox SET state = 'failed', last_error = ? WHERE id = ?",
+            (error, job_id),
+        )
+    )
+
+
+async def complete_publication(
+    job_id: int,
+    ad_id: int,
+    chat_id: int,
+    messages: list[tuple[int, PublishedMessage | None]],
+    notify: tuple[int, str] | None,
+    replaced: tuple[int, list[int]] | None = None,
+) -> bool:
+    """Finish a publish job in one transaction.
+
+    Records the published (message_id, content) pairs, moves the ad from
+    pending to published, deletes the job and queues ``notify`` as
+    (chat_id, text) and the deletion of ``replaced`` (chat_id, message_ids),
+    the previous messages of a resent ad. If the ad left pending while it
+    was being sent (deleted or rejected meanwhile), an unpublish job for the
+    sent messages is queued instead. Returns whether the ad was published.
+    """
+    message_ids = [message_id for message_id, _ in messages]
+
+    def op(conn: sqlite3.Connection) -> WriteResult:
+        cursor = conn.execute(
+            """
+            UPDATE ads
+            SET status = 'published', published_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'pending'
+            """,
+            (ad_id,),
+        )
+        now = time.time()
+        if cursor.rowcount:
+            conn.execute("DELETE FROM ad_publications WHERE ad_id = ?", (ad_id,))
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO ad_publications
+                    (ad_id, chat_id, message_id, kind, file_id, body, markup)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (ad_id, chat_id, message_id)
+                    + ((m.kind, m.file_id, m.body, m.markup) if m else (None,) * 4)
+                    for message_id, m in messages
+                ],
+            )
+            if replaced is not None and replaced[1]:
+                _insert_outbox_job(
+                    conn,
+                    "unpublish",
+                    {"ad_id": ad_id, "chat_id": replaced[0], "message_ids": replaced[1]},
+                    None,
+                    now,
+                )
+            if notify is not None:
+                _insert_outbox_job(
+                    conn, "notify", {"chat_id": notify[0], "text": notify[1]}, None, now
+                )
+        elif message_ids:
+            _insert_outbox_job(
+                conn,
+                "unpublish",
+                {"ad_id": ad_id, "chat_id": chat_id, "message_ids": message_ids},
+                None,
+                now,
+            )
+        conn.execute("DELETE FROM outbox WHERE id = ?", (job_id,))
+        return WriteResult(cursor.lastrowid, cursor.rowcount)
+
+    result, before = await _write_tracked(ad_id, op)
+    _ADS.invalidate(ad_id)
+    _invalidate_results(result, before, "published")
+    return result.rowcount > 0
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from copy import copy
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+from bot.database import crud
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Entry:
+    state: str | None
+    data: dict[str, Any] = field(default_factory=dict)
+    updated_at: float = 0.0
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage persisted in the bot's SQLite database.
+
+    Recently used keys are kept in a bounded LRU. Writes only change that
+    in-memory entry and mark it dirty; a background task saves every dirty
+    key in one group commit each ``flush_interval`` seconds, so the several
+    set_state/update_data calls of one handler cost a single row write.
+    Keys not written for ``ttl`` seconds read as empty and are deleted from
+    the table every ``sweep_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 72 * 60 * 60,
+        max_entries: int = 10_000,
+        flush_interval: float = 0.5,
+        sweep_interval: float = 60 * 60,
+        key_builder: KeyBuilder | None = None,
+    ) -> None:
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._flush_interval = flush_interval
+        self._sweep_interval = sweep_interval
+        self._key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: set[str] = set()
+        # Names handed to a save still running; pinned in memory like dirty ones.
+        self._saving: set[str] = set()
+        self._task: asyncio.Task[None] | None = None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name, entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(name, entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, entry = await self._entry(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        name, entry = await self._entry(key)
+        entry.data = data.copy()
+        self._mark_dirty(name, entry)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, entry = await self._entry(key)
+        return entry.data.copy()
+
+    async def get_value(
+        self,
+        storage_key: StorageKey,
+        dict_key: str,
+        default: Any | None = None,
+    ) -> Any | None:
+        _, entry = await self._entry(storage_key)
+        return copy(entry.data.get(dict_key, default))
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        name, entry = await self._entry(key)
+        entry.data.update(data)
+        self._mark_dirty(name, entry)
+        return entry.data.copy()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Save every dirty key in one write."""
+        if not self._dirty:
+            return
+        names, self._dirty = self._dirty, set()
+        upserts: list[tuple[str, str | None, str, float]] = []
+        deletes: list[str] = []
+        for name in names:
+            entry = self._entries.get(name)
+            if entry is None:
+                continue
+            if entry.state is None and not entry.data:
+                deletes.append(name)
+            else:
+                data_json = json.dumps(entry.data, ensure_ascii=False, separators=(",", ":"))
+                upserts.append((name, entry.state, data_json, entry.updated_at))
+        self._saving |= names
+        try:
+            await crud.save_fsm_records(upserts, deletes)
+        except Exception:
+            log.exception("Saving %s FSM records failed, will retry", len(names))
+            self._dirty |= names
+            return
+        finally:
+            self._saving -= names
+        self._evict()
+
+    async def sweep(self) -> None:
+        """Forget keys not written for ``ttl`` seconds, in memory and on disk."""
+        horizon = time.time() - self._ttl
+        for name in [n for n, e in self._entries.items() if e.updated_at <= horizon]:
+            if name not in self._dirty and name not in self._saving:
+                del self._entries[name]
+        removed = await crud.delete_stale_fsm_records(horizon)
+        if removed:
+            log.info("Removed %s stale FSM records", removed)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _entry(self, key: StorageKey) -> tuple[str, _Entry]:
+        name = self._key_builder.build(key)
+        entry = self._entries.get(name)
+        if entry is None:
+            now = time.time()
+            row = await crud.load_fsm_record(name, now - self._ttl)
+            # Another coroutine may have loaded or written the key meanwhile.
+            entry = self._entries.get(name)
+            if entry is None:
+                if row is None:
+                    entry = _Entry(state=None, updated_at=now)
+                else:
+                    entry = _Entry(state=row[0], data=json.loads(row[1]), updated_at=row[2])
+                self._entries[name] = entry
+        elif entry.updated_at <= time.time() - self._ttl:
+            entry.state = None
+            entry.data = {}
+            self._mark_dirty(name, entry)
+        self._entries.move_to_end(name)
+        self._evict()
+        return name, entry
+
+    def _mark_dirty(self, name: str, entry: _Entry) -> None:
+        entry.updated_at = time.time()
+        self._dirty.add(name)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="fsm-storage-flusher")
+
+    def _evict(self) -> None:
+        # Dirty and saving entries stay until flushed; the next flush evicts them.
+        excess = len(self._entries) - self._max_entries
+        if excess <= 0:
+            return
+        victims: list[str] = []
+        newest = next(reversed(self._entries))
+        for name in self._entries:
+            if name not in self._dirty and name not in self._saving and name != newest:
+                victims.append(name)
+                if len(victims) == excess:
+                    break
+        for name in victims:
+            del self._entries[name]
+
+    async def _run(self) -> None:
+        next_sweep = time.monotonic() + self._sweep_interval
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("FSM storage flush failed")
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self._sweep_interval
+                try:
+                    await self.sweep()
+                except Exception:
+                    log.exception("FSM storage sweep failed")
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+
+def trigrams(term: str) -> list[str]:
+    return [term[i : i + 3] for i in range(len(term) - 2)]
+
+
+def trigram_query(terms: list[str]) -> str:
+    """FTS5 query for candidates that can be within max_typos of every term.
+
+    One edit breaks at most four consecutive trigrams (three for a
+    substitution, four for swapped neighbours), which touch at most three
+    disjoint trigram pairs. A term with more than 3 * max_typos such pairs
+    is therefore matched on the pairs, so one survives; other terms fall
+    back to any single trigram. Below seven characters one typo can break
+    every trigram, so only typos that leave one intact are found.
+    """
+    groups: list[str] = []
+    for term in terms:
+        grams = trigrams(term)
+        if len(grams) // 2 > 3 * max_typos(term):
+            options = [f'("{a}" AND "{b}")' for a, b in zip(grams[0::2], grams[1::2])]
+        else:
+            options = [f'"{g}"' for g in dict.fromkeys(grams)]
+        groups.append(f"({' OR '.join(options)})")
+    return " AND ".join(groups)
+
+
+def max_typos(term: str) -> int:
+    # Two edits break at most eight trigrams, so trigram_query only
+    # guarantees them for terms with nine trigrams (eleven characters).
+    return 2 if len(term) - 2 > 8 else 1
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edits between ``a`` and ``b``, or ``limit + 1`` once they exceed ``limit``.
+
+    Insertions, deletions, substitutions and swaps of neighbouring letters
+    each count as one edit (optimal string alignment).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            )
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                distance = min(distance, before[j - 2] + 1)
+            current.append(distance)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def match_distance(
+    terms: list[str],
+    words: list[str],
+    memo: dict[tuple[str, str], int] | None = None,
+) -> int | None:
+    """Sum of the closest edit distances of ``terms`` to ``words``.
+
+    Returns None when some term has no word within its typo budget. Candidates
+    of one query share most of their words, so callers pass one ``memo`` per
+    query to avoid recomputing distances.
+    """
+    if memo is None:
+        memo = {}
+    total = 0
+    for term in terms:
+        budget = max_typos(term)
+        best = budget + 1
+        for word in words:
+            key = (term, word)
+            distance = memo.get(key)
+            if distance is None:
+                distance = memo[key] = edit_distance(term, word, budget)
+            if distance < best:
+                best = distance
+                if not best:
+                    break
+        if best > budget:
+            return None
+        total += best
+    return total
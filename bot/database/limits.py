@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import Iterable
+
+
+class SlidingWindowCounter:
+    """Per-user event timestamps within a sliding time window.
+
+    All methods are synchronous, so a check followed by ``add`` in the same
+    event-loop step cannot interleave with another coroutine. Users whose
+    events have all expired are dropped, keeping memory proportional to
+    recently active users.
+    """
+
+    def __init__(self, window: float, sweep_every: int = 1024) -> None:
+        self._window = window
+        self._sweep_every = sweep_every
+        self._events: dict[int, deque[float]] = {}
+        self._adds = 0
+        self.warm = False
+
+    def load(self, events: Iterable[tuple[int, float]], now: float | None = None) -> None:
+        """Replace all state with ``(user_id, timestamp)`` pairs."""
+        now = time.time() if now is None else now
+        self._events.clear()
+        for user_id, stamp in sorted(events, key=lambda event: event[1]):
+            if stamp > now - self._window:
+                self._events.setdefault(user_id, deque()).append(stamp)
+        self.warm = True
+
+    def count(self, user_id: int, now: float | None = None) -> int:
+        events = self._events.get(user_id)
+        if not events:
+            return 0
+        self._expire(user_id, events, time.time() if now is None else now)
+        return len(events)
+
+    def try_add(self, user_id: int, limit: int, now: float | None = None) -> float | None:
+        """Record an event unless ``limit`` events are already in the window.
+
+        Returns the recorded timestamp, which ``discard`` accepts to undo it,
+        or None when the limit is reached.
+        """
+        now = time.time() if now is None else now
+        if self.count(user_id, now) >= limit:
+            return None
+        self.add(user_id, now)
+        return now
+
+    def add(self, user_id: int, stamp: float) -> None:
+        events = self._events.setdefault(user_id, deque())
+        if events and events[-1] > stamp:
+            events.append(stamp)
+            self._events[user_id] = deque(sorted(events))
+        else:
+            events.append(stamp)
+        self._adds += 1
+        if self._adds % self._sweep_every == 0:
+            self.sweep(stamp)
+
+    def discard(self, user_id: int, stamp: float) -> None:
+        events = self._events.get(user_id)
+        if events is None:
+            return
+        try:
+            events.remove(stamp)
+        except ValueError:
+            return
+        if not events:
+            del self._events[user_id]
+
+    def sweep(self, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        for user_id, events in list(self._events.items()):
+            self._expire(user_id, events, now)
+
+    def _expire(self, user_id: int, events: deque[float], now: float) -> None:
+        horizon = now - self._window
+        while events and events[0] <= horizon:
+            events.popleft()
+        if not events:
+            self._events.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._events)
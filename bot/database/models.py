@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 
@@ -16,6 +16,7 @@ class AdCreate:
     category: str
     photos: list[str]
     city: str
+    photo_unique_ids: list[str] = field(default_factory=list)
 
 
 @dataclass(slots=True)
@@ -53,3 +54,62 @@ class AdRecord:
             created_at=row["created_at"],
             published_at=row["published_at"],
         )
+
+
+@dataclass(slots=True)
+class AdSummary:
+    """The columns a list screen shows; the full AdRecord is loaded per card."""
+
+    id: int
+    user_id: int
+    username: str | None
+    title: str
+    price_text: str
+    category: str
+    city: str
+    status: str
+    has_photos: bool
+
+    @classmethod
+    def from_row(cls, row: Any) -> "AdSummary":
+        return cls(
+            id=row["id"],
+            user_id=row["user_id"],
+            username=row["username"],
+            title=row["title"],
+            price_text=row["price_text"],
+            category=row["category"],
+            city=row["city"],
+            status=row["status"],
+            has_photos=bool(row["has_photos"]),
+        )
+
+
+@dataclass(slots=True)
+class AdPage:
+    items: list[AdRecord]
+    next_cursor: str | None
+
+
+@dataclass(slots=True)
+class AdSummaryPage:
+    items: list[AdSummary]
+    next_cursor: str | None
+
+
+@dataclass(slots=True)
+class OutboxJob:
+    id: int
+    kind: str
+    payload: dict[str, Any]
+    attempts: int
+
+
+@dataclass(frozen=True, slots=True)
+class PublishedMessage:
+    """What one channel message of a published ad shows."""
+
+    kind: str  # "text", "photo" or "contact"
+    file_id: str | None = None
+    body: str | None = None
+    markup: str | None = None  # reply markup as JSON
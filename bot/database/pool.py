@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import aiosqlite
+
+from bot.database.batch import WriteBatcher
+
+if TYPE_CHECKING:
+    from bot.database.coordinator import WriteCoordinator
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class PoolOptions:
+    readers: int = 4
+    cache_size_kib: int = 16384
+    mmap_size: int = 256 * 1024 * 1024
+    busy_timeout_ms: int = 5000
+    write_batch_size: int = 64
+    write_batch_delay_ms: float = 5.0
+
+
+class ConnectionPool:
+    """One writer connection plus a fixed set of query-only WAL readers.
+
+    Every aiosqlite connection owns its own worker thread, so readers never
+    queue behind a commit on the writer. Mutations go through ``batcher``,
+    which group-commits them on the writer, under ``coordinator``'s lock
+    when several processes share the file.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        options: PoolOptions,
+        coordinator: WriteCoordinator | None = None,
+    ) -> None:
+        self._db_path = db_path
+        self._options = options
+        self._coordinator = coordinator
+        self._writer: aiosqlite.Connection | None = None
+        self._batcher: WriteBatcher | None = None
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+
+    async def open(self) -> None:
+        self._writer = await self._connect(query_only=False)
+        self._batcher = WriteBatcher(
+            self._writer,
+            max_batch=self._options.write_batch_size,
+            max_delay=self._options.write_batch_delay_ms / 1000,
+            coordinator=self._coordinator,
+        )
+        self._batcher.start()
+        for _ in range(max(1, self._options.readers)):
+            conn = await self._connect(query_only=True)
+            self._readers.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def _connect(self, query_only: bool) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self._db_path)
+        conn.row_factory = aiosqlite.Row
+        opts = self._options
+        pragmas = [
+            f"PRAGMA busy_timeout={int(opts.busy_timeout_ms)};",
+            f"PRAGMA cache_size=-{int(opts.cache_size_kib)};",
+            f"PRAGMA mmap_size={int(opts.mmap_size)};",
+            "PRAGMA query_only=ON;" if query_only else "PRAGMA journal_mode=WAL;",
+        ]
+        # executescript steps every statement to completion, so no PRAGMA
+        # cursor is left holding a read lock on the file.
+        await conn.executescript("\n".join(pragmas))
+        return conn
+
+    @property
+    def writer(self) -> aiosqlite.Connection:
+        if self._writer is None:
+            raise RuntimeError("Connection pool is not open")
+        return self._writer
+
+    @property
+    def batcher(self) -> WriteBatcher:
+        if self._batcher is None:
+            raise RuntimeError("Connection pool is not open")
+        return self._batcher
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def read(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run ``fn(conn, *args)`` on an idle reader's worker thread.
+
+        Executing, fetching and decoding inside ``fn`` costs one thread hop,
+        where ``await execute`` plus ``await fetch*`` costs one per call.
+        """
+        async with self.reader() as conn:
+            # Same private hook as WriteBatcher._flush, checked when batch imports.
+            return await conn._execute(fn, conn._conn, *args)
+
+    async def close(self) -> None:
+        if self._batcher is not None:
+            await self._batcher.close()
+            self._batcher = None
+        for conn in self._readers:
+            await conn.close()
+        self._readers.clear()
+        self._idle = asyncio.Queue()
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import re
+
+# Inflectional endings of Russian and Ukrainian nouns, adjectives and verbs.
+# Only one ending is stripped, longest first; the remaining stem is used as an
+# FTS5 prefix, so "диван" and "диваны" both become "диван*".
+_ENDINGS = sorted(
+    {
+        # Russian
+        "иями", "ями", "ами", "ией", "иях", "ием", "ого", "его", "ому", "ему",
+        "ыми", "ими", "ться", "ешь", "ьми", "ях", "ах", "ой", "ей", "ий", "ый",
+        "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю", "ом", "ем", "ам", "ям",
+        "ов", "ев", "ью", "ия", "ии", "ть", "ет", "ют", "ут",
+        "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+        # Ukrainian
+        "ові", "еві", "ів", "їв", "ою", "ею", "ої", "ії", "ій", "ім", "ти",
+        "і", "ї", "є",
+    },
+    key=len,
+    reverse=True,
+)
+_MIN_STEM = 3
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+
+def stem(token: str) -> str:
+    for ending in _ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= _MIN_STEM:
+            return token[: -len(ending)]
+    return token
@@ -1,15 +1,15 @@
 import logging
 
-from aiogram import Bot, F, Router
-from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from aiogram.filters import Command
-from aiogram.types import CallbackQuery, InputMediaPhoto, Message
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message
 
 from bot.config import get_settings
 from bot.database import crud
-from bot.keyboards.inline import contact_author_kb
-from bot.utils import format_ad_md
+from bot.database.models import AdSummaryPage
+from bot.keyboards.inline import more_results_kb
+from bot.services import metrics, outbox
 
 router = Router()
 log = logging.getLogger(__name__)
@@ -19,23 +19,76 @@ def _is_admin(user_id: int) -> bool:
     return user_id in get_settings().admin_ids
 
 
+async def _send_pending_page(message: Message, page: AdSummaryPage) -> None:
+    lines = ["Pending объявления:"]
+    for ad in page.items:
+        lines.append(f"#{ad.id} | {ad.title} | @{ad.username or 'no_username'}")
+    kb = more_results_kb("admin", page.next_cursor) if page.next_cursor else None
+    await message.answer("\n".join(lines), reply_markup=kb)
+
+
 @router.message(Command("admin"))
 async def admin_panel(message: Message) -> None:
     if not _is_admin(message.from_user.id):
         await message.answer("Недостаточно прав.")
         return
-    pending = await crud.list_ads(status="pending", limit=20)
-    if not pending:
+    pending = await crud.list_ad_summaries(status="pending", limit=20)
+    if not pending.items:
         await message.answer("Нет объявлений на модерации.")
         return
-    lines = ["Pending объявления:"]
-    for ad in pending:
-        lines.append(f"#{ad.id} | {ad.title} | @{ad.username or 'no_username'}")
-    await message.answer("\n".join(lines))
+    await _send_pending_page(message, pending)
+
+
+@router.callback_query(F.data.startswith("more:admin:"))
+async def admin_panel_more(callback: CallbackQuery) -> None:
+    if not callback.from_user or not _is_admin(callback.from_user.id):
+        await callback.answer("Недостаточно прав", show_alert=True)
+        return
+    cursor = callback.data.split(":", 2)[2]
+    try:
+        pending = await crud.list_ad_summaries(status="pending", limit=20, cursor=cursor)
+    except ValueError:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+    if not pending.items or not callback.message:
+        await callback.answer("Больше нет объявлений.")
+        return
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except TelegramBadRequest:
+        pass
+    await _send_pending_page(callback.message, pending)
+    await callback.answer()
+
+
+@router.message(Command("expire"))
+async def expire_old_ads(message: Message, command: CommandObject) -> None:
+    if not _is_admin(message.from_user.id):
+        await message.answer("Недостаточно прав.")
+        return
+    if not command.args or not command.args.isdigit():
+        await message.answer("Использование: /expire ДНЕЙ")
+        return
+    expired = await outbox.expire_ads(int(command.args))
+    await message.answer(f"Снято с публикации объявлений: {expired}.")
+
+
+@router.message(Command("metrics"))
+async def show_metrics(message: Message) -> None:
+    if not _is_admin(message.from_user.id):
+        await message.answer("Недостаточно прав.")
+        return
+    snapshot = metrics.snapshot()
+    lines = [f"{name}: {value}" for name, value in sorted(snapshot["counters"].items())]
+    for name, t in sorted(snapshot["timings"].items()):
+        lines.append(
+            f"{name}: n={t['count']:.0f} p50={t['p50']:.1f} p99={t['p99']:.1f} max={t['max']:.1f}"
+        )
+    await message.answer("\n".join(lines) or "Метрик пока нет.")
 
 
 @router.callback_query(F.data.startswith("ad:"))
-async def moderation_actions(callback: CallbackQuery, bot: Bot) -> None:
+async def moderation_actions(callback: CallbackQuery) -> None:
     if not callback.from_user or not _is_admin(callback.from_user.id):
         await callback.answer("Недостаточно прав", show_alert=True)
         return
@@ -49,56 +102,22 @@ async def moderation_actions(callback: CallbackQuery, bot: Bot) -> None:
 
     if action == "ap":
         settings = get_settings()
-        try:
-            if settings.publication_chat_id:
-                text = format_ad_md(ad)
-                kb = contact_author_kb(ad.username, ad.user_id)
-                published_message_ids: list[int] = []
-                if len(ad.photos) > 1:
-                    media = [
-                        InputMediaPhoto(media=ad.photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2)
-                    ] + [InputMediaPhoto(media=p) for p in ad.photos[1:]]
-                    sent_messages = await bot.send_media_group(settings.publication_chat_id, media=media)
-                    published_message_ids.extend([m.message_id for m in sent_messages])
-                    if kb:
-                        sent_kb = await bot.send_message(
-                            settings.publication_chat_id,
-                            "Связаться с автором:",
-                            reply_markup=kb,
-                        )
-                        published_message_ids.append(sent_kb.message_id)
-                elif ad.photos:
-                    sent = await bot.send_photo(
-                        settings.publication_chat_id,
-                        ad.photos[0],
-                        caption=text,
-                        parse_mode=ParseMode.MARKDOWN_V2,
-                        reply_markup=kb,
-                    )
-                    published_message_ids.append(sent.message_id)
-                else:
-                    sent = await bot.send_message(
-                        settings.publication_chat_id,
-                        text,
-                        parse_mode=ParseMode.MARKDOWN_V2,
-                        reply_markup=kb,
-                    )
-                    published_message_ids.append(sent.message_id)
-                await crud.set_publication_info(ad_id, settings.publication_chat_id, published_message_ids)
-        except (TelegramBadRequest, TelegramForbiddenError) as exc:
-            log.warning("Failed to publish approved ad #%s: %s", ad_id, exc)
-            await callback.answer(
-                "Не удалось опубликовать в канал: проверьте PUBLICATION_CHAT_ID и права бота.",
-                show_alert=True,
-            )
+        if settings.publication_chat_id:
+            queued = await outbox.enqueue_publish(ad_id, settings.publication_chat_id)
+            await callback.answer("Approved: публикуется" if queued else "Уже публикуется")
             return
 
         await crud.update_ad_status(ad_id, "published")
-        await bot.send_message(ad.user_id, f"Ваше объявление #{ad.id} одобрено.")
+        await outbox.enqueue_notify(ad.user_id, f"Ваше объявление #{ad.id} одобрено.")
         await callback.answer("Approved")
         return
 
     if action == "rj":
         await crud.update_ad_status(ad_id, "rejected")
-        await bot.send_message(ad.user_id, f"Ваше объявление #{ad.id} отклонено.")
+        # An edited ad keeps its approved post until moderation; take it down.
+        published = await crud.get_publication_info(ad_id)
+        if published:
+            await outbox.enqueue_unpublish(ad_id, *published)
+            await crud.set_publication_info(ad_id, published[0], [])
+        await outbox.enqueue_notify(ad.user_id, f"Ваше объявление #{ad.id} отклонено.")
         await callback.answer("Rejected")
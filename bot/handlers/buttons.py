@@ -0,0 +1,113 @@
+"""Exact-text index for reply-keyboard buttons.
+
+Button handlers are registered here instead of on a router filter such as
+``F.text == BTN_CANCEL``. ButtonIndexMiddleware looks up (FSM state, text)
+in a dict before the routers are walked; on a hit it calls the handler
+directly, otherwise the update goes through the routers' filters as usual,
+which then only have to deal with commands, free text and media.
+
+In a state, buttons registered for that state win over buttons registered
+for every state (``any_state``).
+"""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any, TypeVar
+
+from aiogram import BaseMiddleware, F, Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.filters import StateFilter
+from aiogram.fsm.state import State, StatesGroup, any_state, default_state
+from aiogram.types import Message
+
+H = TypeVar("H", bound=Callable[..., Any])
+
+StateSpec = State | type[StatesGroup] | None
+_ANY = any_state.state
+
+
+def _state_names(state: StateSpec | Iterable[StateSpec]) -> list[str | None]:
+    if isinstance(state, (list, tuple, set, frozenset)):
+        return [name for item in state for name in _state_names(item)]
+    if isinstance(state, type) and issubclass(state, StatesGroup):
+        return list(state.__all_states_names__)
+    if isinstance(state, State):
+        return [state.state]
+    if state is None:
+        return [None]
+    raise TypeError(f"Unsupported state: {state!r}")
+
+
+class ButtonIndex:
+    """Maps (state, button text) to its handler."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[tuple[str | None, str], HandlerObject] = {}
+        self._registered: list[tuple[HandlerObject, list[str | None], tuple[str, ...]]] = []
+
+    def message(
+        self,
+        *texts: str,
+        state: StateSpec | Iterable[StateSpec] = default_state,
+    ) -> Callable[[H], H]:
+        """Register the decorated handler for messages that are exactly one of ``texts``."""
+
+        def register(callback: H) -> H:
+            handler = HandlerObject(callback)
+            names = _state_names(state)
+            for name in names:
+                for text in texts:
+                    if (name, text) in self._handlers:
+                        raise ValueError(f"Button {text!r} is already handled in state {name}")
+                    self._handlers[(name, text)] = handler
+            self._registered.append((handler, names, texts))
+            return callback
+
+        return register
+
+    def resolve(self, state: str | None, text: str) -> HandlerObject | None:
+        return self._handlers.get((state, text)) or self._handlers.get((_ANY, text))
+
+    def as_router(self) -> Router:
+        """The same handlers as ordinary filter-based router handlers."""
+        router = Router(name="buttons")
+        # Per-state entries first, as resolve() prefers them.
+        for handler, names, texts in sorted(self._registered, key=lambda r: _ANY in r[1]):
+            router.message.register(handler.callback, StateFilter(*names), F.text.in_(texts))
+        return router
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+
+class ButtonIndexMiddleware(BaseMiddleware):
+    """Outer message middleware that answers indexed buttons without walking the routers.
+
+    Install with ``dp.message.outer_middleware(...)``; by then the FSM
+    middleware has put ``raw_state`` into the handler data. Indexed handlers
+    get the same injected arguments as routed ones; router-level inner
+    middlewares do not run for them.
+    """
+
+    def __init__(self, index: ButtonIndex) -> None:
+        self.index = index
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: dict[str, Any],
+    ) -> Any:
+        if event.text is not None:
+            found = self.index.resolve(data.get("raw_state"), event.text)
+            if found is not None:
+                data["handler"] = found
+                try:
+                    return await found.call(event, **data)
+                except SkipHandler:
+                    pass
+        return await handler(event, data)
+
+
+buttons = ButtonIndex()
@@ -1,74 +1,132 @@
 import logging
 
-from aiogram import Bot, F, Router
-from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, InputMediaPhoto, Message
+from aiogram.fsm.state import any_state
+from aiogram.types import CallbackQuery, Message
 
+from bot.config import get_settings
 from bot.database import crud
-from bot.keyboards.inline import my_ad_actions_kb
+from bot.database.models import AdPage, AdRecord
+from bot.handlers import results
+from bot.handlers.buttons import buttons
+from bot.keyboards.inline import more_results_kb, my_ad_actions_kb
 from bot.keyboards.reply import BTN_MY_ADS, BTN_KEEP, edit_step_kb, main_menu_kb
+from bot.services import cards, outbox
 from bot.states.ad_states import EditAdStates
-from bot.utils import format_ad_md
 
 router = Router()
 log = logging.getLogger(__name__)
 
 
-async def _delete_publication_messages(
-    bot: Bot,
-    ad_id: int,
-    chat_id: int | None,
-    message_ids: list[int],
-) -> None:
-    if not chat_id or not message_ids:
-        return
-    for message_id in message_ids:
-        try:
-            await bot.delete_message(chat_id, message_id)
-        except (TelegramBadRequest, TelegramForbiddenError) as exc:
-            log.warning(
-                "Failed to delete published message for ad #%s (chat=%s, message=%s): %s",
-                ad_id,
-                chat_id,
-                message_id,
-                exc,
-            )
+def _my_ad_plan(ad: AdRecord) -> cards.CardPlan:
+    return cards.card_plan(ad, my_ad_actions_kb(ad.id), "Действия:", with_status=True)
+
+
+async def _send_my_ad_cards(message: Message, ads: list[AdRecord]) -> None:
+    await cards.send_cards(message.bot, ((message.chat.id, _my_ad_plan(ad)) for ad in ads))
+
+
+async def _send_more_button(message: Message, page: AdPage) -> None:
+    if page.next_cursor:
+        await message.answer(
+            "Показаны не все объявления.",
+            reply_markup=more_results_kb("my", page.next_cursor),
+        )
 
 
 @router.message(Command("my"))
-@router.message(F.text == BTN_MY_ADS)
-async def my_ads(message: Message) -> None:
-    ads = await crud.get_user_ads(message.from_user.id)
-    if not ads:
-        await message.answer("У вас пока нет объявлений.", reply_markup=main_menu_kb())
+@buttons.message(BTN_MY_ADS, state=any_state)
+async def my_ads(message: Message, state: FSMContext) -> None:
+    if get_settings().results_view == "list":
+        summaries = await crud.get_user_ad_summaries(message.from_user.id, limit=results.PAGE_SIZE)
+        if not summaries.items:
+            await message.answer("У вас пока нет объявлений.", reply_markup=main_menu_kb())
+            return
+        await results.send_results(
+            message, state, "Ваши объявления:", summaries, "my", "myopen", with_status=True
+        )
         return
 
+    page = await crud.get_user_ads(message.from_user.id, limit=20)
+    if not page.items:
+        await message.answer("У вас пока нет объявлений.", reply_markup=main_menu_kb())
+        return
     await message.answer("Ваши объявления:", reply_markup=main_menu_kb())
-    for ad in ads:
-        text = format_ad_md(ad, with_status=True)
-        kb = my_ad_actions_kb(ad.id)
-        if len(ad.photos) > 1:
-            media = [
-                InputMediaPhoto(media=ad.photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2)
-            ] + [InputMediaPhoto(media=p) for p in ad.photos[1:]]
-            await message.answer_media_group(media=media)
-            await message.answer("Действия:", reply_markup=kb)
-        elif ad.photos:
-            await message.answer_photo(
-                ad.photos[0],
-                caption=text,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=kb,
-            )
-        else:
-            await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=kb)
+    await _send_my_ad_cards(message, page.items)
+    await _send_more_button(message, page)
+
+
+@router.callback_query(F.data.startswith("pg:my:"))
+async def my_ads_page(callback: CallbackQuery, state: FSMContext) -> None:
+    page_raw = callback.data.removeprefix("pg:my:")
+    if not callback.from_user or not callback.message or not page_raw.isdigit():
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+    page_no = int(page_raw)
+    known, cursor = await results.page_cursor(state, "my", page_no)
+    if not known:
+        await callback.answer("Список устарел, откройте «Мои объявления» заново.", show_alert=True)
+        return
+    page = await crud.get_user_ad_summaries(
+        callback.from_user.id, limit=results.PAGE_SIZE, cursor=cursor
+    )
+    if not page.items:
+        await callback.answer("Больше нет объявлений.")
+        return
+    await results.edit_results(
+        callback.message,
+        state,
+        "Ваши объявления:",
+        page,
+        "my",
+        "myopen",
+        page_no,
+        cursor,
+        with_status=True,
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("myopen:"))
+async def open_my_ad(callback: CallbackQuery) -> None:
+    ad_id_raw = callback.data.split(":", 1)[1]
+    if not callback.from_user or not callback.message or not ad_id_raw.isdigit():
+        await callback.answer("Некорректный ID", show_alert=True)
+        return
+    ad = await crud.get_ad_by_id(int(ad_id_raw))
+    if not ad or ad.user_id != callback.from_user.id or ad.status == "deleted":
+        await callback.answer("Объявление не найдено.", show_alert=True)
+        return
+    await cards.send_card(callback.message.bot, callback.message.chat.id, _my_ad_plan(ad))
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("more:my:"))
+async def my_ads_more(callback: CallbackQuery) -> None:
+    if not callback.from_user or not callback.message:
+        await callback.answer("Ошибка пользователя", show_alert=True)
+        return
+    cursor = callback.data.split(":", 2)[2]
+    try:
+        page = await crud.get_user_ads(callback.from_user.id, cursor=cursor)
+    except ValueError:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except TelegramBadRequest:
+        pass
+    await _send_my_ad_cards(callback.message, page.items)
+    await _send_more_button(callback.message, page)
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("mydel:"))
-async def delete_my_ad_callback(callback: CallbackQuery, bot: Bot) -> None:
+async def delete_my_ad_callback(callback: CallbackQuery) -> None:
     if not callback.from_user:
         await callback.answer("Ошибка пользователя", show_alert=True)
         return
@@ -88,7 +146,7 @@ async def delete_my_ad_callback(callback: CallbackQuery, bot: Bot) -> None:
         await callback.answer("Не удалось удалить: нет прав или ID не найден.", show_alert=True)
         return
 
-    await _delete_publication_messages(bot, ad_id, pub_chat_id, pub_message_ids)
+    await outbox.enqueue_unpublish(ad_id, pub_chat_id, pub_message_ids)
     ok = await crud.delete_user_ad(ad_id, callback.from_user.id)
     if not ok:
         await callback.answer("Не удалось удалить: нет прав или ID не найден.", show_alert=True)
@@ -144,7 +202,7 @@ async def edit_my_ad_callback(callback: CallbackQuery, state: FSMContext) -> Non
 
 
 @router.message(Command("delete"))
-async def delete_ad(message: Message, command: CommandObject, bot: Bot) -> None:
+async def delete_ad(message: Message, command: CommandObject) -> None:
     if not command.args or not command.args.isdigit():
         await message.answer("Использование: /delete ID")
         return
@@ -159,7 +217,7 @@ async def delete_ad(message: Message, command: CommandObject, bot: Bot) -> None:
         await message.answer("Не удалось удалить: нет прав или ID не найден.")
         return
 
-    await _delete_publication_messages(bot, ad_id, pub_chat_id, pub_message_ids)
+    await outbox.enqueue_unpublish(ad_id, pub_chat_id, pub_message_ids)
     ok = await crud.delete_user_ad(ad_id, message.from_user.id)
     if ok:
         await message.answer("Объявление удалено.")
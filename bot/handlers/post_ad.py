@@ -1,18 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
 
 from aiogram import Bot, F, Router
-from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InputMediaPhoto, Message
+from aiogram.fsm.state import any_state
+from aiogram.types import Message
 
 from bot.config import get_settings
 from bot.database import crud
-from bot.database.models import AdCreate
+from bot.database.models import AdCreate, AdRecord
+from bot.handlers.buttons import buttons
 from bot.keyboards.inline import admin_moderation_kb
 from bot.keyboards.reply import (
     BTN_CANCEL,
@@ -33,8 +34,8 @@ from bot.keyboards.reply import (
     phone_optional_kb,
     photos_kb,
 )
+from bot.services import cards, outbox
 from bot.states.ad_states import AdCreateStates, EditAdStates
-from bot.utils import format_ad_md
 
 router = Router()
 log = logging.getLogger(__name__)
@@ -50,13 +51,17 @@ def _parse_price(raw: str) -> tuple[str, float | None] | None:
     return f"{normalized} ₽", float(normalized)
 
 
+def _limit_text(limit: int) -> str:
+    return f"Лимит: {limit} объявления за 24 часа."
+
+
 @router.message(Command("new"))
-@router.message(lambda m: m.text == BTN_NEW_AD)
+@buttons.message(BTN_NEW_AD, state=any_state)
 async def start_new_ad(message: Message, state: FSMContext) -> None:
     settings = get_settings()
     limit_used = await crud.count_ads_last_24h(message.from_user.id)
     if limit_used >= settings.daily_ads_limit:
-        await message.answer("Лимит: 3 объявления за 24 часа.", reply_markup=main_menu_kb())
+        await message.answer(_limit_text(settings.daily_ads_limit), reply_markup=main_menu_kb())
         return
 
     await state.clear()
@@ -65,27 +70,13 @@ async def start_new_ad(message: Message, state: FSMContext) -> None:
     await message.answer("Введите заголовок (до 100 символов):", reply_markup=cancel_kb())
 
 
-@router.message(AdCreateStates.title, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.description, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.price, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.category, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.city, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.phone, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.photos, F.text == BTN_CANCEL)
-@router.message(AdCreateStates.confirm, F.text == BTN_CANCEL)
+@buttons.message(BTN_CANCEL, state=AdCreateStates)
 async def cancel_flow(message: Message, state: FSMContext) -> None:
     await state.clear()
     await message.answer("Создание объявления отменено.", reply_markup=main_menu_kb())
 
 
-@router.message(EditAdStates.title, F.text == BTN_CANCEL)
-@router.message(EditAdStates.description, F.text == BTN_CANCEL)
-@router.message(EditAdStates.price, F.text == BTN_CANCEL)
-@router.message(EditAdStates.category, F.text == BTN_CANCEL)
-@router.message(EditAdStates.city, F.text == BTN_CANCEL)
-@router.message(EditAdStates.phone, F.text == BTN_CANCEL)
-@router.message(EditAdStates.photos, F.text == BTN_CANCEL)
-@router.message(EditAdStates.confirm, F.text == BTN_CANCEL)
+@buttons.message(BTN_CANCEL, state=EditAdStates)
 async def cancel_edit_flow(message: Message, state: FSMContext) -> None:
     await state.clear()
     await message.answer("Редактирование отменено.", reply_markup=main_menu_kb())
@@ -142,7 +133,7 @@ async def set_city(message: Message, state: FSMContext) -> None:
     if not city or len(city) > 100:
         await message.answer("Город/район должен быть 1..100 символов.")
         return
-    await state.update_data(city=city, photos=[])
+    await state.update_data(city=city, photos=[], photo_unique_ids=[])
     await state.set_state(AdCreateStates.phone)
     await message.answer(
         "Введите телефон или нажмите «Пропустить телефон».",
@@ -158,7 +149,7 @@ async def capture_phone(message: Message, state: FSMContext) -> None:
         await message.answer("Телефон сохранен. Отправьте до 4 фото.", reply_markup=photos_kb())
 
 
-@router.message(AdCreateStates.phone, F.text == BTN_SKIP_PHONE)
+@buttons.message(BTN_SKIP_PHONE, state=AdCreateStates.phone)
 async def skip_phone(message: Message, state: FSMContext) -> None:
     await state.update_data(phone=None)
     await state.set_state(AdCreateStates.photos)
@@ -191,16 +182,17 @@ async def edit_phone_contact(message: Message, state: FSMContext) -> None:
 async def add_photo(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     photos: list[str] = data.get("photos", [])
+    unique_ids: list[str] = data.get("photo_unique_ids", [])
     if len(photos) >= 4:
         await message.answer("Максимум 4 фото.")
         return
     photos.append(message.photo[-1].file_id)
-    await state.update_data(photos=photos)
+    unique_ids.append(message.photo[-1].file_unique_id)
+    await state.update_data(photos=photos, photo_unique_ids=unique_ids)
     await message.answer(f"Фото добавлено: {len(photos)}/4")
 
 
-@router.message(AdCreateStates.photos, F.text == BTN_SKIP_PHOTO)
-@router.message(AdCreateStates.photos, F.text == BTN_DONE)
+@buttons.message(BTN_SKIP_PHOTO, BTN_DONE, state=AdCreateStates.photos)
 async def finish_photos(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     preview_ad = AdCreate(
@@ -215,8 +207,6 @@ async def finish_photos(message: Message, state: FSMContext) -> None:
         photos=data.get("photos", []),
         city=data["city"],
     )
-    from bot.database.models import AdRecord
-
     fake = AdRecord(
         id=0,
         user_id=preview_ad.user_id,
@@ -234,29 +224,12 @@ async def finish_photos(message: Message, state: FSMContext) -> None:
         published_at=None,
     )
     await state.set_state(AdCreateStates.confirm)
-    if len(preview_ad.photos) > 1:
-        media = [
-            InputMediaPhoto(
-                media=preview_ad.photos[0],
-                caption=format_ad_md(fake),
-                parse_mode=ParseMode.MARKDOWN_V2,
-            )
-        ] + [InputMediaPhoto(media=p) for p in preview_ad.photos[1:]]
-        await message.answer_media_group(media=media)
-        await message.answer("Проверьте объявление и нажмите «Опубликовать».", reply_markup=confirm_kb())
-    elif preview_ad.photos:
-        await message.answer_photo(
-            photo=preview_ad.photos[0],
-            caption=format_ad_md(fake),
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=confirm_kb(),
-        )
-    else:
-        await message.answer(
-            format_ad_md(fake),
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=confirm_kb(),
-        )
+    await _send_preview(message, fake)
+
+
+async def _send_preview(message: Message, fake: AdRecord) -> None:
+    plan = cards.card_plan(fake, confirm_kb(), "Проверьте объявление и нажмите «Опубликовать».")
+    await cards.send_card(message.bot, message.chat.id, plan)
 
 
 async def _send_to_moderation(bot: Bot, ad_id: int) -> None:
@@ -264,57 +237,14 @@ async def _send_to_moderation(bot: Bot, ad_id: int) -> None:
     ad = await crud.get_ad_by_id(ad_id)
     if not ad:
         return
-    text = format_ad_md(ad, with_status=True)
     if settings.moderation_chat_id:
-        if len(ad.photos) > 1:
-            media = [
-                InputMediaPhoto(media=ad.photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2)
-            ] + [InputMediaPhoto(media=p) for p in ad.photos[1:]]
-            await bot.send_media_group(settings.moderation_chat_id, media=media)
-            await bot.send_message(
-                settings.moderation_chat_id,
-                "Модерация объявления:",
-                reply_markup=admin_moderation_kb(ad.id),
-            )
-        elif ad.photos:
-            await bot.send_photo(
-                settings.moderation_chat_id,
-                ad.photos[0],
-                caption=text,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=admin_moderation_kb(ad.id),
-            )
-        else:
-            await bot.send_message(
-                settings.moderation_chat_id,
-                text,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=admin_moderation_kb(ad.id),
-            )
-
-
-async def _delete_publication_messages(
-    bot: Bot,
-    ad_id: int,
-    chat_id: int | None,
-    message_ids: list[int],
-) -> None:
-    if not chat_id or not message_ids:
-        return
-    for message_id in message_ids:
-        try:
-            await bot.delete_message(chat_id, message_id)
-        except (TelegramBadRequest, TelegramForbiddenError) as exc:
-            log.warning(
-                "Failed to delete published message for ad #%s (chat=%s, message=%s): %s",
-                ad_id,
-                chat_id,
-                message_id,
-                exc,
-            )
+        plan = cards.card_plan(
+            ad, admin_moderation_kb(ad.id), "Модерация объявления:", with_status=True
+        )
+        await cards.send_card(bot, settings.moderation_chat_id, plan)
 
 
-@router.message(AdCreateStates.confirm, F.text == BTN_PUBLISH)
+@buttons.message(BTN_PUBLISH, state=AdCreateStates.confirm)
 async def publish_ad(message: Message, state: FSMContext, bot: Bot) -> None:
     data = await state.get_data()
     ad = AdCreate(
@@ -328,17 +258,21 @@ async def publish_ad(message: Message, state: FSMContext, bot: Bot) -> None:
         category=data["category"],
         photos=data.get("photos", []),
         city=data["city"],
+        photo_unique_ids=data.get("photo_unique_ids", []),
     )
 
+    settings = get_settings()
     try:
-        ad_id = await crud.create_ad(ad)
-        settings = get_settings()
+        ad_id = await crud.create_ad(ad, daily_limit=settings.daily_ads_limit)
 
         if settings.moderation_chat_id:
-            await _send_to_moderation(bot, ad_id)
-            await message.answer(
-                f"Объявление #{ad_id} отправлено на модерацию.",
-                reply_markup=main_menu_kb(),
+            # Different chats: neither message waits for the other.
+            await asyncio.gather(
+                _send_to_moderation(bot, ad_id),
+                message.answer(
+                    f"Объявление #{ad_id} отправлено на модерацию.",
+                    reply_markup=main_menu_kb(),
+                ),
             )
         else:
             await crud.update_ad_status(ad_id, "published")
@@ -348,6 +282,9 @@ async def publish_ad(message: Message, state: FSMContext, bot: Bot) -> None:
             )
 
         await state.clear()
+    except crud.DailyLimitExceeded:
+        await state.clear()
+        await message.answer(_limit_text(settings.daily_ads_limit), reply_markup=main_menu_kb())
     except Exception as exc:
         log.exception("create ad failed: %s", exc)
         await message.answer("Ошибка при сохранении объявления. Попробуйте позже.")
@@ -480,7 +417,7 @@ async def edit_city(message: Message, state: FSMContext) -> None:
     )
 
 
-@router.message(EditAdStates.phone, F.text == BTN_CLEAR_PHONE)
+@buttons.message(BTN_CLEAR_PHONE, state=EditAdStates.phone)
 async def edit_phone_clear(message: Message, state: FSMContext) -> None:
     await state.update_data(phone=None)
     await state.set_state(EditAdStates.photos)
@@ -512,27 +449,27 @@ async def edit_phone(message: Message, state: FSMContext) -> None:
 async def edit_add_photo(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     photos: list[str] = data.get("photos", [])
+    unique_ids: list[str] = data.get("photo_unique_ids", [])
     if not data.get("photos_replaced"):
         photos = []
+        unique_ids = []
         await state.update_data(photos_replaced=True)
     if len(photos) >= 4:
         await message.answer("Максимум 4 фото.")
         return
     photos.append(message.photo[-1].file_id)
-    await state.update_data(photos=photos)
+    unique_ids.append(message.photo[-1].file_unique_id)
+    await state.update_data(photos=photos, photo_unique_ids=unique_ids)
     await message.answer(f"Фото добавлено: {len(photos)}/4")
 
 
-@router.message(EditAdStates.photos, F.text == BTN_SKIP_PHOTO)
-@router.message(EditAdStates.photos, F.text == BTN_DONE)
+@buttons.message(BTN_SKIP_PHOTO, BTN_DONE, state=EditAdStates.photos)
 async def edit_finish_photos(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     photos = data.get("photos", [])
     if not data.get("photos_replaced"):
         photos = data.get("photos_original", [])
 
-    from bot.database.models import AdRecord
-
     fake = AdRecord(
         id=0,
         user_id=message.from_user.id,
@@ -551,36 +488,15 @@ async def edit_finish_photos(message: Message, state: FSMContext) -> None:
     )
     await state.update_data(photos=photos)
     await state.set_state(EditAdStates.confirm)
-    if len(photos) > 1:
-        media = [
-            InputMediaPhoto(media=photos[0], caption=format_ad_md(fake), parse_mode=ParseMode.MARKDOWN_V2)
-        ] + [InputMediaPhoto(media=p) for p in photos[1:]]
-        await message.answer_media_group(media=media)
-        await message.answer("Проверьте объявление и нажмите «Опубликовать».", reply_markup=confirm_kb())
-    elif photos:
-        await message.answer_photo(
-            photo=photos[0],
-            caption=format_ad_md(fake),
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=confirm_kb(),
-        )
-    else:
-        await message.answer(
-            format_ad_md(fake),
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=confirm_kb(),
-        )
+    await _send_preview(message, fake)
 
 
-@router.message(EditAdStates.confirm, F.text == BTN_PUBLISH)
+@buttons.message(BTN_PUBLISH, state=EditAdStates.confirm)
 async def edit_publish_ad(message: Message, state: FSMContext, bot: Bot) -> None:
     data = await state.get_data()
     ad_id = data["ad_id"]
-    # Delete previously published messages before re-moderation
-    result = await crud.get_ad_full_by_id(ad_id)
-    if result:
-        _, pub_chat_id, pub_message_ids = result
-        await _delete_publication_messages(bot, ad_id, pub_chat_id, pub_message_ids)
+    # The channel post stays until the new version is approved and then
+    # is edited in place where possible.
     await crud.update_ad(
         ad_id=ad_id,
         phone=data.get("phone"),
@@ -591,16 +507,24 @@ async def edit_publish_ad(message: Message, state: FSMContext, bot: Bot) -> None
         category=data["category"],
         city=data["city"],
         photos=data.get("photos", []),
+        photo_unique_ids=data.get("photo_unique_ids"),
     )
     settings = get_settings()
     if settings.moderation_chat_id:
-        await _send_to_moderation(bot, ad_id)
-        await message.answer(
-            f"Объявление #{ad_id} отправлено на модерацию.",
-            reply_markup=main_menu_kb(),
+        await asyncio.gather(
+            _send_to_moderation(bot, ad_id),
+            message.answer(
+                f"Объявление #{ad_id} отправлено на модерацию.",
+                reply_markup=main_menu_kb(),
+            ),
         )
     else:
-        await crud.update_ad_status(ad_id, "published")
+        published = await crud.get_publication_info(ad_id)
+        if published and settings.publication_chat_id:
+            # Refresh the existing channel post instead of leaving it stale.
+            await outbox.enqueue_publish(ad_id, settings.publication_chat_id, notify=False)
+        else:
+            await crud.update_ad_status(ad_id, "published")
         await message.answer(
             f"Объявление #{ad_id} опубликовано.",
             reply_markup=main_menu_kb(),
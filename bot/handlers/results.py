@@ -0,0 +1,107 @@
+"""Single-message result browser shared by search, categories and /my.
+
+A page of results is one text message listing the ads, with a numbered
+button per ad and paging arrows. Paging edits that message in place.
+Keyset cursors only lead forward, so the cursor of every page reached so
+far is kept in FSM data per scope; going back reuses them.
+"""
+from __future__ import annotations
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from bot.database.models import AdSummaryPage
+from bot.keyboards.inline import results_page_kb
+from bot.utils import format_ad_line
+
+PAGE_SIZE = 10
+
+_CURSORS_KEY = "result_cursors"
+
+
+async def page_cursor(state: FSMContext, scope: str, page_no: int) -> tuple[bool, str | None]:
+    """Cursor that loads page ``page_no`` of ``scope``; False if it is unknown."""
+    cursors = (await state.get_data()).get(_CURSORS_KEY, {}).get(scope)
+    if cursors is None or page_no < 0 or page_no >= len(cursors):
+        return False, None
+    return True, cursors[page_no]
+
+
+async def _remember_cursors(
+    state: FSMContext,
+    scope: str,
+    page_no: int,
+    cursor: str | None,
+    next_cursor: str | None,
+) -> None:
+    all_cursors = (await state.get_data()).get(_CURSORS_KEY, {})
+    cursors = all_cursors.get(scope, [])[:page_no]
+    cursors.append(cursor)
+    if next_cursor:
+        cursors.append(next_cursor)
+    all_cursors[scope] = cursors
+    await state.update_data({_CURSORS_KEY: all_cursors})
+
+
+def _render(
+    title: str,
+    page: AdSummaryPage,
+    scope: str,
+    open_prefix: str,
+    page_no: int,
+    with_status: bool,
+) -> tuple[str, InlineKeyboardMarkup]:
+    first_number = page_no * PAGE_SIZE + 1
+    lines = [title, ""]
+    lines += [
+        format_ad_line(ad, first_number + i, with_status) for i, ad in enumerate(page.items)
+    ]
+    if page_no or page.next_cursor:
+        lines += ["", f"Страница {page_no + 1}"]
+    kb = results_page_kb(
+        scope,
+        open_prefix,
+        [ad.id for ad in page.items],
+        first_number,
+        page_no,
+        page.next_cursor is not None,
+    )
+    return "\n".join(lines), kb
+
+
+async def send_results(
+    message: Message,
+    state: FSMContext,
+    title: str,
+    page: AdSummaryPage,
+    scope: str,
+    open_prefix: str,
+    with_status: bool = False,
+) -> None:
+    """Send the first page of results as a new message."""
+    await _remember_cursors(state, scope, 0, None, page.next_cursor)
+    text, kb = _render(title, page, scope, open_prefix, 0, with_status)
+    await message.answer(text, reply_markup=kb)
+
+
+async def edit_results(
+    message: Message,
+    state: FSMContext,
+    title: str,
+    page: AdSummaryPage,
+    scope: str,
+    open_prefix: str,
+    page_no: int,
+    cursor: str | None,
+    with_status: bool = False,
+) -> None:
+    """Replace the list in ``message`` with page ``page_no``."""
+    await _remember_cursors(state, scope, page_no, cursor, page.next_cursor)
+    text, kb = _render(title, page, scope, open_prefix, page_no, with_status)
+    try:
+        await message.edit_text(text, reply_markup=kb)
+    except TelegramBadRequest as exc:
+        # A double tap re-renders the same page.
+        if "message is not modified" not in str(exc):
+            raise
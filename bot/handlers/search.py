@@ -1,13 +1,16 @@
 from aiogram import F, Router
-from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import default_state
-from aiogram.types import InputMediaPhoto, Message
+from aiogram.types import CallbackQuery, Message
 
+from bot.config import get_settings
 from bot.database import crud
-from bot.database.models import AdRecord
-from bot.keyboards.inline import contact_author_kb
+from bot.database.models import AdPage, AdRecord, AdSummaryPage
+from bot.handlers import results
+from bot.handlers.buttons import buttons
+from bot.keyboards.inline import contact_author_kb, more_results_kb
 from bot.keyboards.reply import (
     BTN_BACK,
     BTN_CANCEL,
@@ -18,40 +21,98 @@ from bot.keyboards.reply import (
     cancel_kb,
     main_menu_kb,
 )
+from bot.services import cards
 from bot.states.ad_states import SearchStates
-from bot.utils import format_ad_md
 
 router = Router()
 
 
+def _list_view() -> bool:
+    return get_settings().results_view == "list"
+
+
+def _page_size() -> int:
+    return results.PAGE_SIZE if _list_view() else 20
+
+
+def _ad_plan(ad: AdRecord, with_status: bool = False) -> cards.CardPlan:
+    return cards.card_plan(ad, contact_author_kb(ad.username, ad.user_id), with_status=with_status)
+
+
+async def _send_ad_card(message: Message, ad: AdRecord, with_status: bool = False) -> None:
+    await cards.send_card(message.bot, message.chat.id, _ad_plan(ad, with_status))
+
+
 async def _send_ad_cards(message: Message, ads: list[AdRecord], title: str) -> None:
     await message.answer(title)
-    for ad in ads:
-        kb = contact_author_kb(ad.username, ad.user_id)
-        text = format_ad_md(ad, with_status=False)
-        if len(ad.photos) > 1:
-            media = [
-                InputMediaPhoto(media=ad.photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2)
-            ] + [InputMediaPhoto(media=p) for p in ad.photos[1:]]
-            await message.answer_media_group(media=media)
-            if kb:
-                await message.answer("Связаться с автором:", reply_markup=kb)
-        elif ad.photos:
-            await message.answer_photo(
-                ad.photos[0],
-                caption=text,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=kb,
-            )
-        else:
-            await message.answer(
-                text,
-                parse_mode=ParseMode.MARKDOWN_V2,
-                reply_markup=kb,
-            )
-
-
-@router.message(default_state, F.text == BTN_SEARCH)
+    await cards.send_cards(message.bot, ((message.chat.id, _ad_plan(ad)) for ad in ads))
+
+
+async def _find_ads(query: str) -> tuple[AdPage | AdSummaryPage, str]:
+    # The list view only needs one line per ad; cards need the full records.
+    if _list_view():
+        search, fuzzy = crud.search_ad_summaries, crud.fuzzy_search_ad_summaries
+    else:
+        search, fuzzy = crud.search_ads, crud.fuzzy_search_ads
+    page = await search(query, limit=_page_size())
+    if page.items:
+        return page, f"Найдено по запросу: {query}"
+    # Nothing matched exactly: fall back to typo-tolerant matching.
+    page = await fuzzy(query, limit=_page_size())
+    return page, f"Точных совпадений нет. Похожие на «{query}»:"
+
+
+async def _show_results(
+    message: Message,
+    state: FSMContext,
+    page: AdPage | AdSummaryPage,
+    title: str,
+    scope: str,
+) -> None:
+    if isinstance(page, AdSummaryPage):
+        await results.send_results(message, state, title, page, scope, "open")
+        return
+    await _send_ad_cards(message, page.items, title)
+    await _send_more_button(message, page, scope)
+
+
+async def _load_page(
+    scope: str,
+    state: FSMContext,
+    cursor: str | None,
+) -> tuple[AdSummaryPage, str] | None:
+    if scope == "search":
+        query = (await state.get_data()).get("search_query")
+        if not query:
+            return None
+        page = await crud.search_ad_summaries(query, limit=results.PAGE_SIZE, cursor=cursor)
+        return page, f"Найдено по запросу: {query}"
+    index_raw = scope.removeprefix("cat:")
+    if not index_raw.isdigit() or int(index_raw) >= len(CATEGORIES):
+        return None
+    category = CATEGORIES[int(index_raw)]
+    page = await crud.get_ad_summaries_by_category(
+        category, limit=results.PAGE_SIZE, cursor=cursor
+    )
+    return page, f"Категория: {category}"
+
+
+async def _send_more_button(message: Message, page: AdPage, scope: str) -> None:
+    if page.next_cursor:
+        await message.answer(
+            "Показаны не все объявления.",
+            reply_markup=more_results_kb(scope, page.next_cursor),
+        )
+
+
+async def _drop_more_button(callback: CallbackQuery) -> None:
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except TelegramBadRequest:
+        pass
+
+
+@buttons.message(BTN_SEARCH)
 async def search_button(message: Message, state: FSMContext) -> None:
     await state.set_state(SearchStates.waiting_query)
     await message.answer("Введите текст для поиска:", reply_markup=cancel_kb())
@@ -65,16 +126,18 @@ async def search_ads(message: Message, command: CommandObject, state: FSMContext
         return
 
     query = command.args.strip()
-    ads = await crud.search_ads(query)
-    if not ads:
+    page, title = await _find_ads(query)
+    if not page.items:
         await message.answer("Ничего не найдено.", reply_markup=main_menu_kb())
         return
 
-    await _send_ad_cards(message, ads, f"Найдено по запросу: {query}")
-    await message.answer("Поиск завершен.", reply_markup=main_menu_kb())
+    await state.update_data(search_query=query)
+    await _show_results(message, state, page, title, "search")
+    if not _list_view():
+        await message.answer("Поиск завершен.", reply_markup=main_menu_kb())
 
 
-@router.message(SearchStates.waiting_query, F.text == BTN_CANCEL)
+@buttons.message(BTN_CANCEL, state=SearchStates.waiting_query)
 async def search_cancel(message: Message, state: FSMContext) -> None:
     await state.clear()
     await message.answer("Поиск отменен.", reply_markup=main_menu_kb())
@@ -87,14 +150,69 @@ async def search_query_input(message: Message, state: FSMContext) -> None:
         await message.answer("Введите минимум 2 символа или нажмите «Отмена».")
         return
 
-    ads = await crud.search_ads(query)
+    page, title = await _find_ads(query)
     await state.clear()
-    if not ads:
+    if not page.items:
         await message.answer("Ничего не найдено.", reply_markup=main_menu_kb())
         return
 
-    await _send_ad_cards(message, ads, f"Найдено по запросу: {query}")
+    await state.update_data(search_query=query)
+    # The reply keyboard still shows «Отмена»; bring the main menu back.
     await message.answer("Поиск завершен.", reply_markup=main_menu_kb())
+    await _show_results(message, state, page, title, "search")
+
+
+@router.callback_query(F.data.startswith("pg:search:") | F.data.startswith("pg:cat:"))
+async def results_page(callback: CallbackQuery, state: FSMContext) -> None:
+    scope, page_raw = callback.data.removeprefix("pg:").rsplit(":", 1)
+    if not page_raw.isdigit() or not callback.message:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+    page_no = int(page_raw)
+    known, cursor = await results.page_cursor(state, scope, page_no)
+    loaded = await _load_page(scope, state, cursor) if known else None
+    if loaded is None:
+        await callback.answer("Список устарел, повторите запрос.", show_alert=True)
+        return
+    page, title = loaded
+    if not page.items:
+        await callback.answer("Больше нет объявлений.")
+        return
+    await results.edit_results(callback.message, state, title, page, scope, "open", page_no, cursor)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("open:"))
+async def open_result(callback: CallbackQuery) -> None:
+    ad_id_raw = callback.data.split(":", 1)[1]
+    if not ad_id_raw.isdigit() or not callback.message:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+    ad = await crud.get_ad_by_id(int(ad_id_raw))
+    if not ad or ad.status != "published":
+        await callback.answer("Объявление больше недоступно.", show_alert=True)
+        return
+    await _send_ad_card(callback.message, ad)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("more:search:"))
+async def search_more(callback: CallbackQuery, state: FSMContext) -> None:
+    query = (await state.get_data()).get("search_query")
+    if not query or not callback.message:
+        await callback.answer("Поиск устарел, повторите запрос.", show_alert=True)
+        return
+    cursor = callback.data.split(":", 2)[2]
+    try:
+        page = await crud.search_ads(query, cursor=cursor)
+    except ValueError:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+
+    await _drop_more_button(callback)
+    await _send_ad_cards(callback.message, page.items, f"Ещё по запросу: {query}")
+    await _send_more_button(callback.message, page, "search")
+    await callback.answer()
 
 
 @router.message(default_state, Command("category"))
@@ -102,25 +220,46 @@ async def category_command(message: Message) -> None:
     await message.answer("Выберите категорию:", reply_markup=browse_categories_kb())
 
 
-@router.message(default_state, F.text == BTN_CATEGORIES)
+@buttons.message(BTN_CATEGORIES)
 async def category_menu(message: Message) -> None:
     await message.answer("Выберите категорию:", reply_markup=browse_categories_kb())
 
 
-@router.message(default_state, F.text == BTN_BACK)
+@buttons.message(BTN_BACK)
 async def category_back(message: Message) -> None:
     await message.answer("Главное меню.", reply_markup=main_menu_kb())
 
 
-@router.message(default_state, F.text.in_(CATEGORIES))
-async def show_category_ads(message: Message) -> None:
+@buttons.message(*CATEGORIES)
+async def show_category_ads(message: Message, state: FSMContext) -> None:
     category = message.text.strip()
-    ads = await crud.get_ads_by_category(category)
-    if not ads:
+    load = crud.get_ad_summaries_by_category if _list_view() else crud.get_ads_by_category
+    page = await load(category, limit=_page_size())
+    if not page.items:
         await message.answer(f"В категории «{category}» пока нет объявлений.")
         return
 
-    await _send_ad_cards(message, ads, f"Категория: {category}")
+    scope = f"cat:{CATEGORIES.index(category)}"
+    await _show_results(message, state, page, f"Категория: {category}", scope)
+
+
+@router.callback_query(F.data.startswith("more:cat:"))
+async def category_more(callback: CallbackQuery) -> None:
+    _, _, index_raw, cursor = callback.data.split(":", 3)
+    if not index_raw.isdigit() or int(index_raw) >= len(CATEGORIES) or not callback.message:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+    category = CATEGORIES[int(index_raw)]
+    try:
+        page = await crud.get_ads_by_category(category, cursor=cursor)
+    except ValueError:
+        await callback.answer("Некорректная ссылка", show_alert=True)
+        return
+
+    await _drop_more_button(callback)
+    await _send_ad_cards(callback.message, page.items, f"Категория: {category} (ещё)")
+    await _send_more_button(callback.message, page, f"cat:{index_raw}")
+    await callback.answer()
 
 
 @router.message(default_state, Command("view"))
@@ -134,22 +273,4 @@ async def view_ad(message: Message, command: CommandObject) -> None:
         await message.answer("Объявление не найдено.")
         return
 
-    kb = contact_author_kb(ad.username, ad.user_id)
-    text = format_ad_md(ad, with_status=True)
-
-    if len(ad.photos) > 1:
-        media = [
-            InputMediaPhoto(media=ad.photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2)
-        ] + [InputMediaPhoto(media=p) for p in ad.photos[1:]]
-        await message.answer_media_group(media=media)
-        if kb:
-            await message.answer("Связаться с автором:", reply_markup=kb)
-    elif ad.photos:
-        await message.answer_photo(
-            ad.photos[0],
-            caption=text,
-            parse_mode=ParseMode.MARKDOWN_V2,
-            reply_markup=kb,
-        )
-    else:
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=kb)
+    await _send_ad_card(message, ad, with_status=True)
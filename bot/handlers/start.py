@@ -1,10 +1,12 @@
 from aiogram import Bot, F, Router
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.filters import CommandStart
-from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.state import any_state
+from aiogram.types import CallbackQuery, ChatMemberUpdated, Message
 
+from bot.handlers.buttons import buttons
 from bot.keyboards.inline import subscription_required_kb
 from bot.keyboards.reply import BTN_HELP, main_menu_kb
+from bot.services.subscription import SubscriptionGate
 
 router = Router()
 
@@ -12,14 +14,6 @@ CHANNEL_URL = "https://t.me/nasha_baraholka_zp"
 CHANNEL_USERNAME = "@nasha_baraholka_zp"
 
 
-async def _is_subscribed(bot: Bot, user_id: int) -> bool:
-    try:
-        member = await bot.get_chat_member(CHANNEL_USERNAME, user_id)
-    except (TelegramBadRequest, TelegramForbiddenError):
-        return False
-    return member.status not in {"left", "kicked"}
-
-
 async def _send_subscription_required(message: Message) -> None:
     await message.answer(
         "Чтобы продолжить, подпишитесь на канал @nasha_baraholka_zp и нажмите «Проверить подписку».",
@@ -27,9 +21,26 @@ async def _send_subscription_required(message: Message) -> None:
     )
 
 
+async def subscription_required(event: Message | CallbackQuery) -> None:
+    """Answer an update refused by SubscriptionMiddleware."""
+    if isinstance(event, CallbackQuery):
+        if event.message:
+            await _send_subscription_required(event.message)
+        await event.answer()
+        return
+    await _send_subscription_required(event)
+
+
+@router.chat_member(F.chat.username == CHANNEL_USERNAME.removeprefix("@"))
+async def channel_member_changed(
+    update: ChatMemberUpdated, subscriptions: SubscriptionGate
+) -> None:
+    subscriptions.record(update.new_chat_member.user.id, update.new_chat_member.status)
+
+
 @router.message(CommandStart())
-async def cmd_start(message: Message, bot: Bot) -> None:
-    if not await _is_subscribed(bot, message.from_user.id):
+async def cmd_start(message: Message, bot: Bot, subscriptions: SubscriptionGate) -> None:
+    if not await subscriptions.is_subscribed(bot, message.from_user.id):
         await _send_subscription_required(message)
         return
 
@@ -47,12 +58,14 @@ async def cmd_start(message: Message, bot: Bot) -> None:
 
 
 @router.callback_query(F.data == "sub:check")
-async def check_subscription(callback: CallbackQuery, bot: Bot) -> None:
+async def check_subscription(
+    callback: CallbackQuery, bot: Bot, subscriptions: SubscriptionGate
+) -> None:
     if not callback.from_user:
         await callback.answer("Ошибка проверки", show_alert=True)
         return
 
-    if not await _is_subscribed(bot, callback.from_user.id):
+    if not await subscriptions.is_subscribed(bot, callback.from_user.id, recheck=True):
         await callback.answer("Подписка не найдена. Подпишитесь и повторите.", show_alert=True)
         return
 
@@ -61,7 +74,7 @@ async def check_subscription(callback: CallbackQuery, bot: Bot) -> None:
     await callback.answer("Готово")
 
 
-@router.message(lambda m: m.text == BTN_HELP)
+@buttons.message(BTN_HELP, state=any_state)
 async def help_menu(message: Message) -> None:
     await message.answer(
         "Быстрые команды:\n"
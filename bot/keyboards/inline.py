@@ -1,46 +1,79 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from bot.keyboards.registry import InlineTemplate
+
+_CONTACT_BY_USERNAME = InlineTemplate(
+    [[("💬 Связаться с автором", "url", "https://t.me/{username}")]]
+)
+_CONTACT_BY_ID = InlineTemplate([[("💬 Связаться с автором", "url", "tg://user?id={user_id}")]])
+_ADMIN_MODERATION = InlineTemplate(
+    [
+        [
+            ("✅ Approve", "callback_data", "ad:ap:{ad_id}"),
+            ("❌ Reject", "callback_data", "ad:rj:{ad_id}"),
+        ]
+    ]
+)
+_MY_AD_ACTIONS = InlineTemplate(
+    [
+        [
+            ("Редактировать", "callback_data", "myedit:{ad_id}"),
+            ("Удалить", "callback_data", "mydel:{ad_id}"),
+        ]
+    ]
+)
+_SUBSCRIPTION_REQUIRED = InlineTemplate(
+    [
+        [("📢 Подписаться на канал", "url", "{channel_url}")],
+        [("✅ Проверить подписку", "callback_data", "sub:check")],
+    ]
+)
+_MORE_RESULTS = InlineTemplate(
+    [[("⬇️ Показать ещё", "callback_data", "more:{scope}:{cursor}")]]
+)
+
 
 def contact_author_kb(username: str | None, user_id: int) -> InlineKeyboardMarkup | None:
     if username:
-        return InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="💬 Связаться с автором", url=f"https://t.me/{username}")]
-            ]
-        )
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="💬 Связаться с автором", url=f"tg://user?id={user_id}")]
-        ]
-    )
+        return _CONTACT_BY_USERNAME(username=username)
+    return _CONTACT_BY_ID(user_id=user_id)
 
 
 def admin_moderation_kb(ad_id: int) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ Approve", callback_data=f"ad:ap:{ad_id}"),
-                InlineKeyboardButton(text="❌ Reject", callback_data=f"ad:rj:{ad_id}"),
-            ]
-        ]
-    )
+    return _ADMIN_MODERATION(ad_id=ad_id)
 
 
 def my_ad_actions_kb(ad_id: int) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="Редактировать", callback_data=f"myedit:{ad_id}"),
-                InlineKeyboardButton(text="Удалить", callback_data=f"mydel:{ad_id}"),
-            ]
-        ]
-    )
+    return _MY_AD_ACTIONS(ad_id=ad_id)
 
 
 def subscription_required_kb(channel_url: str) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="📢 Подписаться на канал", url=channel_url)],
-            [InlineKeyboardButton(text="✅ Проверить подписку", callback_data="sub:check")],
-        ]
-    )
+    return _SUBSCRIPTION_REQUIRED(channel_url=channel_url)
+
+
+def more_results_kb(scope: str, cursor: str) -> InlineKeyboardMarkup:
+    return _MORE_RESULTS(scope=scope, cursor=cursor)
+
+
+def results_page_kb(
+    scope: str,
+    open_prefix: str,
+    ad_ids: list[int],
+    first_number: int,
+    page_no: int,
+    has_next: bool,
+) -> InlineKeyboardMarkup:
+    """Numbered buttons opening each listed ad, then paging arrows."""
+    buttons = [
+        InlineKeyboardButton(text=str(first_number + i), callback_data=f"{open_prefix}:{ad_id}")
+        for i, ad_id in enumerate(ad_ids)
+    ]
+    rows = [buttons[i : i + 5] for i in range(0, len(buttons), 5)]
+    nav = []
+    if page_no > 0:
+        nav.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"pg:{scope}:{page_no - 1}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="Вперёд ▶️", callback_data=f"pg:{scope}:{page_no + 1}"))
+    if nav:
+        rows.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
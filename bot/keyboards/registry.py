@@ -0,0 +1,122 @@
+"""Keyboards built and serialized once.
+
+Almost every reply carries a keyboard, and building one is a pydantic
+validation of every button, after which the session dumps the whole tree
+back to JSON. Static keyboards are built once at import and keep their JSON.
+Inline keyboards that differ only by an id, a cursor or a URL come from an
+InlineTemplate, which fills the values into shallow copies of prebuilt
+buttons and into a prebuilt JSON string. PreparedSession sends that JSON as
+is.
+"""
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Iterable
+from typing import Any, TypeVar
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from aiohttp import FormData
+from pydantic import BaseModel, PrivateAttr
+
+
+class PreparedInlineKeyboard(InlineKeyboardMarkup):
+    _json: str = PrivateAttr("")
+
+
+class PreparedReplyKeyboard(ReplyKeyboardMarkup):
+    _json: str = PrivateAttr("")
+
+
+Prepared = TypeVar("Prepared", PreparedInlineKeyboard, PreparedReplyKeyboard)
+Model = TypeVar("Model", bound=BaseModel)
+
+
+def prepare(markup: Prepared) -> Prepared:
+    """Store the markup's JSON on it; the markup must not be changed afterwards."""
+    markup._json = markup.model_dump_json(exclude_none=True)
+    return markup
+
+
+def serialized(markup: Any) -> str | None:
+    """The stored JSON of a prepared keyboard, None for anything else."""
+    return getattr(markup, "_json", None) or None
+
+
+def _json_text(value: Any) -> str:
+    # The value as it appears inside a JSON string, quotes stripped.
+    return json.dumps(str(value), ensure_ascii=False)[1:-1]
+
+
+def _replaced(model: Model, **changes: Any) -> Model:
+    # model_copy(update=...) without its __copy__ machinery, which costs
+    # about as much as the JSON a template saves. The values are not
+    # validated: they are strings formatted into already valid fields.
+    copy = object.__new__(type(model))
+    values = model.__dict__.copy()
+    values.update(changes)
+    private = model.__pydantic_private__
+    object.__setattr__(copy, "__dict__", values)
+    object.__setattr__(copy, "__pydantic_fields_set__", model.__pydantic_fields_set__.copy())
+    object.__setattr__(copy, "__pydantic_extra__", model.__pydantic_extra__)
+    object.__setattr__(copy, "__pydantic_private__", None if private is None else private.copy())
+    return copy
+
+
+class InlineTemplate:
+    """An inline keyboard whose buttons differ only by values filled into patterns.
+
+    ``rows`` hold ``(text, field, pattern)`` triples, e.g.
+    ``("✅ Approve", "callback_data", "ad:ap:{ad_id}")``, where ``field`` is the
+    button field that gets the formatted pattern.
+    """
+
+    def __init__(self, rows: Iterable[Iterable[tuple[str, str, str]]]) -> None:
+        self._rows = [
+            [
+                (InlineKeyboardButton(text=text, **{field: pattern}), field, pattern)
+                for text, field, pattern in row
+            ]
+            for row in rows
+        ]
+        self._markup = PreparedInlineKeyboard(
+            inline_keyboard=[[button for button, _, _ in row] for row in self._rows]
+        )
+        # Literal JSON at even indexes, placeholder names at odd ones.
+        self._parts = re.split(r"\{(\w+)\}", self._markup.model_dump_json(exclude_none=True))
+
+    def __call__(self, **values: Any) -> PreparedInlineKeyboard:
+        texts = {name: _json_text(value) for name, value in values.items()}
+        parts = self._parts.copy()
+        for i in range(1, len(parts), 2):
+            parts[i] = texts[parts[i]]
+        # Only the patterned buttons are copied; the rest are shared.
+        markup = _replaced(
+            self._markup,
+            inline_keyboard=[
+                [
+                    _replaced(button, **{field: pattern.format(**values)})
+                    if "{" in pattern
+                    else button
+                    for button, field, pattern in row
+                ]
+                for row in self._rows
+            ],
+        )
+        markup.__pydantic_private__["_json"] = "".join(parts)
+        return markup
+
+
+class PreparedSession(AiohttpSession):
+    """Sends a prepared keyboard's stored JSON instead of dumping it again."""
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod[Any]) -> FormData:
+        markup_json = serialized(getattr(method, "reply_markup", None))
+        if markup_json is None:
+            return super().build_form_data(bot, method)
+        form = super().build_form_data(bot, method.model_copy(update={"reply_markup": None}))
+        form.add_field("reply_markup", markup_json)
+        return form
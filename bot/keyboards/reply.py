@@ -1,5 +1,7 @@
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
 
+from bot.keyboards.registry import PreparedReplyKeyboard, prepare
+
 CATEGORIES = [
     "Одежда",
     "Электроника",
@@ -26,78 +28,58 @@ BTN_SKIP_PHONE = "Пропустить телефон"
 BTN_CLEAR_PHONE = "Убрать телефон"
 
 
-def main_menu_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_NEW_AD), KeyboardButton(text=BTN_MY_ADS)],
-            [KeyboardButton(text=BTN_SEARCH), KeyboardButton(text=BTN_CATEGORIES)],
-            [KeyboardButton(text=BTN_HELP)],
-        ],
-        resize_keyboard=True,
+def _keyboard(*rows: list[str]) -> PreparedReplyKeyboard:
+    return prepare(
+        PreparedReplyKeyboard(
+            keyboard=[[KeyboardButton(text=text) for text in row] for row in rows],
+            resize_keyboard=True,
+        )
     )
 
 
+# Built once: every handler reply shares these.
+_MAIN_MENU = _keyboard([BTN_NEW_AD, BTN_MY_ADS], [BTN_SEARCH, BTN_CATEGORIES], [BTN_HELP])
+_CANCEL = _keyboard([BTN_CANCEL])
+_CATEGORY = _keyboard(*([cat] for cat in CATEGORIES), [BTN_CANCEL])
+_BROWSE_CATEGORIES = _keyboard(*([cat] for cat in CATEGORIES), [BTN_BACK])
+_PHOTOS = _keyboard([BTN_DONE, BTN_SKIP_PHOTO], [BTN_CANCEL])
+_PHONE_OPTIONAL = _keyboard([BTN_SKIP_PHONE, BTN_CANCEL])
+_CONFIRM = _keyboard([BTN_PUBLISH, BTN_CANCEL])
+_EDIT_STEP = _keyboard([BTN_KEEP, BTN_CANCEL])
+_EDIT_PHONE = _keyboard([BTN_KEEP, BTN_CLEAR_PHONE], [BTN_CANCEL])
+
+
+def main_menu_kb() -> ReplyKeyboardMarkup:
+    return _MAIN_MENU
+
+
 def cancel_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=BTN_CANCEL)]],
-        resize_keyboard=True,
-    )
+    return _CANCEL
 
 
 def category_kb() -> ReplyKeyboardMarkup:
-    rows = [[KeyboardButton(text=cat)] for cat in CATEGORIES]
-    rows.append([KeyboardButton(text=BTN_CANCEL)])
-    return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
+    return _CATEGORY
 
 
 def browse_categories_kb() -> ReplyKeyboardMarkup:
-    rows = [[KeyboardButton(text=cat)] for cat in CATEGORIES]
-    rows.append([KeyboardButton(text=BTN_BACK)])
-    return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
+    return _BROWSE_CATEGORIES
 
 
 def photos_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_DONE), KeyboardButton(text=BTN_SKIP_PHOTO)],
-            [KeyboardButton(text=BTN_CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
+    return _PHOTOS
 
 
 def phone_optional_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_SKIP_PHONE), KeyboardButton(text=BTN_CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
+    return _PHONE_OPTIONAL
 
 
 def confirm_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_PUBLISH), KeyboardButton(text=BTN_CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
+    return _CONFIRM
 
 
 def edit_step_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_KEEP), KeyboardButton(text=BTN_CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
+    return _EDIT_STEP
 
 
 def edit_phone_kb() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text=BTN_KEEP), KeyboardButton(text=BTN_CLEAR_PHONE)],
-            [KeyboardButton(text=BTN_CANCEL)],
-        ],
-        resize_keyboard=True,
-    )
+    return _EDIT_PHONE
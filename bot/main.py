@@ -1,13 +1,24 @@
 import asyncio
 import logging
+from collections.abc import Iterable
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
 from aiogram.types import ErrorEvent
 
-from bot.config import get_settings
+from bot.config import Settings, get_settings
 from bot.database import crud
-from bot.handlers import all_routers
+from bot.database.coordinator import WriteCoordinator
+from bot.database.fsm_storage import SQLiteStorage
+from bot.database.pool import PoolOptions
+from bot.handlers import all_routers, start
+from bot.handlers.buttons import ButtonIndexMiddleware, buttons
+from bot.keyboards.registry import PreparedSession
+from bot.services.outbox import OutboxWorker
+from bot.services.rate_limit import RateLimiter, RateLimitMiddleware
+from bot.services.subscription import SubscriptionGate, SubscriptionMiddleware
+from bot.webhook import run_webhook
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,25 +27,105 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
-async def main() -> None:
-    settings = get_settings()
-    crud.configure(settings.db_path)
-    await crud.init_db()
+def configure_db(settings: Settings, coordinator: WriteCoordinator | None = None) -> None:
+    crud.configure(
+        settings.db_path,
+        PoolOptions(
+            readers=settings.db_read_pool_size,
+            cache_size_kib=settings.db_cache_size_kib,
+            mmap_size=settings.db_mmap_size,
+            busy_timeout_ms=settings.db_busy_timeout_ms,
+            write_batch_size=settings.db_write_batch_size,
+            write_batch_delay_ms=settings.db_write_batch_delay_ms,
+        ),
+        coordinator,
+    )
+
+
+def create_bot(
+    settings: Settings, workers: int = 1, exclusive_chats: Iterable[int] = ()
+) -> Bot:
+    """Bot with the outbound rate limiter; ``workers`` processes split its limits.
+
+    ``exclusive_chats`` are groups or channels only this process writes to
+    and keep their full rate.
+    """
+    api = PRODUCTION
+    if settings.telegram_api_url:
+        api = TelegramAPIServer.from_base(settings.telegram_api_url)
+    bot = Bot(settings.bot_token, session=PreparedSession(api=api), default=DefaultBotProperties())
+    bot.session.middleware(
+        RateLimitMiddleware(
+            RateLimiter(
+                global_rate=settings.rate_limit_global_per_second,
+                private_rate=settings.rate_limit_private_per_second,
+                group_rate=settings.rate_limit_group_per_minute / 60,
+                share=1 / workers,
+                exclusive_chats=exclusive_chats,
+            )
+        )
+    )
+    return bot
+
 
-    bot = Bot(settings.bot_token, default=DefaultBotProperties())
-    dp = Dispatcher()
+async def on_error(event: ErrorEvent) -> bool:
+    log.exception("Unhandled error: %s", event.exception)
+    return True
 
+
+def create_dispatcher(settings: Settings) -> Dispatcher:
+    subscriptions = SubscriptionGate(
+        start.CHANNEL_USERNAME,
+        positive_ttl=settings.subscription_ttl,
+        negative_ttl=settings.subscription_negative_ttl,
+    )
+    dp = Dispatcher(
+        storage=SQLiteStorage(
+            ttl=settings.fsm_ttl_hours * 60 * 60,
+            max_entries=settings.fsm_cache_size,
+            flush_interval=settings.fsm_flush_interval_ms / 1000,
+        ),
+        subscriptions=subscriptions,
+    )
+    if settings.subscription_gate == "all":
+        gate = SubscriptionMiddleware(
+            subscriptions,
+            start.subscription_required,
+            exempt=settings.admin_ids,
+            allowed_callbacks={"sub:check"},
+        )
+        dp.message.outer_middleware(gate)
+        dp.callback_query.outer_middleware(gate)
+    # Reply-keyboard buttons are looked up before any router filter runs.
+    dp.message.outer_middleware(ButtonIndexMiddleware(buttons))
     for r in all_routers:
         dp.include_router(r)
+    dp.errors.register(on_error)
+    return dp
+
+
+async def main() -> None:
+    settings = get_settings()
+    configure_db(settings)
+    await crud.init_db()
+
+    bot = create_bot(settings)
+    dp = create_dispatcher(settings)
 
-    @dp.errors()
-    async def on_error(event: ErrorEvent) -> bool:
-        log.exception("Unhandled error: %s", event.exception)
-        return True
+    worker = OutboxWorker(bot, alert_chat_id=settings.moderation_chat_id)
+    await worker.start()
+    # Stop sending before the bot session closes.
+    dp.shutdown.register(worker.close)
 
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if settings.webhook_url:
+            await run_webhook(dp, bot, settings)
+        else:
+            # getUpdates is refused while a webhook is registered.
+            await bot.delete_webhook()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
+        await worker.close()
         await crud.close_db()
 
 
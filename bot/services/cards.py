@@ -0,0 +1,184 @@
+"""Ad cards: cached MarkdownV2 text, a reusable send plan, and the one place cards are sent.
+
+The same ad is rendered for every search hit, /view, /my, moderation and
+publication. Rendered text is kept per (ad id, with_status) together with
+the version of the fields it was rendered from, so an edited ad renders
+again and an unchanged one is never escaped twice. The version is the tuple
+of those fields itself: AdRecord has no update counter, and comparing the
+tuples costs little next to escaping, since cached records share their
+strings. Drafts (id 0) are rendered without the cache.
+
+Every card goes out through send_card, which picks the calls for the plan's
+kind and records the latency of each as ``cards.send_ms.<kind>``.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.types import InlineKeyboardMarkup, InputMediaPhoto, Message, ReplyKeyboardMarkup
+
+from bot.database.models import AdRecord
+from bot.services import metrics
+from bot.utils import format_ad_md
+
+Keyboard = InlineKeyboardMarkup | ReplyKeyboardMarkup
+
+MAX_CACHED = 4096
+
+
+@dataclass(frozen=True, slots=True)
+class _Rendered:
+    version: tuple[Any, ...]
+    text: str
+    media: tuple[InputMediaPhoto, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CardPlan:
+    """Everything needed to send one ad card, built once and sent any number of times.
+
+    ``kind`` is "text", "photo" or "album". An album cannot carry a keyboard,
+    so it is followed by a ``keyboard_text`` message that does.
+    """
+
+    kind: str
+    text: str
+    photos: tuple[str, ...]
+    media: tuple[InputMediaPhoto, ...]
+    keyboard: Keyboard | None
+    keyboard_text: str | None
+
+
+_RENDERED: OrderedDict[tuple[int, bool], _Rendered] = OrderedDict()
+
+
+def _version(ad: AdRecord, with_status: bool) -> tuple[Any, ...]:
+    return (
+        ad.title,
+        ad.category,
+        ad.price_text,
+        ad.city,
+        ad.description,
+        ad.phone,
+        ad.username,
+        ad.status if with_status else None,
+        tuple(ad.photos),
+    )
+
+
+def _render(ad: AdRecord, with_status: bool) -> _Rendered:
+    key = (ad.id, with_status)
+    version = _version(ad, with_status)
+    rendered = _RENDERED.get(key)
+    if rendered is not None and rendered.version == version:
+        _RENDERED.move_to_end(key)
+        metrics.incr("cards.hits")
+        return rendered
+    metrics.incr("cards.misses")
+    text = format_ad_md(ad, with_status=with_status)
+    media: tuple[InputMediaPhoto, ...] = ()
+    if len(ad.photos) > 1:
+        media = (
+            InputMediaPhoto(media=ad.photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2),
+            *(InputMediaPhoto(media=photo) for photo in ad.photos[1:]),
+        )
+    rendered = _Rendered(version, text, media)
+    if ad.id:
+        _RENDERED[key] = rendered
+        _RENDERED.move_to_end(key)
+        if len(_RENDERED) > MAX_CACHED:
+            _RENDERED.popitem(last=False)
+    return rendered
+
+
+def render_card(ad: AdRecord, with_status: bool = False) -> str:
+    """The ad's card text in MarkdownV2, from the cache when unchanged."""
+    return _render(ad, with_status).text
+
+
+def card_plan(
+    ad: AdRecord,
+    keyboard: Keyboard | None = None,
+    keyboard_text: str = "Связаться с автором:",
+    with_status: bool = False,
+) -> CardPlan:
+    rendered = _render(ad, with_status)
+    photos = tuple(ad.photos)
+    if len(photos) > 1:
+        return CardPlan("album", rendered.text, photos, rendered.media, keyboard, keyboard_text)
+    kind = "photo" if photos else "text"
+    return CardPlan(kind, rendered.text, photos, (), keyboard, None)
+
+
+async def send_body(bot: Bot, chat_id: int | str, plan: CardPlan) -> list[Message]:
+    """Send the card itself: the album, or the photo or text with its keyboard."""
+    started = time.perf_counter()
+    if plan.kind == "album":
+        sent = await bot.send_media_group(chat_id, media=list(plan.media))
+    elif plan.kind == "photo":
+        sent = [
+            await bot.send_photo(
+                chat_id,
+                plan.photos[0],
+                caption=plan.text,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=plan.keyboard,
+            )
+        ]
+    else:
+        sent = [
+            await bot.send_message(
+                chat_id,
+                plan.text,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                reply_markup=plan.keyboard,
+            )
+        ]
+    metrics.observe(f"cards.send_ms.{plan.kind}", (time.perf_counter() - started) * 1000)
+    return sent
+
+
+async def send_keyboard(bot: Bot, chat_id: int | str, plan: CardPlan) -> Message | None:
+    """Send the message carrying an album's keyboard; None if the plan needs none."""
+    if plan.kind != "album" or plan.keyboard is None:
+        return None
+    started = time.perf_counter()
+    sent = await bot.send_message(chat_id, plan.keyboard_text, reply_markup=plan.keyboard)
+    metrics.observe("cards.send_ms.keyboard", (time.perf_counter() - started) * 1000)
+    return sent
+
+
+async def send_card(bot: Bot, chat_id: int | str, plan: CardPlan) -> list[Message]:
+    """Send one card with as few calls as its kind allows; returns its messages in order."""
+    sent = await send_body(bot, chat_id, plan)
+    keyboard = await send_keyboard(bot, chat_id, plan)
+    return sent + [keyboard] if keyboard is not None else sent
+
+
+async def send_cards(bot: Bot, deliveries: Iterable[tuple[int | str, CardPlan]]) -> None:
+    """Send ``(chat_id, plan)`` pairs, each chat's cards in the given order.
+
+    Telegram shows a chat's messages in the order the requests arrive, so
+    one chat's cards are sent one after another; different chats do not
+    affect each other's order and are served concurrently.
+    """
+    by_chat: dict[int | str, list[CardPlan]] = {}
+    for chat_id, plan in deliveries:
+        by_chat.setdefault(chat_id, []).append(plan)
+
+    async def send_chat(chat_id: int | str, plans: list[CardPlan]) -> None:
+        for plan in plans:
+            await send_card(bot, chat_id, plan)
+
+    await asyncio.gather(*(send_chat(chat_id, plans) for chat_id, plans in by_chat.items()))
+
+
+def clear() -> None:
+    _RENDERED.clear()
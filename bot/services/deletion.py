@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
+
+from bot.services import metrics
+
+log = logging.getLogger(__name__)
+
+# Most ids a single deleteMessages call accepts.
+BATCH_SIZE = 100
+
+
+@dataclass(slots=True)
+class DeletionReport:
+    calls: int = 0
+    messages: int = 0
+    failed: int = 0
+
+
+class MessageDeleter:
+    """Deletes many messages with as few Bot API calls as possible.
+
+    Ids are grouped by chat and removed ``BATCH_SIZE`` at a time with
+    deleteMessages, which skips ids that no longer exist. If a batch is
+    refused (a message too old to delete, or a server without the method),
+    its ids are deleted one by one, at most ``concurrency`` calls at a time,
+    and individual failures are only logged. TelegramRetryAfter propagates
+    so the caller can back off.
+    """
+
+    def __init__(self, bot: Bot, concurrency: int = 8) -> None:
+        self._bot = bot
+        self._slots = asyncio.Semaphore(concurrency)
+        self._bulk = True
+
+    async def delete(self, targets: Iterable[tuple[int | str, int]]) -> DeletionReport:
+        """Delete ``(chat_id, message_id)`` pairs, duplicates removed."""
+        by_chat: dict[int | str, dict[int, None]] = {}
+        for chat_id, message_id in targets:
+            by_chat.setdefault(chat_id, {})[message_id] = None
+        report = DeletionReport()
+        await asyncio.gather(
+            *(self._delete_chat(chat_id, list(ids), report) for chat_id, ids in by_chat.items())
+        )
+        return report
+
+    async def delete_chat(self, chat_id: int | str, message_ids: list[int]) -> DeletionReport:
+        report = DeletionReport()
+        await self._delete_chat(chat_id, list(dict.fromkeys(message_ids)), report)
+        return report
+
+    async def _delete_chat(
+        self,
+        chat_id: int | str,
+        message_ids: list[int],
+        report: DeletionReport,
+    ) -> None:
+        for start in range(0, len(message_ids), BATCH_SIZE):
+            batch = message_ids[start : start + BATCH_SIZE]
+            if self._bulk and len(batch) > 1:
+                try:
+                    async with self._slots:
+                        report.calls += 1
+                        metrics.incr("deletion.calls")
+                        await self._bot.delete_messages(chat_id, batch)
+                except TelegramNotFound:
+                    log.warning("deleteMessages is not available, deleting one by one")
+                    self._bulk = False
+                except TelegramForbiddenError as exc:
+                    # No access to the chat; single deletes would fail the same way.
+                    log.warning("Cannot delete messages in chat %s: %s", chat_id, exc)
+                    report.failed += len(batch)
+                    continue
+                except TelegramBadRequest as exc:
+                    log.warning(
+                        "Bulk delete of %s messages in chat %s refused, deleting one by one: %s",
+                        len(batch),
+                        chat_id,
+                        exc,
+                    )
+                else:
+                    report.messages += len(batch)
+                    metrics.incr("deletion.messages", len(batch))
+                    continue
+            await asyncio.gather(*(self._delete_one(chat_id, m, report) for m in batch))
+
+    async def _delete_one(self, chat_id: int | str, message_id: int, report: DeletionReport) -> None:
+        async with self._slots:
+            report.calls += 1
+            metrics.incr("deletion.calls")
+            try:
+                await self._bot.delete_message(chat_id, message_id)
+            except (TelegramBadRequest, TelegramForbiddenError) as exc:
+                report.failed += 1
+                log.warning(
+                    "Failed to delete message %s in chat %s: %s", message_id, chat_id, exc
+                )
+                return
+        report.messages += 1
+        metrics.incr("deletion.messages")
@@ -0,0 +1,46 @@
+"""In-process counters and timing samples, shown to admins by /metrics."""
+from __future__ import annotations
+
+from collections import Counter, deque
+
+_SAMPLES = 2048
+
+_counters: Counter[str] = Counter()
+_timings: dict[str, deque[float]] = {}
+_timing_totals: Counter[str] = Counter()
+
+
+def incr(name: str, amount: int = 1) -> None:
+    _counters[name] += amount
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample; percentiles cover the last few thousand samples."""
+    samples = _timings.get(name)
+    if samples is None:
+        samples = _timings[name] = deque(maxlen=_SAMPLES)
+    samples.append(value)
+    _timing_totals[name] += 1
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def snapshot() -> dict[str, dict[str, float]]:
+    timings: dict[str, dict[str, float]] = {}
+    for name, samples in _timings.items():
+        ordered = sorted(samples)
+        timings[name] = {
+            "count": _timing_totals[name],
+            "p50": _percentile(ordered, 0.5),
+            "p99": _percentile(ordered, 0.99),
+            "max": ordered[-1],
+        }
+    return {"counters": dict(_counters), "timings": timings}
+
+
+def reset() -> None:
+    _counters.clear()
+    _timings.clear()
+    _timing_totals.clear()
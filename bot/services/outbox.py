@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, InputMediaPhoto
+
+from bot.database import crud
+from bot.database.models import AdRecord, OutboxJob, PublishedMessage
+from bot.keyboards.inline import contact_author_kb
+from bot.services import cards, metrics
+from bot.services.deletion import BATCH_SIZE, MessageDeleter
+from bot.services.rate_limit import Priority, priority
+
+log = logging.getLogger(__name__)
+
+# Unpublish jobs larger than this save their progress between chunks.
+_UNPUBLISH_CHUNK = BATCH_SIZE * 10
+
+# Set by the running OutboxWorker so new jobs start without waiting for a poll.
+_WAKEUP: asyncio.Event | None = None
+
+
+def _wake() -> None:
+    if _WAKEUP is not None:
+        _WAKEUP.set()
+
+
+async def enqueue_publish(ad_id: int, chat_id: int, notify: bool = True) -> bool:
+    """Queue posting an approved ad; False if it is already being published.
+
+    An ad that is already in the channel is updated in place when its
+    layout allows. ``notify`` tells the author it was approved.
+    """
+    job_id = await crud.enqueue_outbox_job(
+        "publish",
+        {"ad_id": ad_id, "chat_id": chat_id, "message_ids": [], "step": 0, "notify": notify},
+        dedupe_key=f"publish:{ad_id}",
+    )
+    _wake()
+    return job_id is not None
+
+
+async def enqueue_unpublish(ad_id: int, chat_id: int | None, message_ids: list[int]) -> None:
+    if not chat_id or not message_ids:
+        return
+    await crud.enqueue_outbox_job(
+        "unpublish",
+        {"ad_id": ad_id, "chat_id": chat_id, "message_ids": list(message_ids)},
+    )
+    _wake()
+
+
+async def enqueue_notify(chat_id: int, text: str) -> None:
+    await crud.enqueue_outbox_job("notify", {"chat_id": chat_id, "text": text})
+    _wake()
+
+
+async def expire_ads(max_age_days: float) -> int:
+    """Expire old published ads and queue the removal of their channel posts."""
+    expired = await crud.expire_published_ads(max_age_days)
+    _wake()
+    return expired
+
+
+def publication_plan(ad: AdRecord) -> cards.CardPlan:
+    return cards.card_plan(ad, contact_author_kb(ad.username, ad.user_id))
+
+
+def publication_layout(plan: cards.CardPlan) -> list[PublishedMessage]:
+    """The channel messages a publication plan is sent as, in order."""
+    markup = plan.keyboard.model_dump_json(exclude_none=True)
+    if plan.kind == "album":
+        return (
+            [PublishedMessage("photo", plan.photos[0], plan.text)]
+            + [PublishedMessage("photo", photo) for photo in plan.photos[1:]]
+            + [PublishedMessage("contact", body=plan.keyboard_text, markup=markup)]
+        )
+    if plan.kind == "photo":
+        return [PublishedMessage("photo", plan.photos[0], plan.text, markup)]
+    return [PublishedMessage("text", body=plan.text, markup=markup)]
+
+
+def _send_calls(layout: list[PublishedMessage]) -> int:
+    # An album is one sendMediaGroup plus the contact message.
+    return 2 if len(layout) > 1 else 1
+
+
+def _batches(jobs: list[OutboxJob]) -> list[list[OutboxJob]]:
+    """Run small unpublish jobs together so their deletions share calls."""
+    batches: list[list[OutboxJob]] = []
+    deletions: list[OutboxJob] | None = None
+    for job in jobs:
+        if job.kind == "unpublish" and len(job.payload["message_ids"]) <= BATCH_SIZE:
+            if deletions is None:
+                deletions = []
+                batches.append(deletions)
+            deletions.append(job)
+        else:
+            batches.append([job])
+    return batches
+
+
+def _keyboard(message: PublishedMessage) -> InlineKeyboardMarkup | None:
+    return InlineKeyboardMarkup.model_validate_json(message.markup) if message.markup else None
+
+
+def _editable(
+    old_chat_id: int | None,
+    old: list[tuple[int, PublishedMessage | None]],
+    chat_id: int,
+    layout: list[PublishedMessage],
+) -> bool:
+    # Telegram cannot turn a text message into a photo or change how many
+    # photos an album has, so only the same sequence of kinds is edited.
+    return (
+        bool(old)
+        and old_chat_id == chat_id
+        and len(old) == len(layout)
+        and all(
+            before is not None and before.kind == after.kind
+            for (_, before), after in zip(old, layout)
+        )
+    )
+
+
+class OutboxWorker:
+    """Runs outbox jobs: publish an ad, delete its messages, notify a chat.
+
+    Jobs are claimed from the outbox table and executed one at a time.
+    TelegramRetryAfter pauses the whole worker for the requested time and
+    re-queues the job without counting an attempt; other transient errors
+    retry with exponential backoff up to ``max_attempts``. Bad-request and
+    forbidden errors are permanent.
+
+    Publishing saves its progress after every sent message, and jobs left
+    running by a crashed process are re-queued on start, so a resumed job
+    continues where it stopped. A crash between Telegram accepting a message
+    and the progress write can still repeat that one message.
+
+    An ad that is already in the channel is republished by editing its
+    messages when the new version has the same layout (kind of each
+    message, number of photos); otherwise it is sent anew and the old
+    messages are deleted.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        alert_chat_id: int | None = None,
+        batch_size: int = 10,
+        max_attempts: int = 8,
+        base_delay: float = 2.0,
+        max_delay: float = 15 * 60,
+        idle_interval: float = 30.0,
+        delete_concurrency: int = 8,
+    ) -> None:
+        self._bot = bot
+        self._deleter = MessageDeleter(bot, delete_concurrency)
+        self._alert_chat_id = alert_chat_id
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._idle_interval = idle_interval
+        self._wakeup = asyncio.Event()
+        self._paused_until = 0.0
+        self._closing = False
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        global _WAKEUP
+        requeued = await crud.requeue_running_outbox_jobs()
+        if requeued:
+            log.info("Resuming %s interrupted outbox jobs", requeued)
+        _WAKEUP = self._wakeup
+        with priority(Priority.BACKGROUND):
+            # The task copies the context, so its sends queue behind user replies.
+            self._task = asyncio.create_task(self._run(), name="outbox-worker")
+
+    async def close(self) -> None:
+        global _WAKEUP
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if _WAKEUP is self._wakeup:
+            _WAKEUP = None
+
+    async def _run(self) -> None:
+        while not self._closing:
+            self._wakeup.clear()
+            pause = self._paused_until - time.time()
+            if pause > 0:
+                await self._sleep(pause)
+                continue
+            try:
+                jobs = await crud.claim_outbox_jobs(self._batch_size)
+            except Exception:
+                log.exception("Claiming outbox jobs failed")
+                await self._sleep(self._idle_interval)
+                continue
+            for batch in _batches(jobs):
+                if self._closing or self._paused_until > time.time():
+                    # Hand the rest back untouched; they run after the pause.
+                    for job in batch:
+                        await crud.retry_outbox_job(job.id, job.attempts, self._paused_until)
+                    continue
+                await self._process(batch)
+            if not jobs:
+                next_run = await crud.next_outbox_run_after()
+                delay = self._idle_interval if next_run is None else next_run - time.time()
+                await self._sleep(min(self._idle_interval, max(0.0, delay)))
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process(self, jobs: list[OutboxJob]) -> None:
+        """Run jobs of one kind; errors apply to each job of the batch."""
+        handlers = {
+            "publish": lambda jobs: self._publish(jobs[0]),
+            "unpublish": self._unpublish,
+            "notify": lambda jobs: self._notify(jobs[0]),
+        }
+        kind = jobs[0].kind
+        try:
+            handler = handlers[kind]
+        except KeyError:
+            for job in jobs:
+                await crud.fail_outbox_job(job.id, f"Unknown job kind {kind!r}")
+            return
+        try:
+            await handler(jobs)
+        except TelegramRetryAfter as exc:
+            log.warning("Flood control, pausing outbox for %ss", exc.retry_after)
+            self._paused_until = time.time() + exc.retry_after
+            for job in jobs:
+                await crud.retry_outbox_job(job.id, job.attempts, self._paused_until, str(exc))
+        except (TelegramBadRequest, TelegramForbiddenError) as exc:
+            for job in jobs:
+                await self._fail(job, exc)
+        except Exception as exc:
+            for job in jobs:
+                await self._retry(job, exc)
+
+    async def _retry(self, job: OutboxJob, exc: Exception) -> None:
+        attempts = job.attempts + 1
+        if attempts >= self._max_attempts:
+            await self._fail(job, exc)
+            return
+        delay = min(self._max_delay, self._base_delay * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        log.warning("Outbox job #%s (%s) failed, retry in %.0fs: %s", job.id, job.kind, delay, exc)
+        await crud.retry_outbox_job(job.id, attempts, time.time() + delay, str(exc))
+
+    async def _fail(self, job: OutboxJob, exc: Exception) -> None:
+        log.warning("Outbox job #%s (%s) failed permanently: %s", job.id, job.kind, exc)
+        await crud.fail_outbox_job(job.id, str(exc))
+        if job.kind == "publish" and self._alert_chat_id:
+            await enqueue_notify(
+                self._alert_chat_id,
+                f"Не удалось опубликовать объявление #{job.payload['ad_id']} в канал: {exc}. "
+                "Проверьте PUBLICATION_CHAT_ID и права бота.",
+            )
+
+    async def _publish(self, job: OutboxJob) -> None:
+        payload = job.payload
+        chat_id = payload["chat_id"]
+        ad = await crud.get_ad_by_id(payload["ad_id"])
+        if ad is None or ad.status != "pending":
+            # Deleted or rejected meanwhile: undo whatever was sent.
+            await crud.complete_publication(
+                job.id, payload["ad_id"], chat_id, [(m, None) for m in payload["message_ids"]], None
+            )
+            return
+
+        plan = publication_plan(ad)
+        layout = publication_layout(plan)
+        old_chat_id, old = await crud.get_published_messages(ad.id)
+        notify = None
+        if payload.get("notify", True):
+            notify = (ad.user_id, f"Ваше объявление #{ad.id} одобрено.")
+        # A republish that already started resending stays on that path.
+        if payload["step"] == 0 and _editable(old_chat_id, old, chat_id, layout):
+            try:
+                calls = await self._edit_published(chat_id, old, layout)
+            except TelegramBadRequest as exc:
+                # Typically a message deleted by hand: post the ad anew.
+                log.warning("Editing ad #%s in place failed, resending: %s", ad.id, exc)
+            else:
+                metrics.incr("republish.edited")
+                # Resending would be one delete_messages call plus the sends.
+                metrics.incr("republish.calls_saved", 1 + _send_calls(layout) - calls)
+                metrics.incr("republish.messages_kept", len(old))
+                messages = [(message_id, after) for (message_id, _), after in zip(old, layout)]
+                await crud.complete_publication(job.id, ad.id, chat_id, messages, notify)
+                return
+
+        await self._send_plan(job, plan)
+        replaced = None
+        if old:
+            metrics.incr("republish.resent")
+            metrics.incr("republish.messages_replaced", len(old))
+            replaced = (old_chat_id, [message_id for message_id, _ in old])
+        await crud.complete_publication(
+            job.id, ad.id, chat_id, list(zip(payload["message_ids"], layout)), notify, replaced
+        )
+
+    async def _send_plan(self, job: OutboxJob, plan: cards.CardPlan) -> None:
+        payload = job.payload
+        chat_id = payload["chat_id"]
+        if payload["step"] == 0:
+            sent_messages = await cards.send_body(self._bot, chat_id, plan)
+            payload["message_ids"].extend(m.message_id for m in sent_messages)
+            payload["step"] = 1
+            await crud.save_outbox_progress(job.id, payload)
+        if payload["step"] == 1:
+            sent = await cards.send_keyboard(self._bot, chat_id, plan)
+            if sent is not None:
+                payload["message_ids"].append(sent.message_id)
+                payload["step"] = 2
+                await crud.save_outbox_progress(job.id, payload)
+
+    async def _edit_published(
+        self,
+        chat_id: int,
+        old: list[tuple[int, PublishedMessage | None]],
+        layout: list[PublishedMessage],
+    ) -> int:
+        """Bring the channel messages from ``old`` to ``layout``; returns API calls made."""
+        calls = 0
+        for (message_id, before), after in zip(old, layout):
+            if before == after:
+                continue
+            parse_mode = ParseMode.MARKDOWN_V2 if after.body else None
+            try:
+                if after.kind == "contact" and before.body == after.body:
+                    await self._bot.edit_message_reply_markup(
+                        chat_id=chat_id, message_id=message_id, reply_markup=_keyboard(after)
+                    )
+                elif after.kind in {"text", "contact"}:
+                    await self._bot.edit_message_text(
+                        after.body,
+                        chat_id=chat_id,
+                        message_id=message_id,
+                        parse_mode=ParseMode.MARKDOWN_V2 if after.kind == "text" else None,
+                        reply_markup=_keyboard(after),
+                    )
+                elif before.file_id != after.file_id:
+                    await self._bot.edit_message_media(
+                        InputMediaPhoto(
+                            media=after.file_id, caption=after.body, parse_mode=parse_mode
+                        ),
+                        chat_id=chat_id,
+                        message_id=message_id,
+                        reply_markup=_keyboard(after),
+                    )
+                else:
+                    await self._bot.edit_message_caption(
+                        chat_id=chat_id,
+                        message_id=message_id,
+                        caption=after.body,
+                        parse_mode=parse_mode,
+                        reply_markup=_keyboard(after),
+                    )
+            except TelegramBadRequest as exc:
+                # Re-running a half-finished job repeats edits that already landed.
+                if "message is not modified" not in str(exc):
+                    raise
+            calls += 1
+        return calls
+
+    async def _unpublish(self, jobs: list[OutboxJob]) -> None:
+        if len(jobs) > 1:
+            await self._deleter.delete(
+                (job.payload["chat_id"], message_id)
+                for job in jobs
+                for message_id in job.payload["message_ids"]
+            )
+        else:
+            (job,) = jobs
+            payload = job.payload
+            remaining = payload["message_ids"]
+            while remaining:
+                chunk, remaining = remaining[:_UNPUBLISH_CHUNK], remaining[_UNPUBLISH_CHUNK:]
+                await self._deleter.delete_chat(payload["chat_id"], chunk)
+                if remaining:
+                    # A retry after flood control resumes with what is left.
+                    payload["message_ids"] = remaining
+                    await crud.save_outbox_progress(job.id, payload)
+        await crud.finish_outbox_jobs([job.id for job in jobs])
+
+    async def _notify(self, job: OutboxJob) -> None:
+        await self._bot.send_message(job.payload["chat_id"], job.payload["text"])
+        await crud.finish_outbox_job(job.id)
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextvars
+import logging
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from itertools import count
+from typing import TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMediaGroup
+from aiogram.methods.base import TelegramType
+
+from bot.services import metrics
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response, TelegramMethod
+
+log = logging.getLogger(__name__)
+
+# Methods that put a message into a chat and count against Telegram's limits.
+_LIMITED_PREFIXES = ("send", "copy", "forward", "edit")
+
+
+class Priority(IntEnum):
+    """Lower values are served first when requests queue up."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_PRIORITY: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "rate_limit_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    """Send every Bot API call made inside the block with ``value`` priority."""
+    token = _PRIORITY.set(value)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``capacity``.
+
+    A request costing more than the capacity (an album) is let through once
+    the bucket is full and leaves it in debt, so the long-run rate holds.
+    In any window of ``t`` seconds at most ``capacity + rate * t`` tokens
+    are spent, plus the overshoot of one such request.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = now
+        self._blocked_until = 0.0
+
+    def delay(self, cost: float, now: float) -> float:
+        """Seconds until ``cost`` tokens are available; 0 if they are now."""
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        wait = max(0.0, self._blocked_until - now)
+        if self._tokens < cost:
+            wait = max(wait, (cost - self._tokens) / self.rate)
+        return wait
+
+    def take(self, cost: float, now: float) -> None:
+        self._refill(now)
+        self._tokens -= cost
+
+    def block(self, until: float) -> None:
+        """Hand out nothing before ``until``, e.g. after a 429 from Telegram."""
+        self._blocked_until = max(self._blocked_until, until)
+        self._tokens = 0.0
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self.capacity and self._blocked_until <= now
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+
+@dataclass(order=True, slots=True)
+class _Waiter:
+    priority: int
+    seq: int
+    chat: TokenBucket | None = field(compare=False)
+    cost: float = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class RateLimiter:
+    """Token buckets for the whole bot and for each chat, served by priority.
+
+    A request needs a token from the global bucket and from its chat's
+    bucket. Private chats and groups/channels get separate rates; the
+    defaults keep every 1-second window under Telegram's ~30 messages and
+    every minute in a group under ~20, bursts included. When
+    requests have to wait, they are granted strictly by priority and then
+    arrival order; a request held back only by its own chat's bucket does
+    not block requests for other chats, while one held back by the global
+    bucket keeps later requests from taking its tokens.
+
+    When the bot runs as several processes sharded by user, each gets a
+    RateLimiter with ``share`` = 1/N: the global limit and the limits of
+    groups any process may write to are split between them, while a private
+    chat is only ever served by one process. ``exclusive_chats`` are groups
+    or channels only this process writes to, such as the publication
+    channel for the process running the outbox; they keep the full rate.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        global_burst: float = 5.0,
+        private_rate: float = 1.0,
+        private_burst: float = 3.0,
+        group_rate: float = 17 / 60,
+        group_burst: float = 3.0,
+        max_idle_chats: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+        share: float = 1.0,
+        exclusive_chats: Iterable[int | str] = (),
+    ) -> None:
+        self._clock = clock
+        self._global = TokenBucket(global_rate * share, global_burst * share, clock())
+        self._private = (private_rate, private_burst)
+        self._group = (group_rate * share, group_burst * share)
+        self._exclusive_group = (group_rate, group_burst)
+        self._exclusive_chats = frozenset(exclusive_chats)
+        self._max_idle_chats = max_idle_chats
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._waiters: list[_Waiter] = []
+        self._seq = count()
+        self._wakeup = asyncio.Event()
+        self._pump: asyncio.Task[None] | None = None
+
+    async def acquire(
+        self,
+        chat_id: int | str | None,
+        cost: float = 1.0,
+        priority: Priority | None = None,
+    ) -> float:
+        """Wait for a send slot; returns the seconds spent waiting."""
+        priority = _PRIORITY.get() if priority is None else priority
+        start = self._clock()
+        chat = self._chat_bucket(chat_id, start)
+        if not self._waiters and self._ready(chat, cost, start) == (0.0, 0.0):
+            self._take(chat, cost, start)
+            waited = 0.0
+        else:
+            waiter = _Waiter(
+                priority, next(self._seq), chat, cost, asyncio.get_running_loop().create_future()
+            )
+            bisect.insort(self._waiters, waiter)
+            self._wakeup.set()
+            if self._pump is None or self._pump.done():
+                self._pump = asyncio.create_task(self._run(), name="rate-limiter")
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+            waited = self._clock() - start
+        metrics.observe(f"telegram.queue_wait_ms.{priority.name.lower()}", waited * 1000)
+        return waited
+
+    def penalize(self, chat_id: int | str | None, retry_after: float) -> None:
+        """Stop sending to ``chat_id`` (or at all, if None) for ``retry_after`` seconds."""
+        now = self._clock()
+        bucket = self._chat_bucket(chat_id, now) or self._global
+        bucket.block(now + retry_after)
+        self._wakeup.set()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _chat_bucket(self, chat_id: int | str | None, now: float) -> TokenBucket | None:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self._max_idle_chats:
+                self._forget_idle(now)
+            # Positive ids are users; groups, channels and @usernames are not.
+            private = isinstance(chat_id, int) and chat_id > 0
+            if private:
+                rate, burst = self._private
+            elif chat_id in self._exclusive_chats:
+                rate, burst = self._exclusive_group
+            else:
+                rate, burst = self._group
+            bucket = self._chats[chat_id] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def _forget_idle(self, now: float) -> None:
+        # A full bucket behaves exactly like a new one, so it can be dropped.
+        for chat_id in [c for c, b in self._chats.items() if b.idle(now)]:
+            del self._chats[chat_id]
+
+    def _ready(self, chat: TokenBucket | None, cost: float, now: float) -> tuple[float, float]:
+        chat_wait = chat.delay(cost, now) if chat is not None else 0.0
+        return self._global.delay(cost, now), chat_wait
+
+    def _take(self, chat: TokenBucket | None, cost: float, now: float) -> None:
+        self._global.take(cost, now)
+        if chat is not None:
+            chat.take(cost, now)
+
+    async def _run(self) -> None:
+        while self._waiters:
+            self._wakeup.clear()
+            now = self._clock()
+            next_wait = float("inf")
+            for waiter in list(self._waiters):
+                if waiter.future.done():
+                    self._waiters.remove(waiter)
+                    continue
+                global_wait, chat_wait = self._ready(waiter.chat, waiter.cost, now)
+                if global_wait == 0 and chat_wait == 0:
+                    self._take(waiter.chat, waiter.cost, now)
+                    self._waiters.remove(waiter)
+                    waiter.future.set_result(None)
+                    continue
+                next_wait = min(next_wait, max(global_wait, chat_wait))
+                if global_wait > 0:
+                    # Global tokens go to this waiter first.
+                    break
+            if not self._waiters:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), next_wait)
+            except asyncio.TimeoutError:
+                pass
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Session middleware that passes message-sending calls through a RateLimiter.
+
+    Install with ``bot.session.middleware(RateLimitMiddleware(limiter))``.
+    Sends, copies, forwards and edits are limited; other methods (answers to
+    callback queries, getters, deletions) go straight through. A
+    TelegramRetryAfter blocks the chat's bucket for the requested time before
+    it is re-raised to the caller.
+    """
+
+    def __init__(self, limiter: RateLimiter) -> None:
+        self.limiter = limiter
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not method.__api_method__.startswith(_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+        chat_id = getattr(method, "chat_id", None)
+        # Each photo of an album counts as a message.
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+        await self.limiter.acquire(chat_id, cost)
+        metrics.incr("telegram.requests")
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as exc:
+            metrics.incr("telegram.retry_after")
+            log.warning("Telegram asked to retry %s after %ss", method.__api_method__, exc.retry_after)
+            self.limiter.penalize(chat_id, exc.retry_after)
+            raise
@@ -0,0 +1,152 @@
+"""Channel subscription checks without a Bot API call per update.
+
+A user's membership is cached for ``positive_ttl`` seconds when they are
+subscribed and ``negative_ttl`` when they are not; the short negative TTL
+lets a user who has just joined through without waiting long. chat_member
+updates from the channel overwrite the entry as soon as a user joins or
+leaves. Telegram only sends them to a bot that is an administrator of the
+channel and asks for them, which the dispatcher does once a chat_member
+handler is registered.
+
+Concurrent checks for the same user share one getChatMember call, and a
+call that was in flight when a chat_member update arrived does not
+overwrite the newer status.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Container
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.enums import ChatType
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.services import metrics
+
+_NOT_MEMBER = {"left", "kicked"}
+
+
+class SubscriptionGate:
+    """Cached answer to "is this user subscribed to the channel"."""
+
+    def __init__(
+        self,
+        channel: str | int,
+        positive_ttl: float = 600.0,
+        negative_ttl: float = 30.0,
+        max_entries: int = 100_000,
+    ) -> None:
+        self.channel = channel
+        self._positive_ttl = positive_ttl
+        self._negative_ttl = negative_ttl
+        self._max_entries = max_entries
+        # user_id -> (expires_at, set_at, subscribed)
+        self._entries: OrderedDict[int, tuple[float, float, bool]] = OrderedDict()
+        self._pending: dict[int, asyncio.Future[bool]] = {}
+
+    def cached(self, user_id: int) -> bool | None:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[2]
+
+    async def is_subscribed(self, bot: Bot, user_id: int, recheck: bool = False) -> bool:
+        """Membership from the cache, or from Telegram on a miss.
+
+        ``recheck`` asks Telegram again unless the user is cached as
+        subscribed, for an explicit "check my subscription" tap.
+        """
+        subscribed = self.cached(user_id)
+        if subscribed or (subscribed is not None and not recheck):
+            metrics.incr("subscription.hits")
+            return subscribed
+        metrics.incr("subscription.misses")
+        pending = self._pending.get(user_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(bot, user_id))
+            self._pending[user_id] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(user_id, None))
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, bot: Bot, user_id: int) -> bool:
+        started = time.monotonic()
+        try:
+            member = await bot.get_chat_member(self.channel, user_id)
+        except (TelegramBadRequest, TelegramForbiddenError):
+            subscribed = False
+        else:
+            subscribed = member.status not in _NOT_MEMBER
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= started:
+            self._store(user_id, subscribed)
+        return subscribed
+
+    def record(self, user_id: int, status: str) -> None:
+        """Apply a chat_member update: ``status`` is the member's new status."""
+        metrics.incr("subscription.updates")
+        self._store(user_id, status not in _NOT_MEMBER)
+
+    def _store(self, user_id: int, subscribed: bool) -> None:
+        now = time.monotonic()
+        ttl = self._positive_ttl if subscribed else self._negative_ttl
+        self._entries[user_id] = (now + ttl, now, subscribed)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SubscriptionMiddleware(BaseMiddleware):
+    """Outer middleware that lets only subscribed users reach the handlers.
+
+    Install on ``dp.message`` and ``dp.callback_query``, ahead of the other
+    outer middlewares. Only private chats are gated, so moderation chats keep
+    working; ``exempt`` user ids (admins) and callback data in
+    ``allowed_callbacks`` always pass. A refused event goes to ``on_denied``
+    instead of the handlers.
+    """
+
+    def __init__(
+        self,
+        gate: SubscriptionGate,
+        on_denied: Callable[[TelegramObject], Awaitable[Any]],
+        exempt: Container[int] = (),
+        allowed_callbacks: Container[str] = (),
+    ) -> None:
+        self.gate = gate
+        self.on_denied = on_denied
+        self.exempt = exempt
+        self.allowed_callbacks = allowed_callbacks
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if isinstance(event, CallbackQuery):
+            if event.data in self.allowed_callbacks:
+                return await handler(event, data)
+            chat = event.message.chat if event.message else None
+        elif isinstance(event, Message):
+            chat = event.chat
+        else:
+            return await handler(event, data)
+        user = event.from_user
+        if (
+            user is None
+            or chat is None
+            or chat.type != ChatType.PRIVATE
+            or user.id in self.exempt
+            or await self.gate.is_subscribed(data["bot"], user.id)
+        ):
+            return await handler(event, data)
+        metrics.incr("subscription.denied")
+        return await self.on_denied(event)
@@ -0,0 +1,338 @@
+"""Run the bot as several worker processes sharded by user.
+
+Run: python -m bot.supervisor  (WORKERS processes, one per CPU by default)
+
+The supervisor receives updates by long polling, or through the webhook if
+WEBHOOK_URL is set, and forwards each one still as raw JSON to worker
+``user_id % WORKERS`` over a socket, so parsing and handling happen in the
+workers. Every worker runs the full dispatcher; one user's updates are
+handled in arrival order, different users' concurrently. All processes
+share the SQLite file through a WriteCoordinator, and only worker 0 runs
+the outbox.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import secrets
+import signal
+import socket
+from collections.abc import Awaitable, Callable
+from multiprocessing.connection import wait as wait_for_exit
+from typing import Any
+
+import aiohttp
+from aiogram import Bot
+from aiohttp import web
+
+from bot.config import Settings, get_settings
+from bot.database import crud
+from bot.database.coordinator import WriteCoordinator
+from bot.main import configure_db, create_bot, create_dispatcher
+from bot.services.outbox import OutboxWorker
+
+log = logging.getLogger(__name__)
+
+# Updates a worker handles at once; past that it stops reading its socket,
+# which in turn holds back the supervisor.
+MAX_IN_FLIGHT = 64
+# How long workers get to finish the updates they already received.
+DRAIN_TIMEOUT = 30.0
+# Longest line (one update) accepted on a worker socket.
+_LINE_LIMIT = 4 * 1024 * 1024
+_POLL_TIMEOUT = 30
+
+
+def shard_key(update: dict[str, Any]) -> int:
+    """Id of the user behind ``update``, or of its chat when there is none.
+
+    A chat_member update belongs to the member whose status changed, who is
+    not always its sender, so it reaches the worker that caches that user.
+    """
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        member = event.get("new_chat_member") or {}
+        user = member.get("user") or event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        chat = event.get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+class _UserLanes:
+    """Runs each user's updates one after another and different users' concurrently."""
+
+    def __init__(self, limit: int) -> None:
+        self._slots = asyncio.Semaphore(limit)
+        self._tails: dict[int, asyncio.Task[None]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, key: int, handle: Callable[[], Awaitable[None]]) -> None:
+        await self._slots.acquire()
+        task = asyncio.create_task(self._run(key, self._tails.get(key), handle))
+        self._tails[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        key: int,
+        previous: asyncio.Task[None] | None,
+        handle: Callable[[], Awaitable[None]],
+    ) -> None:
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            await handle()
+        finally:
+            self._slots.release()
+            if self._tails.get(key) is asyncio.current_task():
+                del self._tails[key]
+
+    async def join(self) -> None:
+        while self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+
+async def _run_worker(
+    index: int,
+    workers: int,
+    sock: socket.socket,
+    coordinator: WriteCoordinator,
+) -> None:
+    settings = get_settings()
+    configure_db(settings, coordinator)
+    await crud.init_db()
+    # Only worker 0 runs the outbox, so the publication channel is its alone.
+    channel = settings.publication_chat_id
+    exclusive = (channel,) if index == 0 and channel is not None else ()
+    bot = create_bot(settings, workers, exclusive)
+    dp = create_dispatcher(settings)
+    outbox = None
+    if index == 0:
+        # Jobs queued by other workers cannot wake this one, so poll often.
+        outbox = OutboxWorker(bot, alert_chat_id=settings.moderation_chat_id, idle_interval=1.0)
+        await outbox.start()
+        dp.shutdown.register(outbox.close)
+
+    reader, writer = await asyncio.open_connection(sock=sock, limit=_LINE_LIMIT)
+    lanes = _UserLanes(MAX_IN_FLIGHT)
+
+    async def feed(update: dict[str, Any]) -> None:
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:
+            log.exception("Update %s failed", update.get("update_id"))
+
+    try:
+        await dp.emit_startup(bot=bot, **dp.workflow_data)
+        writer.write(b"ready\n")
+        await writer.drain()
+        # EOF means the supervisor is shutting down.
+        while line := await reader.readline():
+            update = json.loads(line)
+            await lanes.submit(shard_key(update), lambda update=update: feed(update))
+        await lanes.join()
+    finally:
+        writer.close()
+        try:
+            await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        finally:
+            if outbox is not None:
+                await outbox.close()
+            await bot.session.close()
+            await crud.close_db()
+
+
+def _worker_main(
+    index: int,
+    workers: int,
+    sock: socket.socket,
+    coordinator: WriteCoordinator,
+) -> None:
+    # Ctrl+C and service stops reach the whole process group; workers leave
+    # when the supervisor closes their socket instead.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_run_worker(index, workers, sock, coordinator))
+
+
+class WorkerPool:
+    """Worker processes and the sockets that feed them updates."""
+
+    def __init__(self, workers: int) -> None:
+        self._context = multiprocessing.get_context("spawn")
+        self._coordinator = WriteCoordinator(self._context)
+        self._count = workers
+        self._processes: list[multiprocessing.process.BaseProcess] = []
+        self._writers: list[asyncio.StreamWriter] = []
+
+    async def start(self) -> None:
+        readers = []
+        for index in range(self._count):
+            parent, child = socket.socketpair()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self._count, child, self._coordinator),
+                name=f"bot-worker-{index}",
+            )
+            process.start()
+            child.close()
+            self._processes.append(process)
+            reader, writer = await asyncio.open_connection(sock=parent)
+            readers.append(reader)
+            self._writers.append(writer)
+        for index, reader in enumerate(readers):
+            if await reader.readline() != b"ready\n":
+                raise RuntimeError(f"Worker {index} failed to start")
+        log.info("%s workers ready", self._count)
+
+    async def dispatch(self, update: dict[str, Any]) -> None:
+        """Hand ``update`` to its user's worker; waits while that worker is busy."""
+        writer = self._writers[shard_key(update) % self._count]
+        writer.write(json.dumps(update, ensure_ascii=False).encode() + b"\n")
+        await writer.drain()
+
+    async def wait_exit(self) -> None:
+        """Return once any worker process has exited."""
+        await asyncio.to_thread(wait_for_exit, [p.sentinel for p in self._processes])
+
+    async def close(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Let workers finish the updates they received, then stop them."""
+        for writer in self._writers:
+            writer.close()
+        for process in self._processes:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                log.warning("%s did not stop in %ss, killing it", process.name, timeout)
+                # Workers ignore SIGTERM.
+                process.kill()
+                await asyncio.to_thread(process.join)
+
+
+async def _poll(bot: Bot, pool: WorkerPool, allowed_updates: list[str]) -> None:
+    # getUpdates is called directly so updates are not parsed in the supervisor.
+    url = bot.session.api.api_url(bot.token, "getUpdates")
+    params: dict[str, Any] = {"timeout": _POLL_TIMEOUT, "allowed_updates": allowed_updates}
+    timeout = aiohttp.ClientTimeout(total=_POLL_TIMEOUT + 10)
+    async with aiohttp.ClientSession(timeout=timeout) as http:
+        try:
+            while True:
+                try:
+                    async with http.post(url, json=params) as resp:
+                        body = await resp.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                    log.warning("getUpdates failed: %s", exc)
+                    await asyncio.sleep(1)
+                    continue
+                if not body.get("ok"):
+                    retry_after = body.get("parameters", {}).get("retry_after", 5)
+                    log.error("getUpdates refused: %s", body.get("description"))
+                    await asyncio.sleep(retry_after)
+                    continue
+                for update in body["result"]:
+                    await pool.dispatch(update)
+                    params["offset"] = update["update_id"] + 1
+        finally:
+            if "offset" in params:
+                # Confirm what was handed to workers so it is not redelivered.
+                confirm = {"offset": params["offset"], "timeout": 0, "limit": 1}
+                try:
+                    async with http.post(url, json=confirm) as resp:
+                        await resp.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    log.warning("Could not confirm the last updates: %s", exc)
+
+
+async def _serve_webhook(
+    settings: Settings,
+    bot: Bot,
+    pool: WorkerPool,
+    allowed_updates: list[str],
+    stop: asyncio.Event,
+) -> None:
+    accepting = True
+
+    async def handle(request: web.Request) -> web.Response:
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(secret, settings.webhook_secret or ""):
+            return web.Response(body="Unauthorized", status=401)
+        if not accepting:
+            return web.Response(body="Shutting down", status=503)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(body="Bad Request", status=400)
+        await pool.dispatch(update)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(settings.webhook_path, handle)
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    await web.TCPSite(runner, settings.webhook_host, settings.webhook_port).start()
+    try:
+        await bot.set_webhook(
+            settings.webhook_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=allowed_updates,
+            max_connections=min(100, settings.webhook_max_in_flight),
+        )
+        await stop.wait()
+    finally:
+        accepting = False
+        await runner.cleanup()
+
+
+async def main() -> None:
+    settings = get_settings()
+    # Migrations run once here, before any worker opens the file.
+    configure_db(settings)
+    await crud.init_db()
+    await crud.close_db()
+
+    bot = create_bot(settings)
+    allowed_updates = create_dispatcher(settings).resolve_used_update_types()
+    pool = WorkerPool(settings.workers)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    failed = False
+    try:
+        await pool.start()
+        if settings.webhook_url:
+            intake = asyncio.create_task(_serve_webhook(settings, bot, pool, allowed_updates, stop))
+        else:
+            await bot.delete_webhook()
+            intake = asyncio.create_task(_poll(bot, pool, allowed_updates))
+        stopped = asyncio.create_task(stop.wait())
+        crashed = asyncio.create_task(pool.wait_exit())
+        done, _ = await asyncio.wait({intake, stopped, crashed}, return_when=asyncio.FIRST_COMPLETED)
+        stopped.cancel()
+        if crashed in done:
+            # Its queued updates are lost; let the service manager restart everything.
+            log.error("A worker exited unexpectedly, shutting down")
+            failed = True
+        stop.set()
+        if not settings.webhook_url:
+            intake.cancel()
+        try:
+            await intake
+        except asyncio.CancelledError:
+            pass
+    finally:
+        await pool.close()
+        await bot.session.close()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
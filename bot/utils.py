@@ -1,38 +1,55 @@
 ﻿from __future__ import annotations
 
-from bot.database.models import AdRecord
+from bot.database.models import AdRecord, AdSummary
+
+
+# Backslash first, so the escapes added for the others are not escaped again.
+_MD_V2_ESCAPES = tuple((ch, f"\\{ch}") for ch in "\\_*[]()~`>#+-=|{}.!")
 
 
 def escape_md_v2(text: str) -> str:
-    special = r"_*[]()~`>#+-=|{}.!"
-    out = text
-    for ch in special:
-        out = out.replace(ch, f"\\{ch}")
-    return out
+    # One C-level scan per character beats str.translate or a regex on
+    # Cyrillic text, and a character that does not occur costs no copy.
+    for ch, escaped in _MD_V2_ESCAPES:
+        text = text.replace(ch, escaped)
+    return text
+
+
+STATUS_TEXT = {
+    "pending": "На модерации",
+    "published": "Опубликовано",
+    "rejected": "Отклонено",
+    "deleted": "Удалено",
+    "expired": "Срок истёк",
+    "draft": "Черновик",
+}
 
 
 def format_ad_md(ad: AdRecord, with_status: bool = False) -> str:
-    status_map = {
-        "pending": "На модерации",
-        "published": "Опубликовано",
-        "rejected": "Отклонено",
-        "deleted": "Удалено",
-        "draft": "Черновик",
-    }
-    status_text = status_map.get(ad.status, ad.status)
-    parts = [
-        f"*{escape_md_v2(ad.title)}*",
+    """Card text in MarkdownV2; see bot.services.cards for the cached version."""
+    # The labels hold no MarkdownV2 specials, so everything below the bold
+    # title is escaped in one go.
+    lines = [
+        f"Категория: {ad.category}",
+        f"Цена: {ad.price_text}",
+        f"Город/район: {ad.city}",
         "",
-        f"Категория: {escape_md_v2(ad.category)}",
-        f"Цена: {escape_md_v2(ad.price_text)}",
-        f"Город/район: {escape_md_v2(ad.city)}",
-        "",
-        escape_md_v2(ad.description),
+        ad.description,
     ]
     if ad.phone:
-        parts.append(f"\nТелефон: {escape_md_v2(ad.phone)}")
+        lines.append(f"\nТелефон: {ad.phone}")
     if ad.username:
-        parts.append(escape_md_v2(f"Опубликовал: @{ad.username}"))
+        lines.append(f"Опубликовал: @{ad.username}")
+    if with_status:
+        lines.append(f"Статус: {STATUS_TEXT.get(ad.status, ad.status)}")
+    return f"*{escape_md_v2(ad.title)}*\n\n" + escape_md_v2("\n".join(lines))
+
+
+def format_ad_line(ad: AdSummary, number: int, with_status: bool = False) -> str:
+    """One plain-text line of a result list."""
+    line = f"{number}. {ad.title} — {ad.price_text}, {ad.city}"
+    if ad.has_photos:
+        line += " 📷"
     if with_status:
-        parts.append(f"Статус: {escape_md_v2(status_text)}")
-    return "\n".join(parts)
+        line += f" ({STATUS_TEXT.get(ad.status, ad.status)})"
+    return line
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+import time
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from bot.config import Settings
+from bot.services import metrics
+
+log = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Webhook endpoint that answers at once and runs updates in the background.
+
+    At most ``max_in_flight`` updates are processed at a time; further
+    requests wait for a free slot before they are acknowledged, which makes
+    Telegram hold back new deliveries. Requests without the right secret
+    token get 401. ``drain`` stops accepting updates (503 tells Telegram to
+    redeliver them later) and waits for the ones in flight.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str | None,
+        max_in_flight: int = 40,
+        **data: Any,
+    ) -> None:
+        super().__init__(
+            dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data
+        )
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._accepting = True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not self.verify_secret(secret, self.bot):
+            metrics.incr("webhook.unauthorized")
+            return web.Response(body="Unauthorized", status=401)
+        if not self._accepting:
+            return web.Response(body="Shutting down", status=503)
+        started = time.perf_counter()
+        await self._slots.acquire()
+        metrics.observe("webhook.slot_wait_ms", (time.perf_counter() - started) * 1000)
+        if not self._accepting:
+            self._slots.release()
+            return web.Response(body="Shutting down", status=503)
+        try:
+            update = await request.json(loads=self.bot.session.json_loads)
+        except ValueError:
+            self._slots.release()
+            return web.Response(body="Bad Request", status=400)
+        task = asyncio.create_task(self._feed(update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=self.bot.session.json_dumps)
+
+    async def _feed(self, update: dict[str, Any]) -> None:
+        started = time.perf_counter()
+        try:
+            await self._background_feed_update(self.bot, update)
+        except Exception:
+            log.exception("Update %s failed", update.get("update_id"))
+        finally:
+            self._slots.release()
+            metrics.observe("webhook.handler_ms", (time.perf_counter() - started) * 1000)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def drain(self, timeout: float) -> None:
+        self._accepting = False
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        log.info("Waiting for %s updates in flight", len(tasks))
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            log.warning("Cancelling %s updates still running after %ss", len(pending), timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def close(self) -> None:
+        # The caller closes the bot session after the dispatcher shut down.
+        pass
+
+
+async def start_webhook_server(
+    dp: Dispatcher,
+    bot: Bot,
+    settings: Settings,
+) -> tuple[web.AppRunner, BoundedRequestHandler]:
+    """Serve the webhook endpoint; returns the runner and handler to stop later."""
+    handler = BoundedRequestHandler(
+        dp,
+        bot,
+        secret_token=settings.webhook_secret,
+        max_in_flight=settings.webhook_max_in_flight,
+        **dp.workflow_data,
+    )
+    app = web.Application()
+    app.router.add_post(settings.webhook_path, handler.handle)
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.webhook_host, settings.webhook_port)
+    await site.start()
+    log.info(
+        "Webhook server listening on %s:%s%s",
+        settings.webhook_host,
+        settings.webhook_port,
+        settings.webhook_path,
+    )
+    return runner, handler
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, settings: Settings) -> None:
+    """Receive updates through a webhook until SIGINT/SIGTERM, then drain."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner, handler = await start_webhook_server(dp, bot, settings)
+    try:
+        await dp.emit_startup(bot=bot, **dp.workflow_data)
+        # Telegram keeps at most this many connections open to the endpoint.
+        await bot.set_webhook(
+            settings.webhook_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(100, settings.webhook_max_in_flight),
+        )
+        await stop.wait()
+        log.info("Stopping webhook server")
+    finally:
+        # The webhook stays registered so Telegram queues updates for the
+        # next instance instead of dropping them.
+        await handler.drain(settings.webhook_drain_timeout)
+        await runner.cleanup()
+        try:
+            await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        finally:
+            await bot.session.close()